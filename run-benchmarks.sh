@@ -0,0 +1,35 @@
+#!/bin/bash
+
+# ⏱️ Benchmarks del código (pytest-benchmark)
+# Guarda cada ejecución en .benchmarks/ (JSON) y, si ya hay una anterior,
+# falla cuando la mediana de algún benchmark empeora más de BENCHMARK_THRESHOLD.
+#
+# Uso: ./run-benchmarks.sh [argumentos extra de pytest]
+#   BENCHMARK_THRESHOLD=25 ./run-benchmarks.sh     # tolerancia en % (por defecto 20)
+#   BENCHMARK_BASELINE=0001 ./run-benchmarks.sh    # comparar con una ejecución fija
+#   ./run-benchmarks.sh -k websocket                # solo los benchmarks que coincidan
+
+set -e
+cd "$(dirname "$0")"
+
+THRESHOLD="${BENCHMARK_THRESHOLD:-20}"
+BASELINE="${BENCHMARK_BASELINE:-}"
+STORAGE=".benchmarks"
+
+if ! python -c "import pytest_benchmark" 2>/dev/null; then
+    echo "❌ pytest-benchmark no está instalado: pip install pytest-benchmark"
+    exit 1
+fi
+
+COMPARE=()
+if find "$STORAGE" -name '*.json' 2>/dev/null | grep -q .; then
+    echo "📊 Comparando con ${BASELINE:-la última ejecución guardada} (tolerancia ${THRESHOLD}% en la mediana)"
+    COMPARE=("--benchmark-compare${BASELINE:+=$BASELINE}" "--benchmark-compare-fail=median:${THRESHOLD}%")
+else
+    echo "📊 Primera ejecución: se guarda como referencia"
+fi
+
+python -m pytest tests/test_benchmarks.py --benchmark-only \
+    --benchmark-storage="$STORAGE" --benchmark-autosave \
+    --benchmark-columns=min,median,mean,stddev,ops,rounds \
+    "${COMPARE[@]}" "$@"
@@ -0,0 +1,120 @@
+"""
+Detección de ganador para muchos tableros a la vez.
+
+Los tableros se codifican en una matriz (n, size*size) de int8 (0 vacía,
+1 X, 2 O) y una sola indexación con la matriz de líneas del tamaño
+(n_líneas, size) clasifica todo el lote. El resultado es idéntico a
+check_winner: gana la primera línea completa en el orden de
+bitboard.line_masks, luego empate si el tablero está lleno y si no partida en
+curso.
+
+NumPy es opcional: sin él, batch_winners recorre el lote con los bitboards.
+
+Comparación con la ruta escalar:
+    python batch_winner.py --boards 1000000 --size 3
+"""
+
+import argparse
+import random
+import time
+from functools import lru_cache
+from itertools import chain
+from typing import List, Optional, Sequence
+
+import bitboard
+
+try:
+    import numpy as np
+except ImportError:  # dependencia opcional
+    np = None
+
+HAS_NUMPY = np is not None
+
+# Códigos de resultado (los mismos que usa ws_protocol para el ganador)
+IN_PROGRESS, X_WINS, O_WINS, TIE = 0, 1, 2, 3
+WINNERS = (None, 'X', 'O', 'Tie')
+
+_CELL_CODES = {None: 0, 'X': 1, 'O': 2}
+
+
+@lru_cache(maxsize=None)
+def line_indices(size: int):
+    """Matriz (n_líneas, size) con las casillas de cada línea, en el orden de line_masks."""
+    return np.array([list(bitboard.iter_cells(mask)) for mask in bitboard.line_masks(size)],
+                    dtype=np.intp)
+
+
+def encode_boards(boards: Sequence[Sequence[Optional[str]]], size: int):
+    """Lista de tableros de la API -> matriz (n, size*size) de int8."""
+    codes = bytes(map(_CELL_CODES.__getitem__, chain.from_iterable(boards)))
+    return np.frombuffer(codes, dtype=np.int8).reshape(len(boards), size * size)
+
+
+def winner_codes(encoded, size: int):
+    """Código IN_PROGRESS / X_WINS / O_WINS / TIE por fila de `encoded`."""
+    on_lines = encoded[:, line_indices(size)]              # (n, n_líneas, size)
+    x_lines = (on_lines == 1).all(axis=2)                   # (n, n_líneas)
+    o_lines = (on_lines == 2).all(axis=2)
+    any_line = x_lines | o_lines
+
+    # Primera línea completa de cada tablero (argmax da el primer True)
+    first = any_line.argmax(axis=1)
+    rows = np.arange(len(encoded))
+    line_winner = np.where(x_lines[rows, first], X_WINS, O_WINS)
+    full = (encoded != 0).all(axis=1)
+    return np.where(any_line.any(axis=1), line_winner,
+                    np.where(full, TIE, IN_PROGRESS)).astype(np.int8)
+
+
+def scalar_winners(boards: Sequence[Sequence[Optional[str]]], size: int) -> List[Optional[str]]:
+    """Un tablero cada vez con los bitboards (ruta sin NumPy)."""
+    return [bitboard.winner(*bitboard.from_list(board, size), size) for board in boards]
+
+
+def batch_winners(boards: Sequence[Sequence[Optional[str]]], size: int) -> List[Optional[str]]:
+    """'X', 'O', 'Tie' o None por tablero, como check_winner, para todo el lote."""
+    if not HAS_NUMPY or not boards:
+        return scalar_winners(boards, size)
+    return [WINNERS[code] for code in winner_codes(encode_boards(boards, size), size).tolist()]
+
+
+def _random_boards(count: int, size: int, seed: int) -> List[List[Optional[str]]]:
+    rng = random.Random(seed)
+    return [rng.choices((None, 'X', 'O'), k=size * size) for _ in range(count)]
+
+
+def _benchmark(count: int, size: int, seed: int):
+    boards = _random_boards(count, size, seed)
+
+    started = time.perf_counter()
+    expected = scalar_winners(boards, size)
+    scalar = time.perf_counter() - started
+    print(f"escalar:     {scalar:8.3f} s  ({count / scalar:12,.0f} tableros/s)")
+
+    if not HAS_NUMPY:
+        print("NumPy no está instalado: solo se mide la ruta escalar")
+        return
+
+    started = time.perf_counter()
+    encoded = encode_boards(boards, size)
+    encoding = time.perf_counter() - started
+    started = time.perf_counter()
+    codes = winner_codes(encoded, size)
+    vectorized = time.perf_counter() - started
+    total = encoding + vectorized
+    print(f"codificar:   {encoding:8.3f} s")
+    print(f"vectorizado: {vectorized:8.3f} s  ({count / vectorized:12,.0f} tableros/s)")
+    print(f"total:       {total:8.3f} s  (x{scalar / total:.1f} frente a escalar)")
+
+    if [WINNERS[code] for code in codes.tolist()] != expected:
+        raise SystemExit("Los resultados vectorizados no coinciden con check_winner")
+    print("resultados idénticos a check_winner")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la detección de ganador escalar y vectorizada")
+    parser.add_argument("--boards", type=int, default=1_000_000)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    _benchmark(args.boards, args.size, args.seed)
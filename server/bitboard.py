@@ -0,0 +1,96 @@
+"""
+Representación del tablero como bitboards: un entero por jugador donde el bit
+`i` indica que la casilla `i` está ocupada por ese jugador.
+
+Las máscaras de líneas ganadoras se precalculan una vez por tamaño. La lista
+de `None`/'X'/'O' solo se usa en la frontera de la API (JSON, prompts).
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+
+@lru_cache(maxsize=None)
+def full_mask(size: int) -> int:
+    """Máscara con todas las casillas del tablero."""
+    return (1 << (size * size)) - 1
+
+
+@lru_cache(maxsize=None)
+def line_masks(size: int) -> Tuple[int, ...]:
+    """Máscaras de las líneas ganadoras, en el mismo orden que check_winner."""
+    masks = []
+    for i in range(size):
+        masks.append(sum(1 << (i * size + j) for j in range(size)))
+        masks.append(sum(1 << (j * size + i) for j in range(size)))
+    masks.append(sum(1 << (i * size + i) for i in range(size)))
+    masks.append(sum(1 << (i * size + (size - 1 - i)) for i in range(size)))
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def cell_line_masks(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """Para cada casilla, las máscaras de las líneas que pasan por ella."""
+    masks = line_masks(size)
+    return tuple(
+        tuple(mask for mask in masks if mask >> cell & 1)
+        for cell in range(size * size)
+    )
+
+
+@lru_cache(maxsize=None)
+def cell_lines(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """Para cada casilla, los índices (en line_masks) de las líneas que la contienen."""
+    masks = line_masks(size)
+    return tuple(
+        tuple(index for index, mask in enumerate(masks) if mask >> cell & 1)
+        for cell in range(size * size)
+    )
+
+
+def from_list(board: Sequence[Optional[str]], size: int) -> Tuple[int, int]:
+    """Convierte la lista de la API en (bits de X, bits de O)."""
+    x_bits = o_bits = 0
+    for cell in range(size * size):
+        mark = board[cell]
+        if mark == 'X':
+            x_bits |= 1 << cell
+        elif mark == 'O':
+            o_bits |= 1 << cell
+    return x_bits, o_bits
+
+
+def to_list(x_bits: int, o_bits: int, size: int) -> List[Optional[str]]:
+    """Vista de lista de `None`/'X'/'O' para serializar."""
+    return [
+        'X' if x_bits >> cell & 1 else 'O' if o_bits >> cell & 1 else None
+        for cell in range(size * size)
+    ]
+
+
+def iter_cells(bits: int):
+    """Itera las casillas (índices) de los bits encendidos, de menor a mayor."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def has_line(bits: int, masks: Sequence[int]) -> bool:
+    """True si `bits` contiene alguna de las líneas."""
+    for mask in masks:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+def winner(x_bits: int, o_bits: int, size: int) -> Optional[str]:
+    """'X', 'O', 'Tie' o None, con la misma semántica que check_winner."""
+    for mask in line_masks(size):
+        if x_bits & mask == mask:
+            return 'X'
+        if o_bits & mask == mask:
+            return 'O'
+    if x_bits | o_bits == full_mask(size):
+        return 'Tie'
+    return None
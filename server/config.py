@@ -1,3 +1,4 @@
+import json
 import os
 import platform
 from typing import Optional
@@ -10,10 +11,90 @@ class Config:
     OLLAMA_PORT = int(os.getenv('OLLAMA_PORT', '11434'))
     OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama2')
     
+    # Monitor de salud de Ollama (segundos) y circuit breaker
+    OLLAMA_HEALTH_INTERVAL = float(os.getenv('OLLAMA_HEALTH_INTERVAL', '30'))
+    OLLAMA_HEALTH_MAX_BACKOFF = float(os.getenv('OLLAMA_HEALTH_MAX_BACKOFF', '300'))
+    OLLAMA_FAILURE_THRESHOLD = int(os.getenv('OLLAMA_FAILURE_THRESHOLD', '3'))
+    
+    # Pool de conexiones HTTP hacia Ollama
+    OLLAMA_MAX_CONNECTIONS = int(os.getenv('OLLAMA_MAX_CONNECTIONS', '20'))
+    OLLAMA_MAX_KEEPALIVE = int(os.getenv('OLLAMA_MAX_KEEPALIVE', '10'))
+    OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv('OLLAMA_KEEPALIVE_EXPIRY', '60'))
+    
+    # Generación: streaming con corte temprano, límite de tokens y secuencias de parada
+    OLLAMA_STREAM = os.getenv('OLLAMA_STREAM', 'true').lower() == 'true'
+    OLLAMA_NUM_PREDICT = int(os.getenv('OLLAMA_NUM_PREDICT', '16'))
+    OLLAMA_STOP = json.loads(os.getenv('OLLAMA_STOP', '["\\n\\n"]'))
+    # En streaming Ollama solo informa de prompt_eval en el fragmento final: 1 de
+    # cada N generaciones por etiqueta se lee completa para medirlo (0 = nunca)
+    OLLAMA_EVAL_SAMPLE_EVERY = int(os.getenv('OLLAMA_EVAL_SAMPLE_EVERY', '20'))
+    
+    # Despacho de generaciones: peticiones en paralelo y ventana de agrupación
+    OLLAMA_NUM_PARALLEL = int(os.getenv('OLLAMA_NUM_PARALLEL', '4'))
+    OLLAMA_BATCH_SIZE = int(os.getenv('OLLAMA_BATCH_SIZE', '4'))
+    OLLAMA_BATCH_WAIT_MS = float(os.getenv('OLLAMA_BATCH_WAIT_MS', '5'))
+    
+    # Caché de movimientos del LLM (MOVE_CACHE_PATH vacío = solo en memoria)
+    MOVE_CACHE_SIZE = int(os.getenv('MOVE_CACHE_SIZE', '10000'))
+    MOVE_CACHE_TTL = float(os.getenv('MOVE_CACHE_TTL', '86400'))
+    MOVE_CACHE_PATH = os.getenv('MOVE_CACHE_PATH') or None
+    
+    # Selección de movimiento: plazo para la respuesta del LLM y búsqueda en paralelo
+    AI_MOVE_DEADLINE_MS = int(os.getenv('AI_MOVE_DEADLINE_MS', '2000'))
+    AI_HEDGED = os.getenv('AI_HEDGED', 'true').lower() == 'true'
+    
+    # Mantener el modelo cargado en Ollama mientras hay partidas
+    OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '10m')
+    OLLAMA_KEEP_ALIVE_INTERVAL = float(os.getenv('OLLAMA_KEEP_ALIVE_INTERVAL', '240'))
+    OLLAMA_IDLE_UNLOAD = float(os.getenv('OLLAMA_IDLE_UNLOAD', '900'))
+    OLLAMA_WARMUP = os.getenv('OLLAMA_WARMUP', 'true').lower() == 'true'
+    
     # Configuración del servidor
     SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
     SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
     
+    # Modo producción (ENVIRONMENT=production): workers de uvicorn (0 = número
+    # de CPUs), límites de WebSocket y segundos de espera al apagar
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))
+    WS_PING_INTERVAL = float(os.getenv('WS_PING_INTERVAL', '20'))
+    WS_PING_TIMEOUT = float(os.getenv('WS_PING_TIMEOUT', '20'))
+    WS_MAX_SIZE = int(os.getenv('WS_MAX_SIZE', '65536'))
+    SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '15'))
+    
+    # Almacén de partidas: memory | redis (REDIS_URL admite varias URLs separadas por comas).
+    # Solo Redis con REDIS_URL sobrevive al worker: con memory (o redis sin URL)
+    # una partida no se reanuda en otro worker y, al reiniciar, el movimiento
+    # del agente en curso se pierde
+    SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+    REDIS_URL = os.getenv('REDIS_URL') or None
+    SESSION_TTL = float(os.getenv('SESSION_TTL', '3600'))
+    
+    # Tabla de solución 3x3 precalculada (python server/opening_book.py)
+    OPENING_BOOK_PATH = os.getenv('OPENING_BOOK_PATH') or None
+    
+    # Presupuesto de cómputo por movimiento del motor de búsqueda (0 = sin límite).
+    # No es el SLO de latencia (p99 < 50 ms): se deja margen para el rebase del
+    # último nodo, las pausas del GC y la espera en la cola del ejecutor
+    SEARCH_TIME_BUDGET_MS = int(os.getenv('SEARCH_TIME_BUDGET_MS', '35'))
+    SEARCH_NODE_BUDGET = int(os.getenv('SEARCH_NODE_BUDGET', '0'))
+    # Entradas de la tabla de transposición por motor, sumando todos los tamaños
+    # (cada proceso del pool tiene su motor: la memoria se multiplica por workers)
+    SEARCH_TT_MAX_ENTRIES = int(os.getenv('SEARCH_TT_MAX_ENTRIES', '250000'))
+    
+    # Ejecutor de búsqueda: auto | process | thread | inline
+    SEARCH_EXECUTOR = os.getenv('SEARCH_EXECUTOR', 'auto')
+    SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', '0'))  # 0 = número de CPUs
+    SEARCH_QUEUE_LIMIT = int(os.getenv('SEARCH_QUEUE_LIMIT', '64'))
+    
+    # Endpoints por lotes: máximo de posiciones por petición y posiciones por tarea del ejecutor
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '10000'))
+    BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '32'))
+    
+    # Logging: nivel, formato (json | text) y fracción de cada evento que se registra
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_SAMPLE_RATES = json.loads(os.getenv('LOG_SAMPLE_RATES', '{"ws.message": 0.01}'))
+    
     # Configuración específica por plataforma
     PLATFORM = platform.system().lower()
     
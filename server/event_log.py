@@ -0,0 +1,126 @@
+"""
+Logging estructurado para el servidor.
+
+- Cada evento es una línea JSON compacta ({"ts", "level", "logger", "event",
+  ...campos}) en lugar de mensajes f-string con el estado completo.
+- Formateo diferido: los campos viajan tal cual en el LogRecord y solo se
+  serializan si el registro llega a emitirse, y además en el hilo del
+  QueueListener, no en el event loop.
+- Escritura no bloqueante: los handlers reales quedan detrás de un
+  QueueHandler, así que el loop solo encola el registro.
+- Muestreo por evento: LOG_SAMPLE_RATES asigna a cada evento la fracción que
+  se emite (1 = todos, 0 = ninguno); los eventos sin tasa se emiten siempre.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from typing import Any, Dict, Optional
+
+from config import Config
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro; los campos del evento van al primer nivel."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = getattr(record, 'event', None)
+        entry: Dict[str, Any] = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': event or record.getMessage(),
+        }
+        if event:
+            entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que registra: el mensaje se
+    formatea en el listener. Los registros no salen del proceso, así que no
+    hace falta aplanarlos.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(level: str = None, fmt: str = None):
+    """
+    Instala el QueueHandler en el logger raíz (una sola vez). `fmt` es 'json'
+    o 'text'; por defecto se toman LOG_LEVEL y LOG_FORMAT de Config. Igual
+    que logging.basicConfig, no hace nada si el logger raíz ya tiene handlers.
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return
+
+    stream = logging.StreamHandler()
+    if (fmt or Config.LOG_FORMAT) == 'json':
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(records))
+    root.setLevel(level or Config.LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Vacía la cola y detiene el hilo de escritura."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class EventLogger:
+    """Registra eventos con nombre y campos, aplicando la tasa de muestreo del evento."""
+
+    def __init__(self, name: str, sample_rates: Optional[Dict[str, float]] = None):
+        self.logger = logging.getLogger(name)
+        self.sample_rates = Config.LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+
+    def event(self, event: str, level: int = logging.INFO, exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = self.sample_rates.get(event, 1.0)
+        if rate < 1.0 and (rate <= 0.0 or random.random() >= rate):
+            return
+        if rate < 1.0:
+            # Permite reconstruir los totales a partir de la muestra
+            fields['sample_rate'] = rate
+        self.logger.log(level, '%s %s', event, fields, exc_info=exc_info,
+                        extra={'event': event, 'fields': fields})
+
+    def info(self, event: str, **fields):
+        self.event(event, logging.INFO, **fields)
+
+    def debug(self, event: str, **fields):
+        self.event(event, logging.DEBUG, **fields)
+
+    def warning(self, event: str, **fields):
+        self.event(event, logging.WARNING, **fields)
+
+    def error(self, event: str, exc_info=None, **fields):
+        self.event(event, logging.ERROR, exc_info=exc_info, **fields)
+
+
+def elapsed_ms(started: float) -> float:
+    """Milisegundos desde `started` (time.perf_counter()), redondeados para el log."""
+    return round((time.perf_counter() - started) * 1000, 3)
@@ -1,11 +1,20 @@
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, List, Tuple
+import json
 import logging
 import asyncio
 
 # Importar nuestro cliente Ollama personalizado
 from ollama_integration import tic_tac_toe_ai, ollama_client
+import batch_winner
+import bitboard
+import metrics
+import opening_book
+import search_engine
+from config import Config
+from search_executor import ExecutorBusy, search_executor
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +40,8 @@ async def make_move_api(state: GameState):
     """Endpoint para realizar un movimiento usando IA o Minimax."""
     try:
         # Usar el agente de IA con Ollama
-        position = await tic_tac_toe_ai.make_move(state.board, state.current_player)
+        decision = await tic_tac_toe_ai.choose_move(state.board, state.current_player, state.size)
+        position = decision.position
         
         if position == -1:
             return {"error": "No hay movimientos disponibles"}
@@ -44,7 +54,9 @@ async def make_move_api(state: GameState):
             "position": position,
             "player": state.current_player,
             "board": new_board,
-            "used_ai": await ollama_client.is_available()
+            "used_ai": decision.source == "llm",
+            "source": decision.source,
+            "fallback_reason": decision.reason
         }
     except Exception as e:
         logger.error(f"Error en make_move_api: {e}")
@@ -53,9 +65,73 @@ async def make_move_api(state: GameState):
 @router.post("/check_winner")
 async def check_winner_api(state: BoardState):
     """Endpoint para verificar si hay un ganador."""
-    winner = check_winner(state.board, state.size)
+    with metrics.win_detection_seconds.time():
+        winner = check_winner(state.board, state.size)
     return {"winner": winner}
 
+@router.post("/make_move_batch")
+async def make_move_batch_api(states: List[GameState], stream: bool = False):
+    """
+    Mejor movimiento para cada estado usando solo el motor de búsqueda (sin
+    LLM). Las posiciones repetidas se evalúan una vez y el resto se reparte en
+    bloques entre los workers del ejecutor de búsqueda. Los resultados siguen
+    el orden de la petición; con ?stream=true se envían como NDJSON, una línea
+    por estado en cuanto está disponible.
+    """
+    if len(states) > Config.BATCH_MAX_ITEMS:
+        return {"error": f"Máximo {Config.BATCH_MAX_ITEMS} posiciones por lote"}
+    
+    keys = [(tuple(state.board), state.current_player, state.size) for state in states]
+    scheduled = _schedule_moves(keys)
+    
+    async def resolve(key: PositionKey) -> dict:
+        entry = scheduled[key]
+        if isinstance(entry, dict):
+            return entry
+        task, offset = entry
+        return _move_result(key[1], (await task)[offset])
+    
+    def cancel():
+        for entry in scheduled.values():
+            if isinstance(entry, tuple):
+                entry[0].cancel()
+    
+    if stream:
+        return _ndjson_response(keys, resolve, cancel)
+    try:
+        return {"results": [await resolve(key) for key in keys], "unique": len(scheduled)}
+    finally:
+        cancel()
+
+@router.post("/check_winner_batch")
+async def check_winner_batch_api(states: List[BoardState], stream: bool = False):
+    """
+    Ganador de cada tablero (mismo orden que la petición, NDJSON con
+    ?stream=true). Los tableros únicos de cada tamaño se evalúan juntos con
+    batch_winner (vectorizado si NumPy está instalado).
+    """
+    if len(states) > Config.BATCH_MAX_ITEMS:
+        return {"error": f"Máximo {Config.BATCH_MAX_ITEMS} posiciones por lote"}
+    
+    keys = [(tuple(state.board), state.size) for state in states]
+    winners = {}
+    by_size: Dict[int, list] = {}
+    for board, size in dict.fromkeys(keys):
+        error = _position_error(board, size)
+        if error:
+            winners[board, size] = {"error": error}
+        else:
+            by_size.setdefault(size, []).append(board)
+    for size, boards in by_size.items():
+        for board, winner in zip(boards, batch_winner.batch_winners(boards, size)):
+            winners[board, size] = {"winner": winner}
+    
+    if stream:
+        async def resolve(key):
+            return winners[key]
+        return _ndjson_response(keys, resolve)
+    return {"results": [winners[key] for key in keys], "unique": len(winners)}
+
 @router.post("/start_game")
 async def start_game():
     """Endpoint para iniciar un nuevo juego."""
@@ -65,71 +141,131 @@ async def start_game():
 @router.get("/ai_status")
 async def ai_status():
     """Endpoint para verificar el estado del sistema de IA."""
-    ollama_available = await ollama_client.is_available()
-    models = await ollama_client.list_models() if ollama_available else []
+    ollama_available = ollama_client.available
+    models = ollama_client.models if ollama_available else []
     
     return {
         "ollama_available": ollama_available,
         "models": models,
-        "fallback": "minimax" if not ollama_available else None
+        "fallback": "minimax" if not ollama_available else None,
+        "search_executor": search_executor.stats(),
+        "move_cache": tic_tac_toe_ai.move_cache.stats() if tic_tac_toe_ai.move_cache else None,
+        "dispatcher": tic_tac_toe_ai.dispatcher.stats(),
+        "prompt_eval": ollama_client.prompt_eval_stats()
     }
 
 
 # Algoritmo Minimax para uso como fallback
 def minimax_algorithm(board: List[Optional[str]], current_player: str, size: int = 3) -> int:
     """
-    Implementación del algoritmo Minimax que retorna solo la posición del mejor movimiento.
-    Usado como fallback cuando Ollama no está disponible.
+    Retorna solo la posición del mejor movimiento.
+    Usado como fallback cuando Ollama no está disponible. En 3x3 responde desde
+    la tabla de aperturas precalculada; si no está disponible delega en el motor
+    alpha-beta con tabla de transposición de search_engine.
     """
     if len(board) < size * size:
         raise ValueError(f"El board debe tener al menos {size*size} posiciones, tiene {len(board)}.")
 
-    opponent = 'O' if current_player == 'X' else 'X'
-
-    # Función Minimax
-    def minimax(board, depth, is_maximizing):
-        winner = check_winner(board, size)
-        if winner == current_player:
-            return 1
-        elif winner == opponent:
-            return -1
-        elif all(spot is not None for spot in board):
-            return 0
-
-        if is_maximizing:
-            best_score = -float('inf')
-            for i in range(size * size):
-                if board[i] is None:
-                    board[i] = current_player
-                    score = minimax(board, depth + 1, False)
-                    board[i] = None
-                    best_score = max(best_score, score)
-            return best_score
+    position = opening_book.lookup(board, current_player, size)
+    if position is not None:
+        return position
+
+    return search_engine.best_move(board, current_player, size)
+
+
+# Evaluación por lotes: posición única = (tablero, jugador, tamaño)
+PositionKey = Tuple[Tuple[Optional[str], ...], str, int]
+
+
+def _position_error(board, size: int, player: Optional[str] = None) -> Optional[str]:
+    """Motivo por el que una posición de un lote no se puede evaluar (None si es válida)."""
+    if not 3 <= size <= 9:
+        return f"Tamaño no soportado: {size}"
+    if len(board) != size * size:
+        return f"El board debe tener {size*size} posiciones, tiene {len(board)}."
+    if any(cell not in (None, 'X', 'O') for cell in board):
+        return "El board solo puede contener 'X', 'O' o null"
+    if player is not None and player not in ('X', 'O'):
+        return f"Jugador inválido: {player}"
+    return None
+
+
+def minimax_batch(positions: List[PositionKey]) -> List[Tuple[int, Optional[str]]]:
+    """
+    Evalúa un bloque de posiciones en una sola tarea del ejecutor (un viaje al
+    worker por bloque y no por tablero). Retorna (posición, error) por posición.
+    """
+    results = []
+    for board, player, size in positions:
+        try:
+            results.append((minimax_algorithm(list(board), player, size), None))
+        except Exception as e:
+            results.append((-1, str(e)))
+    return results
+
+
+def _move_result(player: str, outcome: Tuple[int, Optional[str]]) -> dict:
+    position, error = outcome
+    if error is not None:
+        return {"error": error}
+    if position == -1:
+        return {"error": "No hay movimientos disponibles"}
+    return {"position": position, "player": player}
+
+
+async def _run_chunk(chunk: List[PositionKey], slots: asyncio.Semaphore) -> List[Tuple[int, Optional[str]]]:
+    async with slots:
+        try:
+            return await search_executor.run(minimax_batch, chunk)
+        except ExecutorBusy as e:
+            return [(-1, str(e))] * len(chunk)
+
+
+def _schedule_moves(keys: List[PositionKey]) -> Dict[PositionKey, Any]:
+    """
+    Programa la evaluación de cada posición única. El valor es el resultado
+    (posiciones inválidas y tabla de aperturas, resueltas en el loop) o
+    (tarea, índice) del bloque enviado al ejecutor. Como mucho hay un bloque
+    por worker en vuelo, para no llenar la cola que comparten las partidas.
+    """
+    scheduled: Dict[PositionKey, Any] = {}
+    pending = []
+    for key in dict.fromkeys(keys):
+        board, player, size = key
+        error = _position_error(board, size, player)
+        if error is not None:
+            scheduled[key] = {"error": error}
+            continue
+        position = opening_book.lookup(list(board), player, size)
+        if position is not None:
+            scheduled[key] = _move_result(player, (position, None))
         else:
-            best_score = float('inf')
-            for i in range(size * size):
-                if board[i] is None:
-                    board[i] = opponent
-                    score = minimax(board, depth + 1, True)
-                    board[i] = None
-                    best_score = min(best_score, score)
-            return best_score
-
-    best_score = -float('inf')
-    best_move = None
-    for i in range(size * size):
-        if board[i] is None:
-            board[i] = current_player
-            score = minimax(board, 0, False)
-            board[i] = None
-            if score > best_score:
-                best_score = score
-                best_move = i
-
-    if best_move is not None:
-        return best_move
-    else:
-        return -1  # No hay movimientos disponibles
+            pending.append(key)
+    
+    slots = asyncio.Semaphore(search_executor.max_workers)
+    chunk_size = max(1, Config.BATCH_CHUNK_SIZE)
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        task = asyncio.create_task(_run_chunk(chunk, slots))
+        for offset, key in enumerate(chunk):
+            scheduled[key] = (task, offset)
+    return scheduled
+
+
+def _ndjson_response(keys: list, resolve: Callable[[Any], Awaitable[dict]],
+                     cleanup: Optional[Callable[[], None]] = None) -> StreamingResponse:
+    """Una línea JSON por elemento, en el orden de la petición, según se resuelven."""
+    async def lines() -> AsyncIterator[str]:
+        try:
+            for index, key in enumerate(keys):
+                result = await resolve(key)
+                yield json.dumps({"index": index, **result}, separators=(',', ':')) + "\n"
+        finally:
+            # Si el cliente corta la descarga no se sigue calculando
+            if cleanup is not None:
+                cleanup()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 # Implementación de movimiento inteligente usando Minimax (función legacy para compatibilidad)
@@ -147,29 +283,9 @@ def make_move_endpoint(board: List[Optional[str]], current_player: str, size: in
 
 # Función para verificar ganador
 def check_winner(board: List[Optional[str]], size: int) -> Optional[str]:
-    """Verifica si hay un ganador en el tablero."""
-    # Combinaciones ganadoras
-    winning_combinations = []
-
-    # Horizontales y verticales
-    for i in range(size):
-        # Horizontales
-        winning_combinations.append([i * size + j for j in range(size)])
-        # Verticales
-        winning_combinations.append([j * size + i for j in range(size)])
-
-    # Diagonales
-    winning_combinations.append([i * size + i for i in range(size)])
-    winning_combinations.append([i * size + (size - 1 - i) for i in range(size)])
-
-    for combo in winning_combinations:
-        if all(board[pos] == board[combo[0]] and board[pos] is not None for pos in combo):
-            return board[combo[0]]  # Retorna 'X' o 'O' como ganador
-
-    if all(spot is not None for spot in board):
-        return "Tie"  # Empate
-
-    return None  # El juego continúa
+    """Verifica si hay un ganador en el tablero usando las máscaras de bitboard."""
+    x_bits, o_bits = bitboard.from_list(board, size)
+    return bitboard.winner(x_bits, o_bits, size)
 
 
 # Clase GameAgent para compatibilidad con validación
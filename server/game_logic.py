@@ -1,12 +1,74 @@
+import bitboard
+
+
 class TicTacToeGame:
     def __init__(self, size=3, board=None, current_player='X'):
         self.size = size
-        self.board = board if board is not None else [None for _ in range(size * size)]
+        self._full = bitboard.full_mask(size)
+        self._cell_lines = bitboard.cell_lines(size)
+        self.x_bits = 0
+        self.o_bits = 0
+        self._reset_counters()
+        if board is not None:
+            self.board = board
         self.current_player = current_player
         self.last_move = None
         self.moves_history = []
         self.game_over = False
-    
+
+    @property
+    def board(self) -> list:
+        """Vista del tablero como lista de None/'X'/'O' (solo para la API)."""
+        return bitboard.to_list(self.x_bits, self.o_bits, self.size)
+
+    @board.setter
+    def board(self, board: list):
+        self.x_bits, self.o_bits = bitboard.from_list(board, self.size)
+        self._reset_counters()
+        for player, bits in (('X', self.x_bits), ('O', self.o_bits)):
+            for cell in bitboard.iter_cells(bits):
+                self._count_move(cell, player, 1)
+
+    @property
+    def winner(self):
+        """
+        'X', 'O', 'Tie' o None (misma semántica que check_winner), calculado
+        en O(1) a partir de los contadores por línea.
+        """
+        x_lines, o_lines = self._completed['X'], self._completed['O']
+        if x_lines and o_lines:
+            # Solo posible en tableros cargados a mano: desempatar como check_winner
+            return bitboard.winner(self.x_bits, self.o_bits, self.size)
+        if x_lines:
+            return 'X'
+        if o_lines:
+            return 'O'
+        if self._filled == self.size * self.size:
+            return 'Tie'
+        return None
+
+    @property
+    def is_terminal(self) -> bool:
+        """True si la partida terminó por victoria o empate."""
+        return self.winner is not None
+
+    def _reset_counters(self):
+        lines = len(bitboard.line_masks(self.size))
+        self._line_counts = {'X': [0] * lines, 'O': [0] * lines}
+        self._completed = {'X': 0, 'O': 0}
+        self._filled = 0
+
+    def _count_move(self, position: int, player: str, delta: int):
+        """Actualiza los contadores de las líneas que pasan por `position`."""
+        counts = self._line_counts[player]
+        for line in self._cell_lines[position]:
+            if delta < 0 and counts[line] == self.size:
+                self._completed[player] -= 1
+            counts[line] += delta
+            if delta > 0 and counts[line] == self.size:
+                self._completed[player] += 1
+        self._filled += delta
+
     def make_move(self, position: int) -> bool:
         """
         Realiza un movimiento en el tablero.
@@ -14,8 +76,12 @@ class TicTacToeGame:
         """
         if not self._is_valid_move(position) or self.game_over:
             return False
-            
-        self.board[position] = self.current_player
+
+        if self.current_player == 'X':
+            self.x_bits |= 1 << position
+        else:
+            self.o_bits |= 1 << position
+        self._count_move(position, self.current_player, 1)
         self.last_move = position
         self.moves_history.append({
             'position': position,
@@ -23,30 +89,34 @@ class TicTacToeGame:
         })
         self.current_player = 'O' if self.current_player == 'X' else 'X'
         return True
-    
+
     def _is_valid_move(self, position: int) -> bool:
         """Verifica si un movimiento es válido"""
         if not isinstance(position, int):
             return False
-        if position < 0 or position >= len(self.board):
+        if position < 0 or position >= self.size * self.size:
             return False
-        if self.board[position] is not None:
+        if (self.x_bits | self.o_bits) >> position & 1:
             return False
         return True
-    
+
     def get_valid_moves(self) -> list:
         """Retorna una lista de movimientos válidos"""
-        return [i for i, cell in enumerate(self.board) if cell is None]
-    
+        return list(bitboard.iter_cells(self._full & ~(self.x_bits | self.o_bits)))
+
     def is_board_full(self) -> bool:
         """Verifica si el tablero está lleno"""
-        return None not in self.board
-    
+        return self.x_bits | self.o_bits == self._full
+
     def undo_last_move(self) -> bool:
         """Deshace el último movimiento"""
         if not self.moves_history:
             return False
         last_move = self.moves_history.pop()
-        self.board[last_move['position']] = None
+        clear = ~(1 << last_move['position'])
+        self.x_bits &= clear
+        self.o_bits &= clear
+        self._count_move(last_move['position'], last_move['player'], -1)
         self.current_player = last_move['player']
+        self.last_move = self.moves_history[-1]['position'] if self.moves_history else None
         return True
@@ -0,0 +1,285 @@
+"""
+Servidor Ollama simulado para pruebas de carga y de latencia sin GPU.
+
+Implementa /api/tags y /api/generate (completa y en streaming NDJSON) con el
+formato de Ollama, de modo que OllamaClient, el monitor de salud y el
+despachador se ejercitan igual que contra un Ollama real:
+
+- Latencia configurable por distribución (ver parse_latency): hasta la
+  respuesta o el primer fragmento, y entre fragmentos en streaming.
+- Inyección de fallos: errores 500 genéricos y errores de memoria con el
+  texto "memory" que el monitor de salud trata como Ollama no disponible
+  (también en la carga del modelo con prompt vacío que hace probe()).
+- Respuestas guionizadas: primera casilla libre, casilla libre al azar,
+  búsqueda (el motor del servidor), respuesta inválida o una lista fija que
+  se repite en orden.
+- num_parallel limita las generaciones simultáneas como OLLAMA_NUM_PARALLEL;
+  el resto espera turno.
+
+Uso (y el servidor del juego apuntando a él):
+    python mock_ollama.py --port 11435 --latency lognormal:200:0.5 --oom-rate 0.01
+    OLLAMA_PORT=11435 python server.py
+    python tournament.py --matchups llm:random --url http://127.0.0.1:11435
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from config import Config
+
+# Genera una latencia en segundos a partir del generador aleatorio del servidor
+Latency = Callable[[random.Random], float]
+
+OOM_ERROR = "model requires more system memory (5.6 GiB) than is available (3.1 GiB)"
+INTERNAL_ERROR = "mock: error interno simulado"
+
+_FREE_CELLS = re.compile(r"Libres:([ \d]*)")
+_PLAYER = re.compile(r"Juegas: ([XO])")
+
+
+def parse_latency(spec: str) -> Latency:
+    """
+    Distribución de latencia en milisegundos:
+        fixed:MS | uniform:MIN:MAX | normal:MEDIA:DESV | exp:MEDIA |
+        lognormal:MEDIANA:SIGMA
+    Los valores negativos se recortan a 0.
+    """
+    kind, *params = spec.split(":")
+    try:
+        values = [float(param) for param in params]
+    except ValueError:
+        raise ValueError(f"Latencia inválida: {spec}") from None
+
+    samplers: Dict[str, Callable[..., Latency]] = {
+        "fixed": lambda ms: lambda rng: ms,
+        "uniform": lambda low, high: lambda rng: rng.uniform(low, high),
+        "normal": lambda mean, std: lambda rng: rng.gauss(mean, std),
+        "exp": lambda mean: lambda rng: rng.expovariate(1 / mean) if mean else 0.0,
+        "lognormal": lambda median, sigma: lambda rng: rng.lognormvariate(math.log(median), sigma),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Distribución desconocida: {kind}")
+    try:
+        sample_ms = samplers[kind](*values)
+    except TypeError:
+        raise ValueError(f"Número de parámetros incorrecto para {kind}: {spec}") from None
+    return lambda rng: max(0.0, sample_ms(rng)) / 1000
+
+
+def _parse_prompt(prompt: str):
+    """Casillas libres y jugador del prompt de prompt_builder (None si no es de partida)."""
+    free = _FREE_CELLS.search(prompt)
+    if free is None:
+        return None, None
+    player = _PLAYER.search(prompt)
+    return [int(cell) for cell in free.group(1).split()], player.group(1) if player else 'O'
+
+
+def _search_answer(prompt: str, free: List[int], player: str) -> str:
+    """Movimiento del motor del servidor reconstruyendo el tablero del prompt."""
+    from game_agent import minimax_algorithm
+
+    rows = prompt.split("\nJuegas:")[0].split("\n")
+    size = len(rows)
+    board = [None if cell == '.' else cell for row in rows for cell in row]
+    if len(board) != size * size:
+        return str(free[0])
+    return str(minimax_algorithm(board, player, size))
+
+
+class MockOllamaSettings:
+    """Comportamiento del servidor simulado."""
+
+    ANSWERS = ("first-free", "random", "search", "invalid")
+
+    def __init__(self, models: Sequence[str] = (), latency: str = "fixed:0",
+                 token_latency: str = "fixed:0", error_rate: float = 0.0, oom_rate: float = 0.0,
+                 answers: str = "first-free", script: Sequence[str] = (), num_parallel: int = 0,
+                 seed: Optional[int] = None):
+        self.models = list(models) or [Config.OLLAMA_MODEL]
+        self.latency = parse_latency(latency)
+        self.token_latency = parse_latency(token_latency)
+        self.error_rate = error_rate
+        self.oom_rate = oom_rate
+        if answers not in self.ANSWERS:
+            raise ValueError(f"Modo de respuesta desconocido: {answers}")
+        self.answers = answers
+        # Respuestas fijas que se devuelven en orden (tienen prioridad sobre `answers`)
+        self.script = list(script)
+        self.num_parallel = num_parallel
+        self.seed = seed
+
+
+class MockOllama:
+    """Estado del servidor: generador aleatorio, guion, modelos cargados y contadores."""
+
+    def __init__(self, settings: MockOllamaSettings):
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self._script_index = 0
+        self._slots = asyncio.Semaphore(settings.num_parallel) if settings.num_parallel else None
+        self.loaded: Dict[str, float] = {}
+        self.stats = {"tags": 0, "generate": 0, "stream": 0, "loads": 0, "unloads": 0,
+                      "errors": 0, "oom": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def answer(self, prompt: str) -> str:
+        if self.settings.script:
+            answer = self.settings.script[self._script_index % len(self.settings.script)]
+            self._script_index += 1
+            return answer
+        free, player = _parse_prompt(prompt)
+        if free is None or self.settings.answers == "invalid":
+            return "No estoy seguro."
+        if not free:
+            return "FULL"
+        if self.settings.answers == "random":
+            return str(self.rng.choice(free))
+        if self.settings.answers == "search":
+            return _search_answer(prompt, free, player)
+        return str(free[0])
+
+    @asynccontextmanager
+    async def generation_slot(self):
+        """Ocupa un slot de generación (num_parallel) y cuenta las generaciones en curso."""
+        if self._slots is not None:
+            await self._slots.acquire()
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            yield
+        finally:
+            self.stats["in_flight"] -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def injected_error(self) -> Optional[JSONResponse]:
+        """Error simulado según las tasas configuradas (None si la petición sigue)."""
+        roll = self.rng.random()
+        if roll < self.settings.oom_rate:
+            self.stats["oom"] += 1
+            return JSONResponse({"error": OOM_ERROR}, status_code=500)
+        if roll < self.settings.oom_rate + self.settings.error_rate:
+            self.stats["errors"] += 1
+            return JSONResponse({"error": INTERNAL_ERROR}, status_code=500)
+        return None
+
+    def final_chunk(self, model: str, prompt: str, text: str, started: float) -> Dict[str, Any]:
+        total = time.perf_counter() - started
+        eval_count = max(1, len(text) // 4)
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": "",
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(total * 1e9),
+            "load_duration": 0,
+            # Aproximación de ~4 caracteres por token
+            "prompt_eval_count": max(1, len(prompt) // 4),
+            "prompt_eval_duration": int(total * 0.2 * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int(total * 0.8 * 1e9),
+        }
+
+
+def create_app(settings: Optional[MockOllamaSettings] = None) -> FastAPI:
+    mock = MockOllama(settings or MockOllamaSettings())
+    app = FastAPI(title="Mock Ollama")
+    app.state.mock = mock
+
+    @app.get("/api/tags")
+    async def tags():
+        mock.stats["tags"] += 1
+        return {"models": [{"name": name, "model": name, "size": 0} for name in mock.settings.models]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "")
+        prompt = payload.get("prompt", "")
+        started = time.perf_counter()
+
+        if model not in mock.settings.models:
+            return JSONResponse({"error": f"model '{model}' not found"}, status_code=404)
+
+        # Prompt vacío: solo cargar (o con keep_alive "0" descargar) el modelo
+        if not prompt:
+            if str(payload.get("keep_alive")) in ("0", "0s"):
+                mock.stats["unloads"] += 1
+                mock.loaded.pop(model, None)
+                return {"model": model, "response": "", "done": True, "done_reason": "unload"}
+            error = mock.injected_error()
+            if error is not None:
+                return error
+            mock.stats["loads"] += 1
+            mock.loaded[model] = time.time()
+            return {"model": model, "response": "", "done": True, "done_reason": "load"}
+
+        error = mock.injected_error()
+        if error is not None:
+            return error
+
+        stream = payload.get("stream", True)
+        mock.stats["stream" if stream else "generate"] += 1
+        mock.loaded[model] = time.time()
+        text = mock.answer(prompt)
+
+        if not stream:
+            async with mock.generation_slot():
+                await asyncio.sleep(mock.settings.latency(mock.rng))
+            return {**mock.final_chunk(model, prompt, text, started), "response": text}
+
+        async def chunks():
+            async with mock.generation_slot():
+                await asyncio.sleep(mock.settings.latency(mock.rng))
+                # Un fragmento por carácter, como tokens cortos
+                for index, char in enumerate(text):
+                    if index:
+                        await asyncio.sleep(mock.settings.token_latency(mock.rng))
+                    yield json.dumps({"model": model, "response": char, "done": False}) + "\n"
+            yield json.dumps(mock.final_chunk(model, prompt, text, started)) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {**mock.stats, "loaded": sorted(mock.loaded)}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor Ollama simulado")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", nargs="+", default=[Config.OLLAMA_MODEL, "phi3:mini"])
+    parser.add_argument("--latency", default="lognormal:150:0.4",
+                        help="Hasta la respuesta o el primer fragmento (ms), p. ej. fixed:100, uniform:50:300")
+    parser.add_argument("--token-latency", default="fixed:5", help="Entre fragmentos en streaming (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--oom-rate", type=float, default=0.0, help="Fracción de errores de memoria")
+    parser.add_argument("--answers", choices=MockOllamaSettings.ANSWERS, default="first-free")
+    parser.add_argument("--script", nargs="+", default=[], help="Respuestas fijas, en orden y en bucle")
+    parser.add_argument("--num-parallel", type=int, default=4, help="Generaciones simultáneas (0 = sin límite)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    mock_app = create_app(MockOllamaSettings(
+        models=args.models, latency=args.latency, token_latency=args.token_latency,
+        error_rate=args.error_rate, oom_rate=args.oom_rate, answers=args.answers,
+        script=args.script, num_parallel=args.num_parallel, seed=args.seed,
+    ))
+    uvicorn.run(mock_app, host=args.host, port=args.port, access_log=False)
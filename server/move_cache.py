@@ -0,0 +1,201 @@
+"""
+Caché de movimientos elegidos por el LLM.
+
+La clave es la forma canónica del tablero (las 8 simetrías del cuadrado se
+consideran la misma posición) junto con el jugador, el modelo y la versión del
+prompt. El movimiento se guarda en coordenadas del tablero canónico y se
+traduce de vuelta al tablero consultado. Expulsión LRU con TTL y, opcionalmente,
+persistencia en disco con sqlite3 para sobrevivir a reinicios.
+
+sqlite nunca se usa en el event loop. Al arrancar se cargan en la LRU las
+entradas vigentes más recientes y las consultas solo miran la memoria; put()
+deja el cambio en una cola y un hilo escritor propio aplica en una sola
+transacción todo lo que se haya acumulado mientras tanto.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from symmetry import canonical_form, move_from_canonical, move_to_canonical
+
+logger = logging.getLogger(__name__)
+
+_CELL_CODES = {None: '.', 'X': 'X', 'O': 'O'}
+
+
+class MoveCache:
+    """Caché LRU/TTL de movimientos del LLM, con contadores de aciertos y fallos."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        # Escrituras pendientes por clave (None = borrar), aplicadas por el hilo escritor
+        self._pending: Dict[str, Optional[Tuple[int, float]]] = {}
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self.db_batches = 0
+        if persist_path:
+            self._open_db(persist_path)
+
+    @classmethod
+    def from_config(cls) -> 'MoveCache':
+        return cls(
+            max_entries=Config.MOVE_CACHE_SIZE,
+            ttl=Config.MOVE_CACHE_TTL,
+            persist_path=Config.MOVE_CACHE_PATH,
+        )
+
+    def _open_db(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS moves "
+                "(key TEXT PRIMARY KEY, position INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='move-cache')
+            # Las entradas caducadas se borran del disco en segundo plano
+            self._writer.submit(self._run, "DELETE FROM moves WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.error(f"No se pudo abrir la caché de movimientos en {path}: {e}")
+            self._db = None
+
+    def _load(self):
+        """Carga las `max_entries` entradas vigentes escritas más recientemente."""
+        rows = self._db.execute(
+            "SELECT key, position, expires_at FROM moves WHERE expires_at > ? "
+            "ORDER BY expires_at DESC LIMIT ?", (time.time(), self.max_entries)
+        ).fetchall()
+        # De la más antigua a la más reciente, para que la LRU quede en ese orden
+        for key, position, expires_at in reversed(rows):
+            self._entries[key] = (position, expires_at)
+        if rows:
+            logger.info(f"Caché de movimientos: {len(rows)} entradas cargadas del disco")
+
+    @staticmethod
+    def _key(board: List[Optional[str]], player: str, model: str, prompt_version: str):
+        size = math.isqrt(len(board))
+        canonical, perm = canonical_form(board, size)
+        cells = ''.join(_CELL_CODES.get(cell, '?') for cell in canonical)
+        return f"{model}|{prompt_version}|{size}|{player}|{cells}", perm
+
+    def get(self, board: List[Optional[str]], player: str, model: str, prompt_version: str) -> Optional[int]:
+        """Movimiento cacheado para esta posición (en coordenadas de `board`) o None."""
+        key, perm = self._key(board, player, model, prompt_version)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is None or (self.ttl and entry[1] < now):
+            if entry is not None:
+                self._forget(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return move_from_canonical(entry[0], perm)
+
+    def put(self, board: List[Optional[str]], player: str, model: str, prompt_version: str, position: int):
+        """Guarda el movimiento elegido por el modelo para esta posición."""
+        key, perm = self._key(board, player, model, prompt_version)
+        entry = (move_to_canonical(position, perm), time.time() + self.ttl if self.ttl else float('inf'))
+        self._remember(key, entry)
+        self._persist(key, entry)
+
+    def _remember(self, key: str, entry: Tuple[int, float]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _forget(self, key: str):
+        self._entries.pop(key, None)
+        self._persist(key, None)
+
+    def _persist(self, key: str, entry: Optional[Tuple[int, float]]):
+        """Encola la escritura (o el borrado) y programa el hilo escritor si está libre."""
+        if self._db is None:
+            return
+        with self._lock:
+            self._pending[key] = entry
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._writer.submit(self.flush)
+
+    def flush(self):
+        """Aplica las escrituras pendientes en una sola transacción (en el hilo escritor)."""
+        if self._db is None:
+            return
+        # El lock solo protege el intercambio de la cola: put() no espera al commit
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        if not pending:
+            return
+        try:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO moves (key, position, expires_at) VALUES (?, ?, ?)",
+                [(key, *entry) for key, entry in pending.items() if entry is not None],
+            )
+            self._db.executemany(
+                "DELETE FROM moves WHERE key = ?",
+                [(key,) for key, entry in pending.items() if entry is None],
+            )
+            self._db.commit()
+            self.db_batches += 1
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudieron persistir {len(pending)} movimientos en caché: {e}")
+
+    def _run(self, sql: str, params: tuple = ()):
+        """Sentencia suelta en el hilo escritor, en orden con las escrituras."""
+        try:
+            self._db.execute(sql, params)
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Error en la caché de movimientos en disco: {e}")
+
+    def clear(self):
+        self._entries.clear()
+        if self._db is not None:
+            with self._lock:
+                self._pending.clear()
+            self._writer.submit(self._run, "DELETE FROM moves")
+
+    def close(self):
+        """Espera a las escrituras pendientes y cierra la base de datos."""
+        if self._db is None:
+            return
+        self._writer.shutdown(wait=True)
+        if self._pending:
+            self.flush()
+        self._db.close()
+        self._db = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+            "pending_writes": len(self._pending),
+            "db_batches": self.db_batches,
+        }
@@ -4,203 +4,860 @@ Como pydantic-ai no tiene soporte directo para Ollama, creamos nuestro propio cl
 """
 
 import httpx
+import asyncio
+import importlib.util
 import json
-from typing import List, Optional, Dict, Any
+import math
+import re
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 import logging
 
+from config import Config
+from move_cache import MoveCache
+import metrics
+import prompt_builder
+from search_executor import ExecutorBusy, SearchExecutor, search_executor
+
 logger = logging.getLogger(__name__)
 
+def _h2_available() -> bool:
+    """HTTP/2 en httpx requiere el paquete opcional `h2`"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class OllamaHealthMonitor:
+    """
+    Estado de disponibilidad de Ollama, refrescado en segundo plano.
+
+    Los llamadores leen `available` en O(1) en lugar de consultar a Ollama en
+    cada movimiento. Mientras Ollama responde se comprueba cada `interval`
+    segundos; tras un fallo los reintentos usan backoff exponencial hasta
+    `max_backoff`. Además actúa como circuit breaker: tras `failure_threshold`
+    fallos seguidos (de la comprobación o de generate) el circuito se abre y
+    no se usa Ollama hasta que una comprobación posterior tenga éxito.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, client: "OllamaClient", interval: float = 30.0, retry_base: float = 2.0,
+                 max_backoff: float = 300.0, failure_threshold: int = 3):
+        self.client = client
+        self.interval = interval
+        self.retry_base = retry_base
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+
+        self.healthy = False
+        self.circuit = self.CLOSED
+        self.consecutive_failures = 0
+        self.checks = 0
+        self.last_checked: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.circuit == self.CLOSED
+
+    def next_delay(self) -> float:
+        """Segundos hasta la próxima comprobación."""
+        if self.available:
+            return self.interval
+        return min(self.retry_base * 2 ** max(self.consecutive_failures - 1, 0), self.max_backoff)
+
+    async def check(self) -> bool:
+        """Comprueba Ollama ahora y actualiza el estado."""
+        if self.circuit == self.OPEN:
+            self.circuit = self.HALF_OPEN
+        with metrics.availability_check_seconds.time():
+            error = await self.client.probe()
+        self.checks += 1
+        self.last_checked = time.time()
+        if error is None:
+            self.record_success()
+        else:
+            self.record_failure(error, probe=True)
+        return self.available
+
+    def record_success(self):
+        was_available = self.available
+        self.healthy = True
+        self.circuit = self.CLOSED
+        self.consecutive_failures = 0
+        self.last_error = None
+        if not was_available:
+            self._state_changed()
+
+    def record_failure(self, error: str, probe: bool = False):
+        was_available = self.available
+        self.consecutive_failures += 1
+        self.last_error = error
+        if probe:
+            self.healthy = False
+        if self.circuit == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.circuit = self.OPEN
+        if was_available != self.available:
+            self._state_changed()
+
+    def _state_changed(self):
+        self.last_change = time.time()
+        if self.available:
+            logger.info("Ollama disponible")
+        else:
+            logger.warning(f"Ollama no disponible (circuito {self.circuit}): {self.last_error}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Error comprobando Ollama: {e}")
+            await asyncio.sleep(self.next_delay())
+
+    def start(self):
+        """Arranca la comprobación periódica (requiere un event loop activo)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            "available": self.available,
+            "circuit": self.circuit,
+            "consecutive_failures": self.consecutive_failures,
+            "checks": self.checks,
+            "last_checked": self.last_checked,
+            "last_change": self.last_change,
+            "last_error": self.last_error,
+            "next_check_in": round(self.next_delay(), 3),
+        }
+
+
+class OllamaModelKeeper:
+    """
+    Mantiene el modelo cargado en Ollama mientras hay partidas.
+
+    Al arrancar (y cuando vuelve el tráfico tras un periodo inactivo) carga el
+    modelo con una petición vacía para que el primer movimiento no pague el
+    tiempo de carga. Mientras hay actividad renueva `keep_alive` cada
+    `interval` segundos; tras `idle_unload` segundos sin actividad descarga el
+    modelo (keep_alive=0) para liberar memoria. Mide por separado la latencia
+    de las cargas en frío y la de las renovaciones con el modelo ya cargado.
+    """
+
+    def __init__(self, client: "OllamaClient", keep_alive: Optional[str] = "10m",
+                 interval: float = 240.0, idle_unload: float = 900.0):
+        self.client = client
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.idle_unload = idle_unload
+
+        self.loaded = False
+        self.last_activity: Optional[float] = None
+        self.cold_starts = 0
+        self.total_cold_ms = 0.0
+        self.last_cold_ms: Optional[float] = None
+        self.warm_pings = 0
+        self.total_warm_ms = 0.0
+        self.last_warm_ms: Optional[float] = None
+        self.unloads = 0
+        self.last_error: Optional[str] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def idle(self) -> bool:
+        """True si no hubo actividad en los últimos `idle_unload` segundos."""
+        return self.last_activity is None or time.monotonic() - self.last_activity >= self.idle_unload
+
+    def touch(self):
+        """Registra actividad; si el modelo no está cargado adelanta la carga."""
+        self.last_activity = time.monotonic()
+        if not self.loaded and self._wake is not None:
+            self._wake.set()
+
+    async def ping(self) -> Optional[str]:
+        """Carga o renueva el modelo y mide la latencia. Retorna el error o None."""
+        cold = not self.loaded
+        started = time.perf_counter()
+        error = await self.client.load_model(self.keep_alive)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if error is not None:
+            self.loaded = False
+            self.last_error = error
+            if "memory" in error.lower():
+                self.client.health.record_failure(error, probe=True)
+            return error
+
+        self.loaded = True
+        self.last_error = None
+        metrics.model_load_seconds.observe(elapsed_ms / 1000, kind="cold" if cold else "warm")
+        if cold:
+            self.cold_starts += 1
+            self.total_cold_ms += elapsed_ms
+            self.last_cold_ms = elapsed_ms
+            logger.info(f"Modelo {self.client.model} cargado en {elapsed_ms:.0f} ms")
+        else:
+            self.warm_pings += 1
+            self.total_warm_ms += elapsed_ms
+            self.last_warm_ms = elapsed_ms
+        return None
+
+    async def unload(self):
+        """Descarga el modelo de la memoria de Ollama."""
+        error = await self.client.load_model("0")
+        self.loaded = False
+        if error is None:
+            self.unloads += 1
+            metrics.model_unloads_total.inc()
+            logger.info(f"Modelo {self.client.model} descargado por inactividad")
+        else:
+            self.last_error = error
+
+    async def _run(self):
+        while True:
+            try:
+                if self.idle:
+                    if self.loaded:
+                        await self.unload()
+                    # Esperar a que vuelva la actividad
+                    await self._wake.wait()
+                    self._wake.clear()
+                    continue
+                await self.ping()
+            except Exception as e:
+                self.last_error = str(e) or e.__class__.__name__
+                logger.error(f"Error manteniendo el modelo cargado: {self.last_error}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self, warm_up: bool = True):
+        """Arranca el mantenimiento en segundo plano (requiere un event loop activo)."""
+        self._wake = asyncio.Event()
+        if warm_up:
+            self.touch()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            "model": self.client.model,
+            "loaded": self.loaded,
+            "idle": self.idle,
+            "keep_alive": self.keep_alive,
+            "cold_starts": self.cold_starts,
+            "last_cold_start_ms": round(self.last_cold_ms, 3) if self.last_cold_ms is not None else None,
+            "avg_cold_start_ms": round(self.total_cold_ms / self.cold_starts, 3) if self.cold_starts else None,
+            "warm_pings": self.warm_pings,
+            "last_warm_ms": round(self.last_warm_ms, 3) if self.last_warm_ms is not None else None,
+            "avg_warm_ms": round(self.total_warm_ms / self.warm_pings, 3) if self.warm_pings else None,
+            "unloads": self.unloads,
+            "last_error": self.last_error,
+        }
+
+
 class OllamaClient:
-    """Cliente para interactuar con Ollama API"""
+    """
+    Cliente para interactuar con Ollama API.
+
+    Mantiene un único httpx.AsyncClient con pool de conexiones keep-alive (y
+    HTTP/2 si `h2` está instalado) durante toda la vida de la aplicación, en
+    lugar de abrir una conexión TCP nueva en cada llamada. Se abre con start()
+    y se cierra con aclose() desde el lifespan de FastAPI.
+    """
     
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "phi3:mini"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "phi3:mini",
+                 max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None, http2: Optional[bool] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
         self.base_url = base_url
         self.model = model
+        self.models: List[Dict[str, Any]] = []
+        self.limits = httpx.Limits(
+            max_connections=max_connections or Config.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or Config.OLLAMA_MAX_KEEPALIVE,
+            keepalive_expiry=keepalive_expiry or Config.OLLAMA_KEEPALIVE_EXPIRY,
+        )
+        self.http2 = _h2_available() if http2 is None else http2
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # Límite de tokens y secuencias de parada que se envían en cada generación
+        self.options = {"num_predict": Config.OLLAMA_NUM_PREDICT}
+        if Config.OLLAMA_STOP:
+            self.options["stop"] = Config.OLLAMA_STOP
+        self.health = OllamaHealthMonitor(
+            self,
+            interval=Config.OLLAMA_HEALTH_INTERVAL,
+            max_backoff=Config.OLLAMA_HEALTH_MAX_BACKOFF,
+            failure_threshold=Config.OLLAMA_FAILURE_THRESHOLD,
+        )
+        self.keeper = OllamaModelKeeper(
+            self,
+            keep_alive=Config.OLLAMA_KEEP_ALIVE or None,
+            interval=Config.OLLAMA_KEEP_ALIVE_INTERVAL,
+            idle_unload=Config.OLLAMA_IDLE_UNLOAD,
+        )
+        # Tokens y tiempo de evaluación del prompt medidos por Ollama, por etiqueta
+        self.prompt_eval: Dict[str, Dict[str, float]] = {}
+        self.eval_sample_every = Config.OLLAMA_EVAL_SAMPLE_EVERY
+        self._stream_requests: Counter = Counter()
+    
+    @property
+    def available(self) -> bool:
+        """Disponibilidad cacheada por el monitor de salud (O(1), sin red)"""
+        return self.health.available
+    
+    async def start(self):
+        """Abre el cliente HTTP compartido"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                http2=self.http2,
+                timeout=30.0,
+                transport=self._transport,
+            )
+    
+    async def aclose(self):
+        """Cierra el cliente HTTP y sus conexiones"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _http(self) -> httpx.AsyncClient:
+        # Se abre bajo demanda si se usa fuera del lifespan (scripts, pruebas)
+        if self._client is None or self._client.is_closed:
+            await self.start()
+        return self._client
         
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
-        """Generar respuesta usando Ollama"""
-        url = f"{self.base_url}/api/generate"
-        
+    def _payload(self, prompt: str, system_prompt: Optional[str], stream: bool,
+                 options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False
+            "stream": stream,
+            "options": {**self.options, **(options or {})}
         }
         
         if system_prompt:
             payload["system"] = system_prompt
+        if self.keeper.keep_alive:
+            payload["keep_alive"] = self.keeper.keep_alive
+        return payload
+        
+    def _record_eval(self, label: Optional[str], result: Dict[str, Any]):
+        """Acumula prompt_eval_count/prompt_eval_duration de la respuesta final"""
+        if label is None or "prompt_eval_count" not in result:
+            return
+        entry = self.prompt_eval.setdefault(label, {"requests": 0, "prompt_tokens": 0, "prompt_eval_ms": 0.0})
+        entry["requests"] += 1
+        entry["prompt_tokens"] += result["prompt_eval_count"]
+        entry["prompt_eval_ms"] += result.get("prompt_eval_duration", 0) / 1e6
+    
+    def prompt_eval_stats(self) -> Dict[str, Dict[str, float]]:
+        """Promedios por etiqueta (p. ej. tamaño de tablero)"""
+        return {
+            label: {
+                "requests": entry["requests"],
+                "avg_prompt_tokens": round(entry["prompt_tokens"] / entry["requests"], 1),
+                "avg_prompt_eval_ms": round(entry["prompt_eval_ms"] / entry["requests"], 3),
+            }
+            for label, entry in self.prompt_eval.items()
+        }
+        
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       options: Optional[Dict[str, Any]] = None, label: Optional[str] = None) -> str:
+        """Generar respuesta usando Ollama"""
+        payload = self._payload(prompt, system_prompt, False, options)
+        self.keeper.touch()
+        started = time.perf_counter()
+        outcome = "error"
+            
+        try:
+            client = await self._http()
+            response = await client.post("/api/generate", json=payload)
+            response.raise_for_status()
             
+            result = response.json()
+            self.health.record_success()
+            self.keeper.loaded = True
+            self._record_eval(label, result)
+            outcome = "ok"
+            return result.get("response", "")
+            
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Error llamando a Ollama: {e}")
+            self.health.record_failure(str(e) or e.__class__.__name__)
+            raise
+        finally:
+            metrics.llm_generation_seconds.observe(time.perf_counter() - started,
+                                                   mode="complete", outcome=outcome)
+    
+    async def generate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                              until: Optional[Callable[[str], bool]] = None,
+                              options: Optional[Dict[str, Any]] = None, label: Optional[str] = None) -> str:
+        """
+        Generar en modo streaming leyendo el NDJSON de Ollama. Si `until`
+        devuelve True para el texto acumulado se deja de leer y se cierra la
+        respuesta, lo que cancela el resto de la generación en Ollama.
+        
+        Ollama solo envía prompt_eval_count en el fragmento final, así que la
+        primera generación de cada etiqueta y luego una de cada
+        `eval_sample_every` se leen hasta el final (sin `until`) para medirlo.
+        """
+        payload = self._payload(prompt, system_prompt, True, options)
+        if label is not None and self.eval_sample_every:
+            sampled = self._stream_requests[label] % self.eval_sample_every == 0
+            self._stream_requests[label] += 1
+            if sampled:
+                until = None
+        self.keeper.touch()
+        text = ""
+        started = time.perf_counter()
+        outcome = "error"
+        
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload)
+            client = await self._http()
+            async with client.stream("POST", "/api/generate", json=payload) as response:
                 response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise RuntimeError(chunk["error"])
+                    text += chunk.get("response", "")
+                    if chunk.get("done"):
+                        self._record_eval(label, chunk)
+                        break
+                    if until is not None and until(text):
+                        break
+            
+            self.health.record_success()
+            self.keeper.loaded = True
+            outcome = "ok"
+            return text
                 
-                result = response.json()
-                return result.get("response", "")
-                
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
         except Exception as e:
-            logger.error(f"Error llamando a Ollama: {e}")
+            logger.error(f"Error llamando a Ollama (stream): {e}")
+            self.health.record_failure(str(e) or e.__class__.__name__)
             raise
+        finally:
+            metrics.llm_generation_seconds.observe(time.perf_counter() - started,
+                                                   mode="stream", outcome=outcome)
     
-    async def is_available(self) -> bool:
-        """Verificar si Ollama está disponible"""
+    async def probe(self) -> Optional[str]:
+        """
+        Comprobación ligera de Ollama: /api/tags y, si hay partidas activas,
+        carga del modelo con un prompt vacío (no genera tokens). Retorna el
+        error o None si está bien.
+        """
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                if response.status_code != 200:
-                    return False
-                    
-                # Test model availability
-                test_response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": "test",
-                        "stream": False
-                    }
-                )
+            client = await self._http()
+            response = await client.get("/api/tags", timeout=5.0)
+            if response.status_code != 200:
+                return f"/api/tags respondió {response.status_code}"
+            self.models = response.json().get("models", [])
+                
+            # Si el modelo se descargó por inactividad no volver a cargarlo aquí
+            if self.keeper.idle:
+                return None
                 
-                # If we get a memory error or model error, consider unavailable
-                if test_response.status_code != 200:
-                    result = test_response.json()
-                    if "memory" in result.get("error", "").lower():
-                        logger.warning(f"Ollama no disponible por memoria insuficiente: {result.get('error')}")
-                        return False
-                        
-                return True
+            # Cargar el modelo sin generar para detectar errores de memoria
+            error = await self.load_model(self.keeper.keep_alive)
+            if error and "memory" in error.lower():
+                logger.warning(f"Ollama no disponible por memoria insuficiente: {error}")
+                return error
+                    
+            return None
         except Exception as e:
-            logger.warning(f"Ollama no disponible: {e}")
-            return False
+            return str(e) or e.__class__.__name__
+    
+    async def load_model(self, keep_alive: Optional[str] = None) -> Optional[str]:
+        """
+        Carga el modelo sin generar tokens (prompt vacío). Con keep_alive="0"
+        lo descarga. Retorna el error de Ollama o None.
+        """
+        payload = {
+            "model": self.model,
+            "prompt": "",
+            "stream": False
+        }
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        client = await self._http()
+        response = await client.post("/api/generate", json=payload, timeout=60.0)
+        if response.status_code != 200:
+            try:
+                return response.json().get("error") or f"/api/generate respondió {response.status_code}"
+            except ValueError:
+                return f"/api/generate respondió {response.status_code}"
+        return None
+    
+    async def is_available(self) -> bool:
+        """Verificar ahora mismo si Ollama está disponible (actualiza el estado cacheado)"""
+        return await self.health.check()
     
     async def list_models(self) -> List[Dict[str, Any]]:
         """Listar modelos disponibles"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                response.raise_for_status()
-                
-                result = response.json()
-                return result.get("models", [])
+            client = await self._http()
+            response = await client.get("/api/tags", timeout=10.0)
+            response.raise_for_status()
+            
+            result = response.json()
+            self.models = result.get("models", [])
+            return self.models
         except Exception as e:
             logger.error(f"Error obteniendo modelos: {e}")
             return []
 
 
+class _PendingGeneration:
+    """Petición en vuelo compartida por todos los llamadores con el mismo prompt"""
+    
+    def __init__(self, key, prompt: str, system_prompt: Optional[str], stream: bool,
+                 until: Optional[Callable[[str], bool]], label: Optional[str] = None):
+        self.key = key
+        self.prompt = prompt
+        self.system_prompt = system_prompt
+        self.stream = stream
+        self.until = until
+        self.label = label
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class GenerateDispatcher:
+    """
+    Despachador de generaciones hacia Ollama.
+
+    - Single-flight: las peticiones idénticas que están en vuelo comparten un
+      único future en lugar de lanzar otra llamada a /api/generate.
+    - Micro-batching: las peticiones distintas se agrupan durante `max_wait`
+      segundos (hasta `max_batch_size`) y se lanzan juntas, hasta `parallel`
+      a la vez, para ocupar los slots paralelos del servidor de modelos
+      (OLLAMA_NUM_PARALLEL) en lugar de encolarse de una en una.
+    
+    Si todos los que esperan una petición se cancelan, la petición se cancela.
+    """
+    
+    def __init__(self, client: OllamaClient, max_batch_size: int = 4, max_wait: float = 0.005,
+                 parallel: int = 4):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.parallel = parallel
+        self._inflight: Dict[Any, _PendingGeneration] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_requests = 0
+    
+    @classmethod
+    def from_config(cls, client: OllamaClient) -> "GenerateDispatcher":
+        return cls(
+            client,
+            max_batch_size=Config.OLLAMA_BATCH_SIZE,
+            max_wait=Config.OLLAMA_BATCH_WAIT_MS / 1000,
+            parallel=Config.OLLAMA_NUM_PARALLEL,
+        )
+    
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            # La cola y el semáforo quedan ligados al loop en el que se usan
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.parallel)
+            self._worker = asyncio.create_task(self._run())
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None, stream: bool = False,
+                       until: Optional[Callable[[str], bool]] = None, label: Optional[str] = None) -> str:
+        """Igual que OllamaClient.generate/generate_stream, pero coalescido y agrupado"""
+        self._ensure_worker()
+        self.requests += 1
+        key = (self.client.model, system_prompt, prompt, stream)
+        
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = _PendingGeneration(key, prompt, system_prompt, stream, until, label)
+            self._inflight[key] = pending
+            self._queue.put_nowait(pending)
+        else:
+            self.coalesced += 1
+        
+        pending.waiters += 1
+        try:
+            return await asyncio.shield(pending.future)
+        except asyncio.CancelledError:
+            if pending.waiters == 1 and not pending.future.done():
+                # Nadie más espera esta respuesta: cancelar la petición
+                pending.future.cancel()
+                if pending.task is not None:
+                    pending.task.cancel()
+                self._inflight.pop(key, None)
+            raise
+        finally:
+            pending.waiters -= 1
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            self.batches += 1
+            self.batched_requests += len(batch)
+            for pending in batch:
+                if not pending.future.done():
+                    pending.task = asyncio.create_task(self._dispatch(pending))
+    
+    async def _dispatch(self, pending: _PendingGeneration):
+        try:
+            async with self._slots:
+                if pending.stream:
+                    text = await self.client.generate_stream(pending.prompt, pending.system_prompt,
+                                                             until=pending.until, label=pending.label)
+                else:
+                    text = await self.client.generate(pending.prompt, pending.system_prompt,
+                                                      label=pending.label)
+            if not pending.future.done():
+                pending.future.set_result(text)
+        except asyncio.CancelledError:
+            if not pending.future.done():
+                pending.future.cancel()
+        except Exception as e:
+            if not pending.future.done():
+                pending.future.set_exception(e)
+        finally:
+            if self._inflight.get(pending.key) is pending:
+                del self._inflight[pending.key]
+    
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_requests / self.batches, 3) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "parallel": self.parallel,
+        }
+
+
+class MoveDecision(NamedTuple):
+    """Movimiento elegido y su origen"""
+    position: int
+    source: str  # "llm" o "search"
+    reason: Optional[str]  # por qué no se usó el LLM, o "cache" si vino de la caché
+
+
 class TicTacToeAI:
     """Agente de IA para Tic-Tac-Toe usando Ollama"""
     
-    def __init__(self, ollama_client: OllamaClient):
+    # Forma parte de la clave de la caché (ver prompt_builder)
+    PROMPT_VERSION = prompt_builder.PROMPT_VERSION
+    
+    def __init__(self, ollama_client: OllamaClient, move_cache: Optional[MoveCache] = None,
+                 dispatcher: Optional[GenerateDispatcher] = None,
+                 executor: Optional[SearchExecutor] = None):
         self.ollama = ollama_client
-        self.system_prompt = """
-Eres un experto jugador de Tic-Tac-Toe (3 en raya). Tu objetivo es:
-1. GANAR el juego cuando sea posible (completar 3 en línea)
-2. BLOQUEAR al oponente cuando esté a punto de ganar
-3. Hacer movimientos estratégicos para crear oportunidades de victoria
-
-REGLAS DEL TABLERO:
-- El tablero tiene 9 posiciones numeradas del 0 al 8:
-  0 | 1 | 2
-  ---------
-  3 | 4 | 5
-  ---------  
-  6 | 7 | 8
-
-- Un número (0-8) significa casilla vacía
-- 'X' es el jugador humano, 'O' eres tú (la IA)
-- Para ganar necesitas 3 símbolos en línea (horizontal, vertical o diagonal)
-
-INSTRUCCIONES DE RESPUESTA:
-- Responde ÚNICAMENTE con el número de la posición donde quieres jugar (0-8)
-- NO agregues explicaciones, comentarios o texto adicional
-- Si no hay movimientos válidos, responde "FULL"
-
-ESTRATEGIA PRIORITARIA:
-1. Si puedes ganar inmediatamente (completar 3 en línea), hazlo
-2. Si el oponente puede ganar en su siguiente turno, bloquéalo
-3. Controla el centro (posición 4) si está disponible
-4. Prefiere esquinas (0,2,6,8) sobre bordes laterales (1,3,5,7)
-5. Busca crear dos amenazas simultáneas (fork)
-"""
+        self.move_cache = move_cache
+        self.dispatcher = dispatcher or GenerateDispatcher.from_config(ollama_client)
+        # Ejecutor de la búsqueda (el pool global del servidor por defecto)
+        self.executor = executor or search_executor
     
-    async def make_move(self, board: List[Optional[str]], player: str = 'O') -> int:
+    async def make_move(self, board: List[Optional[str]], player: str = 'O', size: Optional[int] = None) -> int:
         """Hacer un movimiento inteligente usando IA"""
+        decision = await self.choose_move(board, player, size)
+        return decision.position
+    
+    async def choose_move(self, board: List[Optional[str]], player: str = 'O',
+                          size: Optional[int] = None) -> MoveDecision:
+        """
+        Elige el movimiento e informa de dónde salió (MoveDecision.source).
+        
+        Modo hedged: la búsqueda local arranca a la vez que la llamada al LLM.
+        Si el LLM responde una casilla legal antes de AI_MOVE_DEADLINE_MS se
+        usa su movimiento; si no, se cancela la petición al LLM y se usa el de
+        la búsqueda, de modo que la latencia por movimiento queda acotada
+        aunque el modelo sea lento.
+        """
+        decision = await self._choose_move(board, player, size)
+        metrics.moves_total.inc(source=decision.source)
+        if decision.source == "search":
+            metrics.fallback_total.inc(reason=decision.reason)
+        return decision
+    
+    async def _choose_move(self, board: List[Optional[str]], player: str,
+                           size: Optional[int]) -> MoveDecision:
+        size = size or math.isqrt(len(board))
         
         # Verificar si Ollama está disponible
-        if not await self.ollama.is_available():
-            logger.warning("Ollama no disponible, usando algoritmo Minimax")
-            return self._minimax_move(board, player)
-        
-        # Crear el prompt para la IA con análisis del tablero
-        board_str = [str(i) if cell is None else cell for i, cell in enumerate(board)]
-        
-        # Analizar estado del juego
-        empty_positions = [i for i, cell in enumerate(board) if cell is None]
-        player_positions = [i for i, cell in enumerate(board) if cell == player]
-        opponent = 'X' if player == 'O' else 'O'
-        opponent_positions = [i for i, cell in enumerate(board) if cell == opponent]
-        
-        prompt = f"""
-ESTADO ACTUAL DEL TABLERO:
-{board_str[0]} | {board_str[1]} | {board_str[2]}
----------
-{board_str[3]} | {board_str[4]} | {board_str[5]}
----------
-{board_str[6]} | {board_str[7]} | {board_str[8]}
-
-TU SÍMBOLO: {player}
-OPONENTE: {opponent}
-POSICIONES VACÍAS: {empty_positions}
-TUS POSICIONES: {player_positions}
-POSICIONES OPONENTE: {opponent_positions}
-
-Analiza cuidadosamente:
-1. ¿Puedes ganar en este turno?
-2. ¿Necesitas bloquear al oponente?
-3. ¿Qué movimiento es más estratégico?
-
-Responde SOLO con el número de tu mejor movimiento (0-8):
-"""
+        if not self.ollama.available:
+            # Ocurre en cada movimiento mientras Ollama está caído: el motivo ya
+            # queda en el evento game.move y en ttt_fallback_total
+            logger.debug("Ollama no disponible, usando algoritmo Minimax")
+            return MoveDecision(await self._minimax_move(board, player, size), "search", "ollama_unavailable")
+        
+        # Posiciones repetidas (o simétricas) reutilizan la respuesta del modelo
+        if self.move_cache is not None:
+            cached = self.move_cache.get(board, player, self.ollama.model, self.PROMPT_VERSION)
+            if cached is not None and board[cached] is None:
+                return MoveDecision(cached, "llm", "cache")
         
+        llm_task = asyncio.create_task(self._llm_move(board, player, size))
+        search_task = asyncio.create_task(self._minimax_move(board, player, size)) if Config.AI_HEDGED else None
         try:
-            response = await self.ollama.generate(prompt, self.system_prompt)
-            
-            # Parsear la respuesta de la IA
-            response = response.strip()
+            try:
+                position = await asyncio.wait_for(llm_task, timeout=Config.AI_MOVE_DEADLINE_MS / 1000)
+                reason = "invalid_response"
+            except asyncio.TimeoutError:
+                logger.warning(f"IA no respondió en {Config.AI_MOVE_DEADLINE_MS} ms, usando búsqueda")
+                position, reason = None, "deadline"
+            except Exception as e:
+                logger.error(f"Error usando IA: {e}")
+                position, reason = None, "error"
             
-            if response == "FULL":
-                return -1  # Tablero lleno
+            if position is not None:
+                if search_task is not None:
+                    search_task.cancel()
+                return MoveDecision(position, "llm", None)
             
-            try:
-                position = int(response)
-                if 0 <= position <= 8 and board[position] is None:
-                    return position
-                else:
-                    logger.warning(f"IA sugirió posición inválida: {position}")
-                    return self._minimax_move(board, player)
-            except ValueError:
-                logger.warning(f"IA respondió formato inválido: {response}")
-                return self._minimax_move(board, player)
-                
-        except Exception as e:
-            logger.error(f"Error usando IA: {e}")
-            return self._minimax_move(board, player)
+            if search_task is None:
+                return MoveDecision(await self._minimax_move(board, player, size), "search", reason)
+            return MoveDecision(await search_task, "search", reason)
+        except asyncio.CancelledError:
+            # El llamador se fue (p. ej. el cliente se desconectó): no dejar trabajo colgando
+            llm_task.cancel()
+            if search_task is not None:
+                search_task.cancel()
+            raise
+    
+    async def _llm_move(self, board: List[Optional[str]], player: str, size: int) -> Optional[int]:
+        """Casilla legal elegida por el modelo, o None si la respuesta no sirve"""
+        system_prompt, prompt = prompt_builder.build_prompt(board, player, size)
+        
+        # Con streaming se deja de leer en cuanto hay una posición completa
+        response = await self.dispatcher.generate(
+            prompt, system_prompt,
+            stream=Config.OLLAMA_STREAM,
+            until=lambda text: self._parse_move(text, board) is not None,
+            label=f"{size}x{size}"
+        )
+        
+        # Parsear la respuesta de la IA
+        position = self._parse_move(response, board, final=True)
+        
+        if position is None:
+            logger.warning(f"IA respondió formato inválido: {response.strip()}")
+            return None
+        if 0 <= position < len(board) and board[position] is None:
+            if self.move_cache is not None:
+                self.move_cache.put(board, player, self.ollama.model, self.PROMPT_VERSION, position)
+            return position
+        # Incluye "FULL" (-1): si quedan casillas libres la respuesta es inválida
+        logger.warning(f"IA sugirió posición inválida: {position}")
+        return None
+    
+    @staticmethod
+    def _parse_move(text: str, board: List[Optional[str]], final: bool = False) -> Optional[int]:
+        """
+        Primera posición de la respuesta, -1 si responde "FULL", o None si aún
+        no hay un número completo (un número al final del texto puede seguir
+        creciendo con el siguiente token salvo que ya no quepa en el tablero).
+        """
+        if text.strip().upper().startswith("FULL"):
+            return -1
+        match = re.search(r"\d+", text)
+        if match is None:
+            return None
+        value = int(match.group())
+        if not final and match.end() == len(text) and value * 10 < len(board):
+            return None
+        return value
     
-    def _minimax_move(self, board: List[Optional[str]], player: str) -> int:
-        """Algoritmo Minimax como fallback"""
+    async def _minimax_move(self, board: List[Optional[str]], player: str, size: Optional[int] = None) -> int:
+        """
+        Algoritmo Minimax como fallback (búsqueda con presupuesto de tiempo en
+        tableros grandes). La consulta a la tabla 3x3 es O(1) y se hace en el
+        loop; la búsqueda se ejecuta en el ejecutor para no bloquearlo.
+        """
+        size = size or math.isqrt(len(board))
         # Importar directamente desde el módulo local
         try:
             from game_agent import minimax_algorithm
-            return minimax_algorithm(board, player)
+            import opening_book
+
+            with metrics.search_seconds.time():
+                position = opening_book.lookup(board, player, size)
+                if position is not None:
+                    return position
+                return await self.executor.run(minimax_algorithm, list(board), player, size)
+        except ExecutorBusy as e:
+            logger.warning(f"{e}, usando fallback básico")
+            return self._simple_fallback(board, player, size)
         except ImportError:
             # Fallback manual simple si hay problemas de importación
             logger.warning("No se pudo importar minimax_algorithm, usando fallback básico")
-            return self._simple_fallback(board, player)
+            return self._simple_fallback(board, player, size)
     
-    def _simple_fallback(self, board: List[Optional[str]], player: str) -> int:
+    def _simple_fallback(self, board: List[Optional[str]], player: str, size: int = 3) -> int:
         """Fallback básico: elegir primera posición disponible o centro"""
         # Intentar el centro primero
-        if board[4] is None:
-            return 4
+        center = (size // 2) * size + size // 2
+        if board[center] is None:
+            return center
         
         # Buscar primera posición disponible
         for i, cell in enumerate(board):
@@ -210,6 +867,6 @@ Responde SOLO con el número de tu mejor movimiento (0-8):
         return -1  # Tablero lleno
 
 
-# Instancia global del cliente Ollama
-ollama_client = OllamaClient()
-tic_tac_toe_ai = TicTacToeAI(ollama_client)
+# Instancia global del cliente Ollama (servidor y modelo de la configuración)
+ollama_client = OllamaClient(base_url=Config.get_ollama_url(), model=Config.OLLAMA_MODEL)
+tic_tac_toe_ai = TicTacToeAI(ollama_client, MoveCache.from_config())
@@ -0,0 +1,216 @@
+"""
+Tabla de solución completa para Tic-Tac-Toe 3x3 (libro de aperturas).
+
+El 3x3 tiene muy pocas posiciones, así que se resuelven todas una sola vez
+(aprovechando las 8 simetrías del tablero) y se guardan en un archivo binario
+compacto: un byte por posición y jugador en turno con la mejor casilla. El
+servidor lo carga al arrancar (memory-mapped) y responde con una búsqueda O(1);
+si el archivo no existe o no es válido se sigue usando el motor de búsqueda.
+
+Para generar la tabla:
+    python opening_book.py [--output RUTA]
+"""
+
+import argparse
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import List, Optional
+
+from config import Config
+from search_engine import SearchEngine
+from symmetry import board_symmetries
+
+logger = logging.getLogger(__name__)
+
+SIZE = 3
+CELLS = SIZE * SIZE
+POSITIONS = 3 ** CELLS
+PLAYERS = ('X', 'O')
+NO_MOVE = 0xFF
+
+MAGIC = b'TTTB'
+VERSION = 1
+# magic, versión, tamaño, reservado, crc32 de la tabla
+HEADER = struct.Struct('<4sBBHI')
+
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tictactoe3.book')
+
+_CODES = {None: 0, 'X': 1, 'O': 2}
+_MARKS = (None, 'X', 'O')
+_POWERS = tuple(3 ** i for i in range(CELLS))
+
+
+def encode_board(board: List[Optional[str]]) -> int:
+    """Índice en base 3 de un tablero 3x3."""
+    index = 0
+    for cell in range(CELLS):
+        index += _CODES[board[cell]] * _POWERS[cell]
+    return index
+
+
+def decode_board(index: int) -> List[Optional[str]]:
+    """Inversa de encode_board."""
+    board = []
+    for _ in range(CELLS):
+        index, code = divmod(index, 3)
+        board.append(_MARKS[code])
+    return board
+
+
+def _is_terminal(board: List[Optional[str]]) -> bool:
+    # Import diferido: game_agent importa este módulo
+    from game_agent import check_winner
+    return check_winner(board, SIZE) is not None
+
+
+def build_table() -> bytes:
+    """Resuelve todas las posiciones no terminales para ambos jugadores."""
+    table = bytearray([NO_MOVE]) * (POSITIONS * len(PLAYERS))
+    solved = bytearray(POSITIONS)
+    engine = SearchEngine()
+    symmetries = board_symmetries(SIZE)
+
+    for index in range(POSITIONS):
+        if solved[index]:
+            continue
+        board = decode_board(index)
+        images = [[board[source] for source in perm] for perm in symmetries]
+        for image in images:
+            solved[encode_board(image)] = 1
+        if _is_terminal(board):
+            continue
+
+        for side, player in enumerate(PLAYERS):
+            move = engine.best_move(board, player, SIZE)
+            offset = side * POSITIONS
+            for perm, image in zip(symmetries, images):
+                # image[i] = board[perm[i]], así que la casilla `move` pasa a perm.index(move)
+                table[offset + encode_board(image)] = perm.index(move)
+
+    return bytes(table)
+
+
+def write_book(path: str = DEFAULT_BOOK_PATH) -> str:
+    """Genera la tabla y la escribe en `path`."""
+    table = build_table()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, VERSION, SIZE, 0, zlib.crc32(table)))
+        handle.write(table)
+    return path
+
+
+class OpeningBook:
+    """Tabla de solución 3x3 cargada en memoria (mmap)."""
+
+    def __init__(self, table):
+        self._table = table
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_BOOK_PATH, verify: bool = True, full: bool = False) -> 'OpeningBook':
+        """Carga y valida la tabla. Lanza ValueError si el archivo no es válido."""
+        with open(path, 'rb') as handle:
+            table = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        expected_length = HEADER.size + POSITIONS * len(PLAYERS)
+        if len(table) != expected_length:
+            raise ValueError(f"Tamaño de tabla inválido: {len(table)} bytes")
+        magic, version, size, _, checksum = HEADER.unpack_from(table, 0)
+        if magic != MAGIC or version != VERSION or size != SIZE:
+            raise ValueError("Cabecera de tabla inválida")
+        if zlib.crc32(table[HEADER.size:]) != checksum:
+            raise ValueError("Checksum de tabla inválido")
+
+        book = cls(memoryview(table)[HEADER.size:])
+        if verify:
+            book.verify(full)
+        return book
+
+    def verify(self, full: bool = False):
+        """
+        Comprueba que la tabla coincide con la semántica de check_winner:
+        las posiciones terminales no tienen movimiento, las demás tienen una
+        casilla vacía y, si existe una victoria inmediata, la tabla la elige.
+        Sin `full` solo se revisan las posiciones alcanzables empezando X.
+        """
+        from game_agent import check_winner
+
+        for index in range(POSITIONS):
+            board = decode_board(index)
+            x_count, o_count = board.count('X'), board.count('O')
+            if not full and x_count - o_count not in (0, 1):
+                continue
+            terminal = check_winner(board, SIZE) is not None
+            for side, player in enumerate(PLAYERS):
+                if not full and PLAYERS[x_count - o_count] != player:
+                    continue
+                move = self._table[side * POSITIONS + index]
+                if terminal:
+                    if move != NO_MOVE:
+                        raise ValueError(f"Posición terminal con movimiento: {board}")
+                    continue
+                if move >= CELLS or board[move] is not None:
+                    raise ValueError(f"Movimiento ilegal {move} para {player} en {board}")
+
+                winning = [cell for cell in range(CELLS) if board[cell] is None
+                           and check_winner(board[:cell] + [player] + board[cell + 1:], SIZE) == player]
+                if winning and move not in winning:
+                    raise ValueError(f"La tabla no toma la victoria inmediata de {player} en {board}")
+
+    def lookup(self, board: List[Optional[str]], player: str) -> Optional[int]:
+        """Mejor casilla para `player`, o None si la posición no está en la tabla."""
+        if player not in PLAYERS or len(board) < CELLS:
+            return None
+        try:
+            index = encode_board(board)
+        except KeyError:
+            return None
+        move = self._table[PLAYERS.index(player) * POSITIONS + index]
+        return None if move == NO_MOVE else move
+
+
+_book: Optional[OpeningBook] = None
+_load_attempted = False
+
+
+def load_default_book(path: Optional[str] = None) -> Optional[OpeningBook]:
+    """Carga la tabla una sola vez. Retorna None si no está disponible."""
+    global _book, _load_attempted
+    if _load_attempted:
+        return _book
+    _load_attempted = True
+
+    path = path or Config.OPENING_BOOK_PATH or DEFAULT_BOOK_PATH
+    if not os.path.exists(path):
+        logger.warning(f"Tabla de aperturas no encontrada en {path}, se usará búsqueda")
+        return None
+    try:
+        _book = OpeningBook.load(path)
+        logger.info(f"Tabla de aperturas 3x3 cargada desde {path}")
+    except (OSError, ValueError) as e:
+        logger.error(f"Tabla de aperturas inválida, se usará búsqueda: {e}")
+        _book = None
+    return _book
+
+
+def lookup(board: List[Optional[str]], player: str, size: int = 3) -> Optional[int]:
+    """Consulta la tabla por defecto; None si no aplica o no está cargada."""
+    if size != SIZE:
+        return None
+    book = load_default_book()
+    if book is None:
+        return None
+    return book.lookup(board, player)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera la tabla de solución 3x3")
+    parser.add_argument("--output", default=DEFAULT_BOOK_PATH, help="Ruta del archivo de salida")
+    args = parser.parse_args()
+
+    output = write_book(args.output)
+    OpeningBook.load(output, full=True)
+    print(f"✅ Tabla generada y verificada: {output}")
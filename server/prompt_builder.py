@@ -0,0 +1,97 @@
+"""
+Construcción de prompts para el agente LLM.
+
+Funciona con cualquier tablero N x N y usa una notación compacta: una línea por
+fila con X, O y '.' para las casillas vacías, seguida del jugador en turno y de
+las casillas libres. El prompt de sistema solo depende del tamaño, se genera
+una vez por tamaño y se reutiliza byte a byte, de modo que Ollama puede
+aprovechar la caché KV del prefijo entre peticiones; la parte variable (el
+tablero) va siempre al final.
+
+PROMPT_VERSION forma parte de la clave de la caché de movimientos: hay que
+cambiarla cada vez que se modifique el texto de los prompts.
+
+Uso para medir los tokens de prompt reales de cada tamaño contra Ollama:
+    python prompt_builder.py --measure --sizes 3 4 5 9
+"""
+
+import argparse
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+PROMPT_VERSION = "v2"
+
+_CELL_SYMBOLS = {None: '.', 'X': 'X', 'O': 'O'}
+
+
+@lru_cache(maxsize=None)
+def system_prompt(size: int) -> str:
+    """Instrucciones fijas para un tablero size x size (cacheadas por tamaño)."""
+    last = size * size - 1
+    return (
+        f"Juegas {size} en raya en un tablero {size}x{size}. "
+        f"Casillas 0-{last} por filas: casilla = fila*{size}+columna.\n"
+        "El tablero llega con una línea por fila: X y O son fichas, '.' es una casilla vacía.\n"
+        "Gana quien completa una fila, columna o diagonal.\n"
+        "Prioridad: 1) ganar ya 2) bloquear la victoria del rival 3) centro 4) esquinas.\n"
+        "Responde solo con el número de una casilla libre. Sin casillas libres responde FULL."
+    )
+
+
+def render_board(board: Sequence[Optional[str]], size: int) -> str:
+    """Tablero en notación compacta: una línea por fila."""
+    cells = ''.join(_CELL_SYMBOLS.get(cell, '?') for cell in board)
+    return '\n'.join(cells[row * size:(row + 1) * size] for row in range(size))
+
+
+def user_prompt(board: Sequence[Optional[str]], player: str, size: int) -> str:
+    """Parte variable del prompt: tablero, jugador en turno y casillas libres."""
+    free = ' '.join(str(i) for i, cell in enumerate(board) if cell is None)
+    return f"{render_board(board, size)}\nJuegas: {player}\nLibres: {free}\nCasilla:"
+
+
+def build_prompt(board: Sequence[Optional[str]], player: str, size: int) -> List[str]:
+    """Retorna [system, prompt] listos para /api/generate."""
+    return [system_prompt(size), user_prompt(board, player, size)]
+
+
+def _measure(url: str, model: str, sizes: Sequence[int]):
+    """Pide a Ollama evaluar el prompt de un tablero vacío por tamaño (sin generar)."""
+    import httpx
+
+    print(f"{'tamaño':>7} {'caracteres':>11} {'tokens':>7} {'eval ms':>8}")
+    with httpx.Client(base_url=url, timeout=120.0) as client:
+        for size in sizes:
+            system, prompt = build_prompt([None] * (size * size), 'X', size)
+            response = client.post("/api/generate", json={
+                "model": model,
+                "system": system,
+                "prompt": prompt,
+                "stream": False,
+                "options": {"num_predict": 1},
+            })
+            response.raise_for_status()
+            result = response.json()
+            tokens = result.get("prompt_eval_count", 0)
+            eval_ms = result.get("prompt_eval_duration", 0) / 1e6
+            print(f"{size:>7} {len(system) + len(prompt):>11} {tokens:>7} {eval_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Muestra o mide los prompts por tamaño de tablero")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5, 6, 7, 8, 9])
+    parser.add_argument("--measure", action="store_true", help="Medir tokens de prompt contra Ollama")
+    parser.add_argument("--url", default=Config.get_ollama_url())
+    parser.add_argument("--model", default=Config.OLLAMA_MODEL)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure(args.url, args.model, args.sizes)
+    else:
+        for size in args.sizes:
+            system, prompt = build_prompt([None] * (size * size), 'X', size)
+            print(f"--- {size}x{size} ({len(system) + len(prompt)} caracteres) ---")
+            print(system)
+            print(prompt)
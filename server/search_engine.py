@@ -0,0 +1,384 @@
+"""
+Motor de búsqueda para Tic-Tac-Toe.
+
+Implementa negamax con poda alpha-beta, ordenamiento de movimientos y una tabla
+de transposición (hashing Zobrist) que se comparte entre llamadas, de modo que
+las posiciones ya resueltas en movimientos anteriores no se vuelven a buscar.
+Internamente trabaja sobre bitboards (ver bitboard.py).
+
+Sin presupuesto la búsqueda es exhaustiva. Con límite de tiempo o de nodos se
+usa profundización iterativa: cada iteración completa mejora el resultado y,
+al agotarse el presupuesto, se devuelve el mejor movimiento encontrado hasta
+el momento, evaluando las hojas con una heurística intercambiable.
+"""
+
+import random
+import threading
+import time
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import bitboard
+
+# Tipos de entrada en la tabla de transposición
+EXACT, LOWER, UPPER = 0, 1, 2
+
+INFINITY = float('inf')
+
+# Una victoria siempre vale más que cualquier evaluación heurística
+WIN_SCORE = 1_000_000_000
+
+# Heurística: (bits del jugador que mueve, bits del rival, tamaño) -> puntuación
+Heuristic = Callable[[int, int, int], int]
+
+
+class SearchTimeout(Exception):
+    """Se agotó el presupuesto de tiempo o de nodos."""
+
+
+class _Budget:
+    """Límites y contador de nodos de una llamada a search (no se guardan en el motor)."""
+
+    __slots__ = ('deadline', 'max_nodes', 'nodes')
+
+    def __init__(self, deadline: Optional[float], max_nodes: Optional[int]):
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.nodes = 0
+
+    def spend(self):
+        """Cuenta un nodo; lanza SearchTimeout si se agotó el presupuesto."""
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+
+class SearchResult(NamedTuple):
+    move: int
+    score: float
+    depth: int
+    nodes: int
+    elapsed: float
+    complete: bool  # True si la búsqueda llegó al final de la partida
+
+
+def open_lines_heuristic(own: int, other: int, size: int) -> int:
+    """
+    Cuenta líneas abiertas: cada línea que solo contiene fichas de un jugador
+    suma (o resta) 4^fichas - 1, así las líneas casi completas pesan mucho más.
+    """
+    score = 0
+    for mask in bitboard.line_masks(size):
+        mine = own & mask
+        theirs = other & mask
+        if not theirs:
+            if mine:
+                score += 4 ** mine.bit_count() - 1
+        elif not mine:
+            score -= 4 ** theirs.bit_count() - 1
+    return score
+
+
+@lru_cache(maxsize=None)
+def move_order(size: int) -> Tuple[int, ...]:
+    """
+    Orden estático de movimientos: primero las casillas que participan en más
+    líneas (centro y esquinas) y, a igualdad, las más cercanas al centro.
+    """
+    center = (size - 1) / 2
+    through = bitboard.cell_line_masks(size)
+    return tuple(sorted(
+        range(size * size),
+        key=lambda cell: (
+            -len(through[cell]),
+            abs(cell // size - center) + abs(cell % size - center),
+            cell,
+        ),
+    ))
+
+
+class ZobristKeys:
+    """Claves aleatorias de 64 bits por (casilla, jugador) y por turno."""
+
+    def __init__(self, size: int, seed: int):
+        rng = random.Random(seed * 131 + size)
+        self.cells = [
+            {'X': rng.getrandbits(64), 'O': rng.getrandbits(64)}
+            for _ in range(size * size)
+        ]
+        self.side = rng.getrandbits(64)
+
+    def hash_bits(self, x_bits: int, o_bits: int, player: str) -> int:
+        key = self.side if player == 'O' else 0
+        for cell in bitboard.iter_cells(x_bits):
+            key ^= self.cells[cell]['X']
+        for cell in bitboard.iter_cells(o_bits):
+            key ^= self.cells[cell]['O']
+        return key
+
+
+class SearchEngine:
+    """
+    Motor alpha-beta con tabla de transposición compartida.
+
+    Los valores se guardan desde el punto de vista del jugador que mueve y
+    dependen solo de la posición: una victoria vale WIN_SCORE más el número
+    de casillas vacías que quedaban al ganar (ganar antes puntúa más), el
+    empate vale 0 y las hojas sin resolver usan la heurística. Cada entrada
+    guarda la profundidad con la que se calculó; una entrada con profundidad
+    igual a las casillas vacías es un valor exacto de la partida.
+
+    Las tablas de todos los tamaños comparten el límite `max_tt_entries`; al
+    superarlo se descartan las entradas insertadas hace más tiempo hasta
+    dejar 3/4 del límite, en lugar de vaciar la tabla entera.
+
+    El presupuesto de cada búsqueda es local a la llamada, pero las tablas no
+    admiten búsquedas simultáneas: entre hilos usa thread_engine() (un motor
+    por hilo).
+    """
+
+    def __init__(self, max_tt_entries: int = 250_000, seed: int = 0x7A3,
+                 time_limit: Optional[float] = None, node_limit: Optional[int] = None,
+                 heuristic: Heuristic = open_lines_heuristic):
+        self.max_tt_entries = max_tt_entries
+        self.seed = seed
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.heuristic = heuristic
+        self._zobrist: Dict[int, ZobristKeys] = {}
+        self._tables: Dict[int, Dict[int, Tuple[float, int, Optional[int], int]]] = {}
+        self.tt_evictions = 0
+        # Nodos visitados por la última búsqueda
+        self.nodes = 0
+
+    def clear(self):
+        """Vacía las tablas de transposición."""
+        self._tables.clear()
+
+    def tt_entries(self) -> int:
+        return sum(len(table) for table in self._tables.values())
+
+    def _evict(self):
+        """Recorta las tablas a 3/4 del límite empezando por las entradas más antiguas de la mayor."""
+        excess = self.tt_entries() - self.max_tt_entries
+        if excess <= 0:
+            return
+        excess += self.max_tt_entries // 4
+        # Los dict conservan el orden de inserción: las primeras claves son las más antiguas
+        for table in sorted(self._tables.values(), key=len, reverse=True):
+            stale = list(islice(table, excess))
+            for key in stale:
+                del table[key]
+            self.tt_evictions += len(stale)
+            excess -= len(stale)
+            if excess <= 0:
+                break
+
+    def best_move(self, board: List[Optional[str]], player: str, size: int = 3) -> int:
+        """Retorna la mejor posición para `player`, o -1 si no hay movimientos."""
+        x_bits, o_bits = bitboard.from_list(board, size)
+        return self.best_move_bits(x_bits, o_bits, player, size)
+
+    def best_move_bits(self, x_bits: int, o_bits: int, player: str, size: int = 3) -> int:
+        """Igual que best_move pero recibiendo directamente los bitboards."""
+        return self.search(x_bits, o_bits, player, size).move
+
+    def best_move_for_game(self, game) -> int:
+        """
+        Mejor movimiento para el jugador en turno de un TicTacToeGame. Usa el
+        estado incremental de la partida (is_terminal y bitboards) sin pasar
+        por la vista de lista. Retorna -1 si la partida ya terminó.
+        """
+        if game.is_terminal:
+            return -1
+        return self.best_move_bits(game.x_bits, game.o_bits, game.current_player, game.size)
+
+    def search(self, x_bits: int, o_bits: int, player: str, size: int = 3,
+               time_limit: Optional[float] = None, node_limit: Optional[int] = None) -> SearchResult:
+        """
+        Profundización iterativa dentro del presupuesto (por defecto el del
+        motor). Siempre retorna un movimiento legal si existe alguno.
+        """
+        started = time.perf_counter()
+        empties = size * size - (x_bits | o_bits).bit_count()
+        self.nodes = 0
+        if empties == 0:
+            return SearchResult(-1, 0, 0, 0, 0.0, True)
+
+        time_limit = self.time_limit if time_limit is None else time_limit
+        node_limit = self.node_limit if node_limit is None else node_limit
+        budget = _Budget(started + time_limit if time_limit else None, node_limit or None)
+
+        zobrist = self._zobrist.get(size)
+        if zobrist is None:
+            zobrist = self._zobrist[size] = ZobristKeys(size, self.seed)
+        self._evict()
+        table = self._tables.setdefault(size, {})
+
+        own, other = (x_bits, o_bits) if player == 'X' else (o_bits, x_bits)
+        key = zobrist.hash_bits(x_bits, o_bits, player)
+
+        free = bitboard.full_mask(size) & ~(x_bits | o_bits)
+        best = SearchResult(next(c for c in move_order(size) if free >> c & 1), 0, 0, 0, 0.0, False)
+        # Sin presupuesto se busca directamente hasta el final
+        depths = range(1, empties + 1) if (budget.deadline or budget.max_nodes) else (empties,)
+        for depth in depths:
+            try:
+                value, move = self._search_root(own, other, player, empties, depth, key,
+                                                size, zobrist, table, best.move, budget)
+            except SearchTimeout as timeout:
+                partial = timeout.args[0] if timeout.args else None
+                if partial is not None:
+                    best = best._replace(move=partial[1], score=partial[0])
+                break
+            best = SearchResult(move, value, depth, budget.nodes,
+                                time.perf_counter() - started, depth >= empties)
+            if abs(value) >= WIN_SCORE:
+                break
+
+        self.nodes = budget.nodes
+        return best._replace(nodes=budget.nodes, elapsed=time.perf_counter() - started)
+
+    def _search_root(self, own, other, player, empties, depth, key, size, zobrist, table, first_move,
+                     budget):
+        """
+        Raíz de la búsqueda: igual que _search pero recuerda el mejor movimiento
+        de la iteración en curso. Si el presupuesto se agota después de haber
+        evaluado el primer movimiento (el mejor de la iteración anterior), ese
+        resultado parcial es al menos tan bueno y se adjunta a la excepción.
+        """
+        entry = table.get(key)
+        if entry is not None and entry[1] == EXACT and entry[3] >= min(depth, empties):
+            return entry[0], entry[2]
+
+        opponent = 'O' if player == 'X' else 'X'
+        through = bitboard.cell_line_masks(size)
+        occupied = own | other
+        order = (first_move,) + tuple(c for c in move_order(size) if c != first_move)
+
+        alpha = -INFINITY
+        best_move = None
+        for cell in order:
+            if occupied >> cell & 1:
+                continue
+            try:
+                value = self._child_value(own, other, player, opponent, cell, empties, depth, key,
+                                          -INFINITY, -alpha, size, zobrist, table, through, budget)
+            except SearchTimeout:
+                raise SearchTimeout((alpha, best_move) if best_move is not None else None)
+            if value > alpha:
+                alpha = value
+                best_move = cell
+
+        table[key] = (alpha, EXACT, best_move, min(depth, empties))
+        return alpha, best_move
+
+    def _child_value(self, own, other, player, opponent, cell, empties, depth, key,
+                     alpha, beta, size, zobrist, table, through, budget):
+        """Valor (para `player`) de jugar en `cell`."""
+        after = own | 1 << cell
+        if bitboard.has_line(after, through[cell]):
+            return WIN_SCORE + empties
+        if empties == 1:
+            return 0
+        if depth == 1:
+            return -self.heuristic(other, after, size)
+        child_key = key ^ zobrist.cells[cell][player] ^ zobrist.side
+        child_value, _ = self._search(other, after, opponent, empties - 1, depth - 1, child_key,
+                                      alpha, beta, size, zobrist, table, budget)
+        return -child_value
+
+    def _search(self, own, other, player, empties, depth, key, alpha, beta, size, zobrist, table, budget):
+        """
+        Negamax con poda alpha-beta sobre bitboards (`own` es el jugador que
+        mueve). Retorna (valor, mejor movimiento).
+        """
+        budget.spend()
+        depth = min(depth, empties)
+        alpha_orig = alpha
+
+        tt_move = None
+        entry = table.get(key)
+        if entry is not None:
+            value, flag, tt_move, entry_depth = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value, tt_move
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, tt_move
+
+        opponent = 'O' if player == 'X' else 'X'
+        through = bitboard.cell_line_masks(size)
+        occupied = own | other
+
+        order = move_order(size)
+        if tt_move is not None:
+            order = (tt_move,) + tuple(cell for cell in order if cell != tt_move)
+
+        best_value = -INFINITY
+        best_move = None
+        for cell in order:
+            if occupied >> cell & 1:
+                continue
+
+            value = self._child_value(own, other, player, opponent, cell, empties, depth, key,
+                                      -beta, -alpha, size, zobrist, table, through, budget)
+
+            if value > best_value:
+                best_value = value
+                best_move = cell
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table[key] = (best_value, flag, best_move, depth)
+        return best_value, best_move
+
+
+def _budget_from_config() -> dict:
+    from config import Config
+    return {
+        'time_limit': Config.SEARCH_TIME_BUDGET_MS / 1000 or None,
+        'node_limit': Config.SEARCH_NODE_BUDGET or None,
+        'max_tt_entries': Config.SEARCH_TT_MAX_ENTRIES,
+    }
+
+
+# Motor compartido por el hilo principal, con el presupuesto por movimiento de Config
+default_engine = SearchEngine(**_budget_from_config())
+
+# Motores de los demás hilos (ejecutor de búsqueda en modo thread)
+_thread_engines = threading.local()
+
+
+def thread_engine() -> SearchEngine:
+    """
+    Motor del hilo actual: default_engine en el hilo principal y uno propio,
+    creado en el primer uso, en cada hilo del pool (cada uno con su tabla de
+    hasta SEARCH_TT_MAX_ENTRIES entradas).
+    """
+    if threading.current_thread() is threading.main_thread():
+        return default_engine
+    engine = getattr(_thread_engines, 'engine', None)
+    if engine is None:
+        engine = _thread_engines.engine = SearchEngine(**_budget_from_config())
+    return engine
+
+
+def best_move(board: List[Optional[str]], player: str, size: int = 3) -> int:
+    """Mejor movimiento usando el motor del hilo (misma firma que minimax_algorithm)."""
+    return thread_engine().best_move(board, player, size)
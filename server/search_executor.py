@@ -0,0 +1,160 @@
+"""
+Ejecutor para sacar la búsqueda de movimientos (CPU) del event loop.
+
+La búsqueda es código Python síncrono: si se ejecuta directamente en el loop de
+uvicorn bloquea todas las demás conexiones del worker. SearchExecutor la
+ejecuta en un pool de procesos (o de hilos en builds free-threaded), limita
+cuántas peticiones pueden estar en cola, permite cancelar las que aún no han
+empezado y mide por separado el tiempo de espera en cola y el de cómputo.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional, Set
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorBusy(Exception):
+    """La cola del ejecutor está llena."""
+
+
+def _timed_call(fn: Callable, args: tuple):
+    """Se ejecuta en el worker: retorna (resultado, inicio, segundos de cómputo)."""
+    # time.monotonic usa el mismo reloj en todos los procesos de la máquina
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic() - started
+
+
+def _gil_disabled() -> bool:
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+class SearchExecutor:
+    """
+    Pool de ejecución para motores de búsqueda.
+
+    kind: 'process', 'thread', 'inline' (en el propio loop, para pruebas) o
+    'auto' (hilos si el intérprete no tiene GIL, procesos en otro caso).
+    """
+
+    def __init__(self, kind: str = 'auto', max_workers: Optional[int] = None,
+                 max_queue_depth: int = 64):
+        if kind == 'auto':
+            kind = 'thread' if _gil_disabled() else 'process'
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth
+        self._pool: Optional[Executor] = None
+        # Trabajos enviados al pool que no han terminado (también los abandonados)
+        self._in_flight: Set[Future] = set()
+
+        self.queue_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.total_compute = 0.0
+        self.last_wait = 0.0
+        self.last_compute = 0.0
+
+    @classmethod
+    def from_config(cls) -> 'SearchExecutor':
+        return cls(
+            kind=Config.SEARCH_EXECUTOR,
+            max_workers=Config.SEARCH_WORKERS or None,
+            max_queue_depth=Config.SEARCH_QUEUE_LIMIT,
+        )
+
+    def start(self):
+        """Crea el pool (también se crea bajo demanda en la primera llamada)."""
+        if self._pool is not None or self.kind == 'inline':
+            return
+        if self.kind == 'thread':
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='search')
+        else:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        logger.info(f"Ejecutor de búsqueda iniciado: {self.kind} con {self.max_workers} workers")
+
+    def shutdown(self):
+        """Detiene el pool descartando el trabajo que aún no empezó."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Ejecuta fn(*args) fuera del loop. Lanza ExecutorBusy si la cola está
+        llena. Si la tarea que espera se cancela (p. ej. el cliente se
+        desconectó), el trabajo se retira de la cola si todavía no empezó.
+        """
+        if self.queue_depth >= self.max_queue_depth:
+            self.rejected += 1
+            raise ExecutorBusy(f"Cola de búsqueda llena ({self.queue_depth})")
+
+        self.submitted += 1
+        self.queue_depth += 1
+        submitted_at = time.monotonic()
+        try:
+            if self.kind == 'inline':
+                result, started, compute = _timed_call(fn, args)
+            else:
+                self.start()
+                future = self._pool.submit(_timed_call, fn, args)
+                self._in_flight.add(future)
+                future.add_done_callback(self._in_flight.discard)
+                result, started, compute = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.queue_depth -= 1
+
+        self.completed += 1
+        self.last_wait = max(0.0, started - submitted_at)
+        self.last_compute = compute
+        self.total_wait += self.last_wait
+        self.total_compute += compute
+        return result
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Bloquea hasta que terminen los trabajos ya enviados, incluidos los que
+        se abandonaron cancelando la tarea cuando ya estaban en marcha (un
+        hilo o proceso no se puede interrumpir). True si no queda ninguno.
+        """
+        pending = list(self._in_flight)
+        if not pending:
+            return True
+        return not wait(pending, timeout).not_done
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "avg_wait_ms": round(self.total_wait / completed * 1000, 3),
+            "avg_compute_ms": round(self.total_compute / completed * 1000, 3),
+            "last_wait_ms": round(self.last_wait * 1000, 3),
+            "last_compute_ms": round(self.last_compute * 1000, 3),
+        }
+
+
+# Ejecutor compartido por el servidor
+search_executor = SearchExecutor.from_config()
@@ -1,20 +1,56 @@
 from fastapi import FastAPI, WebSocket, Query, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from game_logic import TicTacToeGame
-from game_agent import router as agent_router, check_winner
+from game_agent import router as agent_router
 from ollama_integration import tic_tac_toe_ai, ollama_client
 from config import Config
+from contextlib import asynccontextmanager
+from search_executor import search_executor
+from session_store import new_game_id, session_store
+from ws_protocol import MAX_SEQ, get_protocol, valid_seq
+import metrics
+from event_log import EventLogger, configure_logging, elapsed_ms
+import opening_book
+import asyncio
+import importlib.util
+import itertools
 import json
 import logging
+import time
 import uvicorn
+from typing import Optional
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging: JSON de una línea, escrito desde un hilo aparte
+configure_logging()
 logger = logging.getLogger(__name__)
+events = EventLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cargar una sola vez la tabla de solución 3x3 (si falta se usa búsqueda)
+    opening_book.load_default_book()
+    # El pool se crea después de cargar la tabla para que los workers la hereden
+    search_executor.start()
+    # Cliente HTTP con pool de conexiones compartido durante toda la vida de la app
+    await ollama_client.start()
+    # Comprobar Ollama en segundo plano; los movimientos leen el estado cacheado
+    ollama_client.health.start()
+    # Precargar el modelo y mantenerlo en memoria mientras haya partidas
+    ollama_client.keeper.start(warm_up=Config.OLLAMA_WARMUP)
+    yield
+    await ollama_client.keeper.stop()
+    await ollama_client.health.stop()
+    await tic_tac_toe_ai.dispatcher.stop()
+    await ollama_client.aclose()
+    if tic_tac_toe_ai.move_cache is not None:
+        # Últimas escrituras de la caché en sqlite, fuera del loop
+        await asyncio.to_thread(tic_tac_toe_ai.move_cache.close)
+    search_executor.shutdown()
+    await session_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow requests from the web client
 app.add_middleware(
@@ -110,143 +146,243 @@ async def forced():
 
 # Diccionario para almacenar los juegos por conexión
 games = {}
+# Identificador corto de cada conexión para correlacionar los eventos del log
+_connection_ids = itertools.count(1)
+
+# Tipos de mensaje con histograma propio; el resto se agrupa como "other"
+_MESSAGE_TYPES = ("player_move", "reset_game")
+
+# Tamaños de tablero admitidos (el protocolo binario guarda la casilla en un byte)
+MIN_BOARD_SIZE, MAX_BOARD_SIZE = 3, 9
+
+
+def _valid_size(size) -> bool:
+    return isinstance(size, int) and not isinstance(size, bool) and MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE
+
+metrics.registry.gauge('ttt_active_games', 'Partidas WebSocket abiertas', lambda: len(games))
+metrics.registry.gauge('ttt_search_queue_depth', 'Búsquedas en cola o en ejecución',
+                       lambda: search_executor.queue_depth)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.websocket("/game")
-async def websocket_endpoint(websocket: WebSocket, size: int = Query(3, ge=3, le=9)):
+async def websocket_endpoint(websocket: WebSocket, size: int = Query(3, ge=MIN_BOARD_SIZE, le=MAX_BOARD_SIZE),
+                             game_id: Optional[str] = Query(None, max_length=64),
+                             protocol: str = Query("json", pattern="^(json|delta|binary)$"),
+                             batch: bool = Query(False)):
     await websocket.accept()
-    # Crear juego con jugador X siempre como inicial
-    game = TicTacToeGame(size=size, current_player='X')
+    # Formato de los mensajes del servidor (ver ws_protocol); JSON por defecto.
+    # Con batch=true cada movimiento del jugador recibe una única respuesta "turn"
+    proto = get_protocol(protocol, websocket)
+    # Reanudar la partida si el cliente trae su identificador; si no, empezar
+    # una nueva con X siempre como jugador inicial
+    game = await session_store.load(game_id) if game_id else None
+    if game is not None and not _valid_size(game.size):
+        # Guardada antes de validar el tamaño en reset_game: empezar de nuevo
+        game = None
+    resumed = game is not None
+    if not resumed:
+        game_id = new_game_id()
+        game = TicTacToeGame(size=size, current_player='X')
+        await session_store.save(game_id, game)
     games[websocket] = game
-    logger.info(f"Nueva conexión WebSocket establecida. Tamaño del tablero: {size}")
+    # Empezar a cargar el modelo mientras el jugador piensa su primer movimiento
+    ollama_client.keeper.touch()
+    conn = next(_connection_ids)
+    events.info("ws.connect", conn=conn, game_id=game_id, size=game.size, resumed=resumed)
+    
+    # Leer mensajes en segundo plano para detectar la desconexión incluso
+    # mientras se calcula el movimiento del agente, y cancelarlo en ese caso
+    inbox = asyncio.Queue()
+    disconnected = asyncio.Event()
+    agent_task = None
+
+    async def read_messages():
+        try:
+            while True:
+                await inbox.put(await websocket.receive_json())
+        except Exception as e:
+            if isinstance(e, WebSocketDisconnect):
+                disconnected.set()
+                # 1012: uvicorn se está apagando y ya no se puede enviar nada.
+                # Con un almacén compartido (Redis) el movimiento en curso se
+                # deja terminar y se guarda para que el cliente lo vea al
+                # reanudar en otro worker; en memoria se perdería con el
+                # proceso, así que se cancela como cualquier desconexión
+                drain = e.code == 1012 and session_store.shared
+                if agent_task is not None and not drain:
+                    agent_task.cancel()
+            await inbox.put(e)
+
+    def finish_game(winner, is_ai_used):
+        game.game_over = True
+        events.info("game.over", conn=conn, game_id=game_id, winner=winner, ai_used=is_ai_used,
+                    moves=len(game.moves_history))
+
+    async def play_agent_move(seq=None):
+        """
+        Movimiento del agente usando IA + Ollama (o la búsqueda de respaldo).
+        Lo aplica y guarda la partida; retorna (posición, ai_used, origen) o
+        None si el agente no pudo mover (el error ya se envió al cliente).
+        """
+        nonlocal agent_task
+        started = time.perf_counter()
+        try:
+            agent_task = asyncio.create_task(tic_tac_toe_ai.choose_move(
+                game.board, 
+                game.current_player,
+                game.size
+            ))
+            try:
+                decision = await agent_task
+                agent_position = decision.position
+            except asyncio.CancelledError:
+                if disconnected.is_set():
+                    raise WebSocketDisconnect()
+                raise
+            finally:
+                agent_task = None
+            
+            if agent_position != -1:
+                is_ai_used = decision.source == "llm"
+                events.info("game.move", conn=conn, game_id=game_id, by="agent", player=game.current_player,
+                            pos=agent_position, source=decision.source,
+                            reason=decision.reason, ms=elapsed_ms(started))
+                
+                game.make_move(agent_position)
+                await session_store.save(game_id, game)
+                if disconnected.is_set():
+                    raise WebSocketDisconnect(1012)
+                return agent_position, is_ai_used, decision.source
+            
+            events.warning("agent.no_move", conn=conn, game_id=game_id)
+            await proto.send_error("Agente no pudo hacer un movimiento", seq=seq)
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            events.error("agent.error", conn=conn, game_id=game_id, error=str(e))
+            await proto.send_error("Error interno del agente", seq=seq)
+        return None
+
+    async def agent_turn():
+        """Movimiento del agente enviado como mensajes separados (modo sin batch)"""
+        played = await play_agent_move()
+        if played is None:
+            return
+        agent_position, is_ai_used, source = played
+        
+        # Enviar actualización después del movimiento del agente
+        await proto.send_move(game, agent_position, ai_used=is_ai_used, move_source=source)
+        
+        # Verificar si hay ganador después del movimiento del agente
+        with metrics.win_detection_seconds.time():
+            winner = game.winner
+        if winner is not None:
+            finish_game(winner, is_ai_used)
+            await proto.send_game_over(winner, is_ai_used)
+
+    reader = asyncio.create_task(read_messages())
     
     try:
-        # Enviar el estado inicial del juego al cliente
-        initial_state = {
-            "type": "game_state",
-            "board": game.board,
-            "current_player": game.current_player,
-            "size": game.size
-        }
-        await websocket.send_json(initial_state)
-        logger.info(f"Estado inicial enviado: {initial_state}")
+        # Enviar el estado inicial del juego al cliente (con su identificador
+        # para que pueda reanudarla si se reconecta)
+        await proto.send_state(game, game_id=game_id, resumed=resumed, game_over=game.game_over)
+        
+        # La conexión anterior se cortó mientras pensaba el agente: completar su turno
+        if resumed and not game.game_over and game.current_player == 'O':
+            await agent_turn()
 
         while True:
-            data = await websocket.receive_json()
-            logger.info(f"Mensaje recibido del cliente: {data}")
+            data = await inbox.get()
+            if isinstance(data, Exception):
+                raise data
             
-            if data["type"] == "player_move":
-                if game.game_over:
-                    logger.info("Juego ya terminado, ignorando movimiento")
-                    continue
-                    
-                position = data["position"]
-                logger.info(f"Intento de movimiento en posición {position}")
-                
-                if game.make_move(position):
-                    logger.info(f"Movimiento válido del jugador en posición {position}")
-                    
-                    # Enviar actualización después del movimiento del jugador
-                    player_move_state = {
-                        "type": "game_state",
-                        "board": game.board,
-                        "current_player": game.current_player,
-                        "size": game.size
-                    }
-                    await websocket.send_json(player_move_state)
-                    logger.info(f"Estado actualizado enviado después del movimiento del jugador: {player_move_state}")
-                    
-                    # Verificar si hay ganador después del movimiento del jugador
-                    winner = check_winner(game.board, game.size)
-                    if winner is not None:
-                        game.game_over = True
-                        # Determinar si se usó IA en este juego
-                        is_ai_used = await ollama_client.is_available()
-                        await websocket.send_json({
-                            "type": "game_over",
-                            "winner": winner,
-                            "ai_used": is_ai_used
-                        })
-                        logger.info(f"Juego terminado. Ganador: {winner}. IA usada: {is_ai_used}")
+            # Número de secuencia del cliente (mensajes en pipeline): se repite en la respuesta
+            seq = data.get("seq")
+            message_type = data.get("type") if data.get("type") in _MESSAGE_TYPES else "other"
+            events.debug("ws.message", conn=conn, type=message_type, seq=seq)
+            if seq is not None and not valid_seq(seq):
+                events.warning("ws.invalid_seq", conn=conn, seq=repr(seq))
+                await proto.send_error(f"seq inválido: debe ser un entero entre 0 y {MAX_SEQ}")
+                continue
+            with metrics.websocket_message_seconds.time(type=message_type):
+                if data["type"] == "player_move":
+                    if game.game_over:
+                        events.debug("game.move_ignored", conn=conn, reason="game_over")
+                        if batch:
+                            await proto.send_error("Juego terminado", seq=seq)
                         continue
                     
-                    # Obtener movimiento del agente usando IA + Ollama
-                    if not game.game_over:
-                        logger.info("Solicitando movimiento del agente IA...")
-                        try:
-                            agent_position = await tic_tac_toe_ai.make_move(
-                                game.board, 
-                                game.current_player
-                            )
-                            
-                            if agent_position != -1:
-                                logger.info(f"Agente IA eligió la posición {agent_position}")
-                                is_ai_used = await ollama_client.is_available()
-                                logger.info(f"Usando {'Ollama AI' if is_ai_used else 'Minimax fallback'}")
-                                
-                                game.make_move(agent_position)
-                                
-                                # Enviar actualización después del movimiento del agente
-                                agent_move_state = {
-                                    "type": "game_state",
-                                    "board": game.board,
-                                    "current_player": game.current_player,
-                                    "size": game.size,
-                                    "ai_used": is_ai_used
-                                }
-                                await websocket.send_json(agent_move_state)
-                                logger.info(f"Estado actualizado enviado después del movimiento del agente: {agent_move_state}")
-                                
-                                # Verificar si hay ganador después del movimiento del agente
-                                winner = check_winner(game.board, game.size)
-                                if winner is not None:
-                                    game.game_over = True
-                                    await websocket.send_json({
-                                        "type": "game_over",
-                                        "winner": winner,
-                                        "ai_used": is_ai_used
-                                    })
-                                    logger.info(f"Juego terminado. Ganador: {winner}")
+                    position = data["position"]
+                    
+                    if game.make_move(position):
+                        events.info("game.move", conn=conn, game_id=game_id, by="player",
+                                    player=game.moves_history[-1]["player"], pos=position)
+                        await session_store.save(game_id, game)
+                        
+                        if not batch:
+                            # Enviar actualización después del movimiento del jugador
+                            await proto.send_move(game, position)
+                        
+                        # Verificar si hay ganador después del movimiento del jugador
+                        with metrics.win_detection_seconds.time():
+                            winner = game.winner
+                        if winner is not None:
+                            # Determinar si se usó IA en este juego
+                            is_ai_used = ollama_client.available
+                            finish_game(winner, is_ai_used)
+                            if batch:
+                                await proto.send_turn(game, seq, position, winner=winner, ai_used=is_ai_used)
                             else:
-                                logger.warning("Agente no pudo hacer un movimiento")
-                                await websocket.send_json({
-                                    "type": "error",
-                                    "message": "Agente no pudo hacer un movimiento"
-                                })
-                        except Exception as e:
-                            logger.error(f"Error en el movimiento del agente: {e}")
-                            await websocket.send_json({
-                                "type": "error",
-                                "message": "Error interno del agente"
-                            })
-                else:
-                    logger.warning(f"Movimiento inválido intentado en posición {position}")
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": "Movimiento inválido"
-                    })
-            
-            elif data["type"] == "reset_game":
-                logger.info(f"Reiniciando juego con tamaño {data['size']}")
-                # Crear un nuevo juego completamente limpio
-                new_size = data["size"]
-                game = TicTacToeGame(size=new_size, current_player='X')
-                game.game_over = False
-                games[websocket] = game
+                                await proto.send_game_over(winner, is_ai_used)
+                            continue
+                        
+                        if not batch:
+                            await agent_turn()
+                            continue
+                        
+                        # Modo batch: jugador, agente y estado final en un solo mensaje
+                        played = await play_agent_move(seq)
+                        if played is None:
+                            continue
+                        agent_position, is_ai_used, source = played
+                        with metrics.win_detection_seconds.time():
+                            winner = game.winner
+                        if winner is not None:
+                            finish_game(winner, is_ai_used)
+                        await proto.send_turn(game, seq, position, agent_position, winner=winner,
+                                              ai_used=is_ai_used, move_source=source)
+                    else:
+                        events.warning("game.invalid_move", conn=conn, game_id=game_id, pos=position)
+                        await proto.send_error("Movimiento inválido", seq=seq)
                 
-                new_state = {
-                    "type": "game_state",
-                    "board": game.board,
-                    "current_player": game.current_player,
-                    "size": game.size
-                }
-                await websocket.send_json(new_state)
-                logger.info(f"Juego reiniciado. Nuevo estado: {new_state}")
+                elif data["type"] == "reset_game":
+                    # Crear un nuevo juego completamente limpio (mismo identificador)
+                    new_size = data.get("size")
+                    if not _valid_size(new_size):
+                        events.warning("game.invalid_size", conn=conn, game_id=game_id, size=repr(new_size))
+                        await proto.send_error(f"Tamaño de tablero inválido: debe ser un entero entre "
+                                               f"{MIN_BOARD_SIZE} y {MAX_BOARD_SIZE}", seq=seq)
+                        continue
+                    game = TicTacToeGame(size=new_size, current_player='X')
+                    game.game_over = False
+                    games[websocket] = game
+                    await session_store.save(game_id, game)
+                    
+                    session = {"game_id": game_id} if seq is None else {"game_id": game_id, "seq": seq}
+                    await proto.send_state(game, **session)
+                    events.info("game.reset", conn=conn, game_id=game_id, size=new_size)
                 
     except WebSocketDisconnect:
-        logger.info("Cliente desconectado")
+        # La partida queda en el almacén hasta que expire para poder reanudarla
+        events.info("ws.disconnect", conn=conn, game_id=game_id)
     except Exception as e:
-        logger.error(f"Error en la conexión WebSocket: {str(e)}", exc_info=True)
+        events.error("ws.error", conn=conn, game_id=game_id, error=str(e), exc_info=True)
     finally:
+        reader.cancel()
         if websocket in games:
             del games[websocket]
         await websocket.close()
@@ -265,15 +401,17 @@ async def health_check():
 async def ollama_status():
     """Endpoint para verificar el estado de Ollama"""
     try:
-        is_available = await ollama_client.is_available()
-        models = await ollama_client.list_models() if is_available else []
+        is_available = ollama_client.available
+        models = ollama_client.models if is_available else []
         
         return {
             "ollama_available": is_available,
             "ollama_url": Config.get_ollama_url(),
             "model": ollama_client.model,
             "models_available": [model.get("name", "unknown") for model in models],
-            "fallback": "minimax" if not is_available else None
+            "fallback": "minimax" if not is_available else None,
+            "health": ollama_client.health.status(),
+            "model_keeper": ollama_client.keeper.status()
         }
     except Exception as e:
         logger.error(f"Error checking Ollama status: {e}")
@@ -283,16 +421,52 @@ async def ollama_status():
             "fallback": "minimax"
         }
 
+def _uvicorn_options() -> dict:
+    """
+    Opciones de uvicorn según Config. En producción: un worker por CPU, uvloop
+    y httptools si están instalados, sin reload y con apagado ordenado que
+    espera a los movimientos del agente en curso.
+    """
+    options = {
+        "host": Config.SERVER_HOST,
+        "port": Config.SERVER_PORT,
+        "ws_ping_interval": Config.WS_PING_INTERVAL,
+        "ws_ping_timeout": Config.WS_PING_TIMEOUT,
+        "ws_max_size": Config.WS_MAX_SIZE,
+        "log_level": "info",
+    }
+    if Config.is_development():
+        options["reload"] = True
+        return options
+    
+    workers = Config.SERVER_WORKERS or os.cpu_count() or 1
+    options.update(
+        workers=workers,
+        reload=False,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        timeout_graceful_shutdown=Config.SHUTDOWN_TIMEOUT,
+        # Una línea por petición HTTP; los eventos de partida ya van al log estructurado
+        access_log=False,
+    )
+    return options
+
 if __name__ == "__main__":
     platform_info = Config.get_platform_info()
+    options = _uvicorn_options()
+    workers = options.get("workers", 1)
+    if workers > 1:
+        # Repartir las CPUs entre los pools de búsqueda de cada worker (los
+        # workers leen Config del entorno al importar el módulo)
+        os.environ.setdefault("SEARCH_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+        if not session_store.shared:
+            logger.warning("Con varios workers y un almacén de partidas en el proceso "
+                           f"({session_store.stats()['backend']}) las partidas no se pueden "
+                           "reanudar en otro worker ni conservan el movimiento en curso al "
+                           "reiniciar; usa SESSION_STORE=redis con REDIS_URL")
     logger.info(f"🚀 Iniciando servidor Tic-Tac-Toe en {platform_info['system']}")
     logger.info(f"🤖 Ollama URL: {Config.get_ollama_url()}")
-    logger.info(f"🌐 Servidor en: http://{Config.SERVER_HOST}:{Config.SERVER_PORT}")
+    logger.info(f"🌐 Servidor en: http://{Config.SERVER_HOST}:{Config.SERVER_PORT} "
+                f"({workers} workers, loop={options.get('loop', 'auto')})")
     
-    uvicorn.run(
-        "server:app",
-        host=Config.SERVER_HOST,
-        port=Config.SERVER_PORT,
-        reload=Config.is_development(),
-        log_level="info"
-    )
+    uvicorn.run("server:app", **options)
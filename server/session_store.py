@@ -0,0 +1,221 @@
+"""
+Almacén de partidas por identificador.
+
+Las partidas se guardan con un estado compacto (tamaño, bitboards y lista de
+posiciones jugadas) en lugar de depender del objeto WebSocket, de modo que un
+cliente puede reconectarse, incluso a otro worker de uvicorn, y continuar la
+partida. Dos implementaciones:
+
+- InMemorySessionStore: dentro del proceso, con expiración por TTL. Sirve con
+  un solo worker (o con afinidad de sesión en el balanceador).
+- RedisSessionStore: cualquier cliente con la API asíncrona de redis-py
+  (get / set(ex=) / delete). Con varias URLs en REDIS_URL las partidas se
+  reparten entre nodos por hash del identificador. LocalRedis implementa esa
+  misma API en memoria para desarrollo y pruebas sin servidor Redis.
+"""
+
+import json
+import logging
+import secrets
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import Config
+from game_logic import TicTacToeGame
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+def new_game_id() -> str:
+    """Identificador aleatorio, corto y seguro para URLs."""
+    return secrets.token_urlsafe(12)
+
+
+def encode_game(game: TicTacToeGame) -> str:
+    """Estado compacto de la partida como JSON de una línea."""
+    return json.dumps({
+        "v": STATE_VERSION,
+        "size": game.size,
+        "x": game.x_bits,
+        "o": game.o_bits,
+        "moves": [move['position'] for move in game.moves_history],
+    }, separators=(',', ':'))
+
+
+def decode_game(data: str) -> TicTacToeGame:
+    """Reconstruye la partida reproduciendo los movimientos (X siempre empieza)."""
+    state = json.loads(data)
+    if state.get("v") != STATE_VERSION:
+        raise ValueError(f"Versión de estado desconocida: {state.get('v')}")
+    game = TicTacToeGame(size=state["size"], current_player='X')
+    for position in state["moves"]:
+        if not game.make_move(position):
+            raise ValueError(f"Movimiento inválido en el estado guardado: {position}")
+    if (game.x_bits, game.o_bits) != (state["x"], state["o"]):
+        raise ValueError("Los bitboards no coinciden con la lista de movimientos")
+    game.game_over = game.is_terminal
+    return game
+
+
+class SessionStore:
+    """Interfaz común: todas las operaciones son asíncronas."""
+
+    # True si las partidas sobreviven al proceso (otro worker puede reanudarlas)
+    shared = False
+
+    async def load(self, game_id: str) -> Optional[TicTacToeGame]:
+        raise NotImplementedError
+
+    async def save(self, game_id: str, game: TicTacToeGame):
+        raise NotImplementedError
+
+    async def delete(self, game_id: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.__class__.__name__}
+
+    @staticmethod
+    def _decode(game_id: str, data: Optional[str]) -> Optional[TicTacToeGame]:
+        if data is None:
+            return None
+        try:
+            return decode_game(data)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Partida {game_id} descartada: {e}")
+            return None
+
+
+class InMemorySessionStore(SessionStore):
+    """Partidas en el proceso, expulsando las que llevan `ttl` segundos sin cambios."""
+
+    def __init__(self, ttl: float = 3600.0, max_sessions: int = 100_000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # Orden de última escritura: las primeras son las primeras en expirar
+        self._sessions: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def _evict(self, now: float):
+        while self._sessions:
+            game_id, (_, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[game_id]
+
+    async def load(self, game_id: str) -> Optional[TicTacToeGame]:
+        self._evict(time.monotonic())
+        entry = self._sessions.get(game_id)
+        return self._decode(game_id, entry[0]) if entry else None
+
+    async def save(self, game_id: str, game: TicTacToeGame):
+        now = time.monotonic()
+        self._sessions[game_id] = (encode_game(game), now + self.ttl)
+        self._sessions.move_to_end(game_id)
+        self._evict(now)
+
+    async def delete(self, game_id: str):
+        self._sessions.pop(game_id, None)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "sessions": len(self._sessions), "ttl": self.ttl}
+
+
+class LocalRedis:
+    """Sustituto en memoria de redis.asyncio.Redis (solo get/set/delete con expiración)."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ex: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def aclose(self):
+        self._data.clear()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Partidas en Redis con expiración nativa (SET ... EX). Con varios clientes
+    cada partida vive siempre en el mismo nodo: crc32(game_id) % nodos.
+    """
+
+    def __init__(self, clients: Sequence, ttl: float = 3600.0, prefix: str = "ttt:game:",
+                 shared: bool = True):
+        if not clients:
+            raise ValueError("RedisSessionStore necesita al menos un cliente")
+        self.clients: List = list(clients)
+        self.ttl = ttl
+        self.prefix = prefix
+        # False con LocalRedis del propio proceso: las partidas mueren con el worker
+        self.shared = shared
+
+    @classmethod
+    def from_urls(cls, urls: Sequence[str], ttl: float = 3600.0) -> 'RedisSessionStore':
+        """Un cliente de redis-py por URL (requiere el paquete opcional `redis`)."""
+        import redis.asyncio as redis  # dependencia opcional
+        return cls([redis.from_url(url, decode_responses=True) for url in urls], ttl=ttl)
+
+    def _client(self, game_id: str):
+        return self.clients[zlib.crc32(game_id.encode()) % len(self.clients)]
+
+    async def load(self, game_id: str) -> Optional[TicTacToeGame]:
+        data = await self._client(game_id).get(self.prefix + game_id)
+        if isinstance(data, bytes):
+            data = data.decode()
+        return self._decode(game_id, data)
+
+    async def save(self, game_id: str, game: TicTacToeGame):
+        await self._client(game_id).set(self.prefix + game_id, encode_game(game), ex=int(self.ttl) or None)
+
+    async def delete(self, game_id: str):
+        await self._client(game_id).delete(self.prefix + game_id)
+
+    async def close(self):
+        for client in self.clients:
+            await client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "shards": len(self.clients), "ttl": self.ttl, "shared": self.shared}
+
+
+def create_session_store() -> SessionStore:
+    """
+    Almacén según Config.SESSION_STORE: 'memory' o 'redis'. Con 'redis' sin
+    REDIS_URL se usa LocalRedis; si falta el paquete `redis` se vuelve al
+    almacén en memoria.
+    """
+    if Config.SESSION_STORE == 'redis':
+        urls = [url.strip() for url in (Config.REDIS_URL or '').split(',') if url.strip()]
+        if not urls:
+            logger.info("SESSION_STORE=redis sin REDIS_URL: usando LocalRedis en memoria")
+            return RedisSessionStore([LocalRedis()], ttl=Config.SESSION_TTL, shared=False)
+        try:
+            return RedisSessionStore.from_urls(urls, ttl=Config.SESSION_TTL)
+        except ImportError:
+            logger.warning("Paquete 'redis' no instalado, usando almacén de partidas en memoria")
+    return InMemorySessionStore(ttl=Config.SESSION_TTL)
+
+
+# Almacén compartido por el servidor
+session_store = create_session_store()
@@ -21,6 +21,16 @@ class TicTacToeClient {
         this.isWaitingForResponse = false;
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 3;
+        // Identificador de la partida en el servidor: permite reanudarla al reconectar
+        this.gameId = sessionStorage.getItem('tttGameId');
+        // Formato de los mensajes del servidor: binary (por defecto), delta o json (?protocol=)
+        this.protocol = new URLSearchParams(window.location.search).get('protocol') || 'binary';
+        // Turno completo (jugador + IA + resultado) en un solo mensaje, salvo ?batch=0
+        this.batch = new URLSearchParams(window.location.search).get('batch') !== '0';
+        // Número de secuencia de los mensajes enviados y hora de envío, para
+        // asociar cada respuesta a su petición y medir el tiempo de ida y vuelta
+        this.seq = 0;
+        this.pendingSeqs = new Map();
 
         console.log('🔍 Verificando elementos DOM:');
         console.log('  - boardElement:', this.boardElement ? '✅' : '❌');
@@ -81,10 +91,14 @@ class TicTacToeClient {
             const isCodespaces = window.location.hostname.includes('app.github.dev');
             const wsProtocol = isCodespaces ? 'wss:' : 'ws:';
             const wsHost = isCodespaces ? window.location.host : 'localhost:8000';
-            const wsUrl = `${wsProtocol}//${wsHost}/game?size=${this.size}`;
+            let wsUrl = `${wsProtocol}//${wsHost}/game?size=${this.size}&protocol=${this.protocol}&batch=${this.batch ? 1 : 0}`;
+            if (this.gameId) {
+                wsUrl += `&game_id=${encodeURIComponent(this.gameId)}`;
+            }
             
             console.log(`🔌 Conectando a: ${wsUrl}`);
             this.ws = new WebSocket(wsUrl);
+            this.ws.binaryType = 'arraybuffer';
 
             this.ws.onopen = () => {
                 console.log("✅ Conexión WebSocket establecida");
@@ -94,71 +108,12 @@ class TicTacToeClient {
             };
 
             this.ws.onmessage = (event) => {
-                const message = JSON.parse(event.data);
-                console.log("📩 Mensaje del servidor:", message);
-                
-                if (message.type === "game_state") {
-                    this.board = message.board;
-                    this.currentPlayer = message.current_player;
-                    this.size = message.size;
-                    
-                    // Validación adicional para asegurar estado correcto
-                    if (!this.currentPlayer) {
-                        console.warn('⚠️ current_player es null, estableciendo a X');
-                        this.currentPlayer = 'X';
-                    }
-                    
-                    // Si el tablero está vacío, probablemente es un nuevo juego
-                    const isEmpty = this.board.every(cell => cell === null);
-                    if (isEmpty) {
-                        console.log('🆕 Tablero vacío detectado - reiniciando estado del juego');
-                        this.gameOver = false;
-                        this.isWaitingForResponse = false;
-                        this.updateStatusMessage('🟢 Nuevo juego iniciado', 'connected');
-                    }
-                    
-                    console.log(`🎯 Estado actualizado: turno de ${this.currentPlayer}`);
-                    this.updateUI();
-                    this.isWaitingForResponse = false;
-                    
-                    // Mostrar información de IA si está disponible
-                    if (message.ai_used !== undefined) {
-                        const aiType = message.ai_used ? '🤖 Ollama' : '⚙️ Minimax';
-                        console.log(`IA usada: ${aiType}`);
-                    }
-                    
-                } else if (message.type === "game_over") {
-                    console.log("🏁 Mensaje de fin de juego recibido:", message);
-                    this.gameOver = true;
-                    this.isWaitingForResponse = false;
-                    
-                    let winMessage = '';
-                    if (message.winner === "Tie") {
-                        winMessage = "🤝 ¡Empate!";
-                    } else if (message.winner === "X") {
-                        winMessage = "🎉 ¡Ganaste! (X)";
-                    } else if (message.winner === "O") {
-                        winMessage = "🤖 ¡La IA ganó! (O)";
-                    }
-                    
-                    // Actualizar UI primero
-                    this.updateUI();
-                    
-                    // Mostrar mensaje de ganador
-                    console.log("🏆 Mostrando mensaje de victoria:", winMessage);
-                    const aiType = message.ai_used ? 'Ollama' : (message.ai_used === false ? 'Minimax' : 'N/A');
-                    
-                    // Mostrar inmediatamente y también con timeout como respaldo
-                    alert(`${winMessage}\n\nIA utilizada: ${aiType}`);
-                    
-                    // Actualizar estado en pantalla también
-                    this.updateStatusMessage(`🏁 Juego terminado - ${winMessage}`, 'connected');
-                    
-                } else if (message.type === "error") {
-                    console.error("❌ Error del servidor:", message.message);
-                    this.updateStatusMessage(`❌ Error: ${message.message}`, 'disconnected');
-                    this.isWaitingForResponse = false;
+                const decoded = this.decodeMessage(event.data);
+                if (!decoded) {
+                    return;
                 }
+                // Un mensaje "turn" se expande en varios (estado y fin de juego)
+                (Array.isArray(decoded) ? decoded : [decoded]).forEach(message => this.handleMessage(message));
             };
 
             this.ws.onclose = () => {
@@ -191,6 +146,224 @@ class TicTacToeClient {
         });
     }
 
+    handleMessage(message) {
+        console.log("📩 Mensaje del servidor:", message);
+        if (message.seq !== undefined) {
+            this.completeSeq(message.seq);
+        }
+
+        if (message.type === "game_state") {
+            if (message.game_id) {
+                this.gameId = message.game_id;
+                sessionStorage.setItem('tttGameId', this.gameId);
+            }
+            const sizeChanged = message.size !== this.size;
+            this.board = message.board;
+            this.currentPlayer = message.current_player;
+            this.size = message.size;
+            if (sizeChanged) {
+                // Partida reanudada con otro tamaño de tablero
+                const sizeSelect = document.getElementById('boardSize');
+                if (sizeSelect) {
+                    sizeSelect.value = String(this.size);
+                }
+                this.setupBoard();
+            }
+            
+            // Validación adicional para asegurar estado correcto
+            if (!this.currentPlayer) {
+                console.warn('⚠️ current_player es null, estableciendo a X');
+                this.currentPlayer = 'X';
+            }
+            
+            // Si el tablero está vacío, probablemente es un nuevo juego
+            const isEmpty = this.board.every(cell => cell === null);
+            if (isEmpty) {
+                console.log('🆕 Tablero vacío detectado - reiniciando estado del juego');
+                this.gameOver = false;
+                this.isWaitingForResponse = false;
+                this.updateStatusMessage('🟢 Nuevo juego iniciado', 'connected');
+            }
+            if (message.resumed) {
+                this.gameOver = Boolean(message.game_over);
+                this.updateStatusMessage('🟢 Partida reanudada', 'connected');
+            }
+            
+            console.log(`🎯 Estado actualizado: turno de ${this.currentPlayer}`);
+            this.updateUI();
+            this.isWaitingForResponse = false;
+            
+            // Mostrar información de IA si está disponible
+            if (message.ai_used !== undefined) {
+                const aiType = message.ai_used ? '🤖 Ollama' : '⚙️ Minimax';
+                console.log(`IA usada: ${aiType}`);
+            }
+            
+        } else if (message.type === "game_over") {
+            console.log("🏁 Mensaje de fin de juego recibido:", message);
+            this.gameOver = true;
+            this.isWaitingForResponse = false;
+            
+            let winMessage = '';
+            if (message.winner === "Tie") {
+                winMessage = "🤝 ¡Empate!";
+            } else if (message.winner === "X") {
+                winMessage = "🎉 ¡Ganaste! (X)";
+            } else if (message.winner === "O") {
+                winMessage = "🤖 ¡La IA ganó! (O)";
+            }
+            
+            // Actualizar UI primero
+            this.updateUI();
+            
+            // Mostrar mensaje de ganador
+            console.log("🏆 Mostrando mensaje de victoria:", winMessage);
+            const aiType = message.ai_used ? 'Ollama' : (message.ai_used === false ? 'Minimax' : 'N/A');
+            
+            // Mostrar inmediatamente y también con timeout como respaldo
+            alert(`${winMessage}\n\nIA utilizada: ${aiType}`);
+            
+            // Actualizar estado en pantalla también
+            this.updateStatusMessage(`🏁 Juego terminado - ${winMessage}`, 'connected');
+            
+        } else if (message.type === "error") {
+            console.error("❌ Error del servidor:", message.message);
+            this.updateStatusMessage(`❌ Error: ${message.message}`, 'disconnected');
+            this.isWaitingForResponse = false;
+        }
+    }
+
+    // Envía un mensaje JSON al servidor con su número de secuencia
+    send(message) {
+        this.seq = (this.seq + 1) & 0xFFFF;
+        message.seq = this.seq;
+        this.pendingSeqs.set(this.seq, performance.now());
+        this.ws.send(JSON.stringify(message));
+        return message;
+    }
+
+    completeSeq(seq) {
+        const sentAt = this.pendingSeqs.get(seq);
+        if (sentAt !== undefined) {
+            this.pendingSeqs.delete(seq);
+            console.log(`⏱️ Respuesta a #${seq} en ${(performance.now() - sentAt).toFixed(1)} ms`);
+        }
+    }
+
+    // Convierte los mensajes de los protocolos delta y binary al formato JSON
+    // original (game_state con el tablero completo, game_over, error)
+    decodeMessage(data) {
+        if (typeof data === 'string') {
+            const message = JSON.parse(data);
+            if (message.type === 'session') {
+                // Datos de sesión del protocolo binario: el estado llega en el frame siguiente
+                if (message.game_id) {
+                    this.gameId = message.game_id;
+                    sessionStorage.setItem('tttGameId', this.gameId);
+                }
+                if (message.seq !== undefined) {
+                    this.completeSeq(message.seq);
+                }
+                this.pendingResumed = Boolean(message.resumed);
+                return null;
+            }
+            if (message.type === 'move') {
+                return this.applyMove(message.position, message.player, message.current_player,
+                                      message.ai_used, message.move_source);
+            }
+            if (message.type === 'turn') {
+                return this.expandTurn(message);
+            }
+            return message;
+        }
+
+        const bytes = new Uint8Array(data);
+        if (bytes[0] === 0x04) {
+            const turnFlags = bytes[5];
+            return this.expandTurn({
+                seq: (bytes[1] << 8) | bytes[2],
+                player_move: bytes[3],
+                agent_move: bytes[4] === 0xFF ? null : bytes[4],
+                current_player: (turnFlags & 0x01) ? 'O' : 'X',
+                winner: [null, 'X', 'O', 'Tie'][bytes[6]],
+                ai_used: (turnFlags & 0x08) ? Boolean(turnFlags & 0x04) : undefined
+            });
+        }
+        const flags = bytes[2];
+        const aiUsed = (flags & 0x08) ? Boolean(flags & 0x04) : undefined;
+        if (bytes[0] === 0x01) {
+            const size = bytes[1];
+            const symbols = [null, 'X', 'O', null];
+            const board = [];
+            for (let i = 0; i < size * size; i++) {
+                board.push(symbols[(bytes[3 + (i >> 2)] >> ((i & 3) << 1)) & 3]);
+            }
+            const message = {
+                type: 'game_state',
+                board: board,
+                current_player: (flags & 0x01) ? 'O' : 'X',
+                size: size,
+                ai_used: aiUsed
+            };
+            if (this.pendingResumed) {
+                message.resumed = true;
+                message.game_over = Boolean(flags & 0x02);
+                this.pendingResumed = false;
+            }
+            return message;
+        }
+        if (bytes[0] === 0x02) {
+            return this.applyMove(bytes[1], (flags & 0x10) ? 'O' : 'X', (flags & 0x01) ? 'O' : 'X', aiUsed);
+        }
+        if (bytes[0] === 0x03) {
+            return {
+                type: 'game_over',
+                winner: [null, 'X', 'O', 'Tie'][bytes[1]],
+                ai_used: aiUsed
+            };
+        }
+        console.warn('⚠️ Frame binario desconocido', bytes[0]);
+        return null;
+    }
+
+    // Turno completo -> game_state (+ game_over si la partida terminó)
+    expandTurn(turn) {
+        this.completeSeq(turn.seq);
+        let board = turn.board;
+        if (!board) {
+            board = this.board.slice();
+            board[turn.player_move] = 'X';
+            if (turn.agent_move !== null && turn.agent_move !== undefined) {
+                board[turn.agent_move] = 'O';
+            }
+        }
+        const messages = [{
+            type: 'game_state',
+            board: board,
+            current_player: turn.current_player,
+            size: turn.size || this.size,
+            ai_used: turn.agent_move === null ? undefined : turn.ai_used,
+            move_source: turn.move_source
+        }];
+        if (turn.winner) {
+            messages.push({type: 'game_over', winner: turn.winner, ai_used: turn.ai_used});
+        }
+        return messages;
+    }
+
+    applyMove(position, player, currentPlayer, aiUsed, moveSource) {
+        const board = this.board.slice();
+        board[position] = player;
+        return {
+            type: 'game_state',
+            board: board,
+            current_player: currentPlayer,
+            size: this.size,
+            ai_used: aiUsed,
+            move_source: moveSource
+        };
+    }
+
     setupBoard() {
         console.log(`🎯 Configurando tablero ${this.size}x${this.size}`);
         
@@ -284,10 +457,10 @@ class TicTacToeClient {
 
         // Notificar al servidor del reinicio
         if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-            this.ws.send(JSON.stringify({
+            this.send({
                 type: "reset_game",
                 size: this.size
-            }));
+            });
         } else {
             this.connectWebSocket();
         }
@@ -308,11 +481,10 @@ class TicTacToeClient {
             }
 
             if (this.ws.readyState === WebSocket.OPEN) {
-                const moveData = {
+                const moveData = this.send({
                     type: "player_move",
                     position: position
-                };
-                this.ws.send(JSON.stringify(moveData));
+                });
                 console.log("📤 Movimiento enviado:", moveData);
                 this.updateStatusMessage('🤖 IA pensando...', 'connected');
             } else {
@@ -0,0 +1,62 @@
+"""
+Simetrías diédricas (4 rotaciones x reflejo) de un tablero cuadrado N x N.
+
+Cada transformación se representa como una permutación `perm` tal que
+`transformado[i] = tablero[perm[i]]`.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+
+@lru_cache(maxsize=None)
+def board_symmetries(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """Las 8 permutaciones del grupo diédrico; la primera es la identidad."""
+    def cell(row, col):
+        return row * size + col
+
+    last = size - 1
+    maps = [
+        lambda r, c: cell(r, c),                # identidad
+        lambda r, c: cell(last - c, r),         # rotación 90°
+        lambda r, c: cell(last - r, last - c),  # rotación 180°
+        lambda r, c: cell(c, last - r),         # rotación 270°
+        lambda r, c: cell(r, last - c),         # reflejo horizontal
+        lambda r, c: cell(last - r, c),         # reflejo vertical
+        lambda r, c: cell(c, r),                # diagonal principal
+        lambda r, c: cell(last - c, last - r),  # diagonal secundaria
+    ]
+    return tuple(
+        tuple(source(i // size, i % size) for i in range(size * size))
+        for source in maps
+    )
+
+
+def apply_symmetry(board: Sequence[Optional[str]], perm: Sequence[int]) -> List[Optional[str]]:
+    """Aplica una permutación al tablero."""
+    return [board[source] for source in perm]
+
+
+def canonical_form(board: Sequence[Optional[str]], size: int) -> Tuple[Tuple[Optional[str], ...], Tuple[int, ...]]:
+    """
+    Retorna (tablero canónico, permutación usada). El canónico es el menor
+    de los 8 tableros simétricos según un orden fijo de las casillas.
+    """
+    order = {None: '0', 'X': '1', 'O': '2'}
+    best = None
+    for perm in board_symmetries(size):
+        candidate = tuple(board[source] for source in perm)
+        signature = ''.join(order.get(cell, '3') for cell in candidate)
+        if best is None or signature < best[0]:
+            best = (signature, candidate, perm)
+    return best[1], best[2]
+
+
+def move_from_canonical(position: int, perm: Sequence[int]) -> int:
+    """Traduce una posición del tablero canónico al tablero original."""
+    return perm[position]
+
+
+def move_to_canonical(position: int, perm: Sequence[int]) -> int:
+    """Traduce una posición del tablero original al tablero canónico."""
+    return perm.index(position)
@@ -0,0 +1,371 @@
+"""
+Torneo de autojuego entre agentes.
+
+Juega enfrentamientos configurables ("X:O", p. ej. engine:random o
+llm:minimax) en varios tamaños de tablero, reparte las partidas entre un pool
+de procesos y escribe una línea JSON por partida en cuanto termina (o, si la
+salida acaba en .parquet y pyarrow está instalado, un archivo Parquet con un
+grupo de filas cada --row-group-size partidas). Al terminar muestra, por enfrentamiento y tamaño, el porcentaje
+de victorias y empates, los percentiles de latencia por movimiento de cada
+agente y los movimientos por segundo.
+
+Agentes:
+    random   casilla libre al azar
+    minimax  el respaldo del servidor (tabla de aperturas + motor compartido)
+    engine   SearchEngine propio con el presupuesto de --budget-ms
+    llm      TicTacToeAI contra Ollama (con la búsqueda como respaldo, como
+             en el servidor)
+
+Los agentes deterministas juegan siempre la misma partida; --random-opening
+hace aleatorias las primeras jugadas (no cuentan en la latencia).
+
+Ejemplos:
+    python tournament.py --matchups engine:random minimax:engine --sizes 3 4 --games 50
+    python tournament.py --matchups llm:minimax --sizes 3 --games 10 --workers 2 --output llm.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import bitboard
+from config import Config
+from game_logic import TicTacToeGame
+from search_engine import SearchEngine
+
+# Un agente recibe la partida y el generador aleatorio de la partida y
+# retorna (posición, origen del movimiento)
+Player = Callable[[TicTacToeGame, random.Random], Tuple[int, str]]
+
+# Estado por proceso: el motor y el cliente de Ollama se crean una vez por
+# worker y se reutilizan entre partidas
+_engine: Optional[SearchEngine] = None
+_llm = None
+
+
+def _random_player(game: TicTacToeGame, rng: random.Random) -> Tuple[int, str]:
+    free = bitboard.full_mask(game.size) & ~(game.x_bits | game.o_bits)
+    return rng.choice(list(bitboard.iter_cells(free))), "random"
+
+
+def _minimax_player(game: TicTacToeGame, rng: random.Random) -> Tuple[int, str]:
+    from game_agent import minimax_algorithm
+    return minimax_algorithm(game.board, game.current_player, game.size), "search"
+
+
+def _engine_player(game: TicTacToeGame, rng: random.Random) -> Tuple[int, str]:
+    return _engine.best_move_for_game(game), "search"
+
+
+def _llm_player(game: TicTacToeGame, rng: random.Random) -> Tuple[int, str]:
+    loop, ai = _llm
+    decision = loop.run_until_complete(ai.choose_move(game.board, game.current_player, game.size))
+    # Si el LLM ganó la carrera, la búsqueda cancelada sigue en el hilo del
+    # ejecutor: esperarla para que no se solape con el siguiente movimiento
+    # (ni cuente en su latencia)
+    ai.executor.wait_idle()
+    return decision.position, decision.source
+
+
+PLAYERS: Dict[str, Player] = {
+    "random": _random_player,
+    "minimax": _minimax_player,
+    "engine": _engine_player,
+    "llm": _llm_player,
+}
+
+
+def _init_worker(budget_ms: float, ollama_url: str, model: str, players: Iterable[str]):
+    """Prepara los agentes que va a usar este proceso."""
+    global _engine, _llm
+    players = set(players)
+    if "engine" in players and _engine is None:
+        _engine = SearchEngine(max_tt_entries=Config.SEARCH_TT_MAX_ENTRIES, time_limit=budget_ms / 1000 or None)
+    if "llm" in players and _llm is None:
+        from ollama_integration import OllamaClient, TicTacToeAI
+        from search_executor import SearchExecutor
+        loop = asyncio.new_event_loop()
+        client = OllamaClient(base_url=ollama_url, model=model)
+        if not loop.run_until_complete(client.health.check()):
+            print(f"Ollama no disponible en {ollama_url}: el agente llm usará la búsqueda",
+                  file=sys.stderr)
+        # La búsqueda del modo hedged va en un hilo propio: sin un pool de
+        # procesos anidado dentro de cada worker del torneo y con su propio
+        # motor (search_engine.thread_engine), no el del jugador minimax
+        _llm = (loop, TicTacToeAI(client, executor=SearchExecutor(kind='thread', max_workers=1)))
+
+
+def play_game(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Juega una partida completa y retorna su registro. Un movimiento ilegal
+    hace perder la partida a quien lo jugó.
+    """
+    rng = random.Random(job["seed"])
+    game = TicTacToeGame(size=job["size"])
+    players = {'X': job["x"], 'O': job["o"]}
+    latencies: Dict[str, List[float]] = {'X': [], 'O': []}
+    sources: Counter = Counter()
+    winner = illegal = None
+    started = time.perf_counter()
+
+    while winner is None:
+        player = game.current_player
+        if len(game.moves_history) < job.get("random_opening", 0):
+            position, source = _random_player(game, rng)[0], "opening"
+        else:
+            move_started = time.perf_counter()
+            position, source = PLAYERS[players[player]](game, rng)
+            latencies[player].append(round((time.perf_counter() - move_started) * 1000, 3))
+        sources[f"{players[player]}/{source}"] += 1
+        if not game.make_move(position):
+            illegal = player
+            winner = 'O' if player == 'X' else 'X'
+            break
+        winner = game.winner
+
+    return {
+        "matchup": f"{job['x']}:{job['o']}",
+        "x": job["x"],
+        "o": job["o"],
+        "size": job["size"],
+        "game": job["game"],
+        "seed": job["seed"],
+        "winner": winner,
+        "illegal_move_by": illegal,
+        "moves": [move["position"] for move in game.moves_history],
+        "latency_ms": latencies,
+        "sources": dict(sources),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def build_jobs(matchups: List[str], sizes: List[int], games: int, seed: int,
+               random_opening: int = 0) -> List[Dict[str, Any]]:
+    jobs = []
+    for matchup in matchups:
+        x, o = matchup.split(":")
+        for size in sizes:
+            for game in range(games):
+                jobs.append({
+                    "x": x, "o": o, "size": size, "game": game,
+                    "seed": seed + len(jobs),
+                    "random_opening": random_opening,
+                })
+    return jobs
+
+
+def run_tournament(jobs: List[Dict[str, Any]], workers: int, budget_ms: float,
+                   ollama_url: str, model: str) -> Iterable[Dict[str, Any]]:
+    """
+    Registros de las partidas según terminan (no en el orden de `jobs`).
+    workers=0 juega en el propio proceso.
+    """
+    players = {job["x"] for job in jobs} | {job["o"] for job in jobs}
+    init_args = (budget_ms, ollama_url, model, players)
+    if workers == 0:
+        _init_worker(*init_args)
+        for job in jobs:
+            yield play_game(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        futures = [pool.submit(play_game, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentil por rango más cercano (None sin datos)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(records: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Estadísticas por enfrentamiento y tamaño, más el total."""
+    groups: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault((record["matchup"], record["size"]), []).append(record)
+
+    matchups = []
+    for (matchup, size), group in sorted(groups.items()):
+        games = len(group)
+        outcomes = Counter(record["winner"] for record in group)
+        agents = {}
+        for side in ('X', 'O'):
+            latencies = [ms for record in group for ms in record["latency_ms"][side]]
+            agents[side] = {
+                "agent": group[0][side.lower()],
+                "moves": len(latencies),
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "p99_ms": _percentile(latencies, 99),
+                "moves_per_second": round(len(latencies) / (sum(latencies) / 1000), 1) if sum(latencies) else None,
+            }
+        matchups.append({
+            "matchup": matchup,
+            "size": size,
+            "games": games,
+            "x_win_rate": round(outcomes['X'] / games, 4),
+            "o_win_rate": round(outcomes['O'] / games, 4),
+            "draw_rate": round(outcomes['Tie'] / games, 4),
+            "illegal_moves": sum(1 for record in group if record["illegal_move_by"]),
+            "agents": agents,
+        })
+
+    total_moves = sum(len(record["moves"]) for record in records)
+    return {
+        "games": len(records),
+        "moves": total_moves,
+        "wall_seconds": round(wall_seconds, 3),
+        "moves_per_second": round(total_moves / wall_seconds, 1) if wall_seconds else None,
+        "matchups": matchups,
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    def ms(value):
+        return f"{value:9.2f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'enfrentamiento':<18} {'tam':>3} {'partidas':>8} {'X gana':>7} {'O gana':>7} "
+          f"{'empate':>7} {'agente':>13} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mov/s':>9}")
+    for row in summary["matchups"]:
+        for side in ('X', 'O'):
+            agent = row["agents"][side]
+            head = (f"{row['matchup']:<18} {row['size']:>3} {row['games']:>8} "
+                    f"{row['x_win_rate']:>7.1%} {row['o_win_rate']:>7.1%} {row['draw_rate']:>7.1%}"
+                    if side == 'X' else " " * 57)
+            rate = agent["moves_per_second"]
+            print(f"{head} {agent['agent'] + ' (' + side + ')':>13} {ms(agent['p50_ms'])} "
+                  f"{ms(agent['p95_ms'])} {ms(agent['p99_ms'])} {rate if rate is not None else '-':>9}")
+        if row["illegal_moves"]:
+            print(f"{'':<18} movimientos ilegales: {row['illegal_moves']}")
+    print(f"\n{summary['games']} partidas, {summary['moves']} movimientos en {summary['wall_seconds']} s "
+          f"({summary['moves_per_second']} movimientos/s)")
+
+
+class JsonlRecords:
+    """Una línea JSON por partida, escrita en cuanto termina."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "w")
+
+    def write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetRecords:
+    """Archivo Parquet escrito por grupos de filas de `row_group_size` partidas."""
+
+    def __init__(self, path: str, row_group_size: int):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.row_group_size = max(1, row_group_size)
+        self._pa = pa
+        # Esquema explícito: un lote sin ganadores o sin movimientos ilegales no
+        # debe fijar esas columnas como nulas para el resto del archivo
+        latencies = pa.list_(pa.float64())
+        self._schema = pa.schema([
+            ("matchup", pa.string()), ("x", pa.string()), ("o", pa.string()),
+            ("size", pa.int64()), ("game", pa.int64()), ("seed", pa.int64()),
+            ("winner", pa.string()), ("illegal_move_by", pa.string()),
+            ("moves", pa.list_(pa.int64())),
+            ("latency_ms", pa.struct([("X", latencies), ("O", latencies)])),
+            ("sources", pa.map_(pa.string(), pa.int64())),
+            ("duration_ms", pa.float64()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._pending: List[Dict[str, Any]] = []
+
+    def write(self, record: Dict[str, Any]):
+        self._pending.append(record)
+        if len(self._pending) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(self._pa.Table.from_pylist(self._pending, schema=self._schema))
+            self._pending = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_records(path: str, row_group_size: int):
+    """Registro por partida según la extensión (.parquet sin pyarrow -> .jsonl)."""
+    if not path.endswith(".parquet"):
+        return JsonlRecords(path)
+    try:
+        return ParquetRecords(path, row_group_size)
+    except ImportError:
+        fallback = path[:-len(".parquet")] + ".jsonl"
+        print(f"pyarrow no está instalado: registro guardado en {fallback}", file=sys.stderr)
+        return JsonlRecords(fallback)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Torneo de autojuego entre agentes")
+    parser.add_argument("--matchups", nargs="+", default=["engine:random", "minimax:engine"],
+                        help=f"Enfrentamientos X:O con agentes de {', '.join(PLAYERS)}")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3])
+    parser.add_argument("--games", type=int, default=20, help="Partidas por enfrentamiento y tamaño")
+    parser.add_argument("--swap", action="store_true", help="Jugar también cada enfrentamiento con los colores cambiados")
+    parser.add_argument("--random-opening", type=int, default=0, help="Jugadas iniciales al azar")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos (0 = en este proceso)")
+    parser.add_argument("--budget-ms", type=float, default=Config.SEARCH_TIME_BUDGET_MS,
+                        help="Presupuesto por movimiento del agente engine (0 = sin límite)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="tournament.jsonl", help="Registro por partida (.jsonl o .parquet)")
+    parser.add_argument("--row-group-size", type=int, default=256,
+                        help="Partidas por grupo de filas en la salida .parquet")
+    parser.add_argument("--summary", help="Guardar también el resumen en este archivo JSON")
+    parser.add_argument("--url", default=Config.get_ollama_url())
+    parser.add_argument("--model", default=Config.OLLAMA_MODEL)
+    args = parser.parse_args(argv)
+
+    matchups = list(args.matchups)
+    for matchup in args.matchups:
+        x, _, o = matchup.partition(":")
+        if x not in PLAYERS or o not in PLAYERS:
+            parser.error(f"Enfrentamiento inválido: {matchup}")
+        if args.swap and x != o:
+            matchups.append(f"{o}:{x}")
+
+    jobs = build_jobs(matchups, args.sizes, args.games, args.seed, args.random_opening)
+    records = []
+    output = open_records(args.output, args.row_group_size)
+    started = time.perf_counter()
+    try:
+        for record in run_tournament(jobs, args.workers, args.budget_ms, args.url, args.model):
+            records.append(record)
+            output.write(record)
+    finally:
+        output.close()
+    wall_seconds = time.perf_counter() - started
+
+    summary = summarize(records, wall_seconds)
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, "w") as output:
+            json.dump(summary, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
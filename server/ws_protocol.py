@@ -0,0 +1,240 @@
+"""
+Formatos de mensaje del WebSocket /game, negociados con ?protocol=.
+
+- json (por defecto): el formato original, con el tablero completo en cada
+  mensaje game_state.
+- delta: JSON, pero tras cada movimiento solo se envía la casilla, quién
+  jugó y el turno siguiente ({"type": "move", ...}); el tablero completo solo
+  va en el estado inicial y al reiniciar.
+- binary: frames binarios. El tablero ocupa 2 bits por casilla (21 bytes en
+  9x9 frente a ~500 de JSON). Los errores y los datos de sesión (game_id),
+  que no son por movimiento, siguen siendo JSON de texto.
+
+Frames binarios (byte 0 = tipo):
+    STATE     0x01 | size | flags | tablero empaquetado (ceil(size²/4) bytes)
+    MOVE      0x02 | posición | flags
+    GAME_OVER 0x03 | ganador | flags
+    TURN      0x04 | seq (2 bytes, big-endian) | jugador | agente | flags | ganador
+flags: bit0 turno de O, bit1 partida terminada, bit2 movimiento elegido por
+el LLM (ai_used), bit3 ai_used presente, bit4 quien acaba de jugar es O.
+Casillas: 0 vacía, 1 X, 2 O; la casilla i ocupa los bits 2*(i%4) del byte
+i//4. Ganador: 0 ninguno, 1 X, 2 O, 3 empate. En TURN, agente = 0xFF si el
+agente no llegó a mover (la partida terminó con el movimiento del jugador).
+
+Los mensajes del cliente (player_move, reset_game) son JSON en todos los modos
+y pueden llevar un número de secuencia "seq" (entero de 0 a 65535, el rango
+del campo de TURN) que se repite en la respuesta. Un seq fuera de rango o que
+no es entero se rechaza con un error y la conexión sigue abierta.
+
+Con ?batch=true cada player_move recibe una única respuesta "turn" con el
+movimiento del jugador, el del agente y el resultado, en lugar de hasta
+cuatro mensajes (estado, game_over, estado, game_over).
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+import metrics
+from game_logic import TicTacToeGame
+
+STATE, MOVE, GAME_OVER, TURN = 0x01, 0x02, 0x03, 0x04
+NO_MOVE = 0xFF
+MAX_SEQ = 0xFFFF
+
+FLAG_O_TO_MOVE = 0x01
+FLAG_GAME_OVER = 0x02
+FLAG_AI_USED = 0x04
+FLAG_AI_KNOWN = 0x08
+FLAG_PLACED_BY_O = 0x10
+
+_WINNER_CODES = {None: 0, 'X': 1, 'O': 2, 'Tie': 3}
+
+bytes_sent_total = metrics.registry.counter(
+    'ttt_ws_bytes_sent_total',
+    'Bytes enviados por el WebSocket /game, por protocolo',
+    ['protocol'])
+
+
+def valid_seq(seq: Any) -> bool:
+    """True si `seq` cabe en el campo de 2 bytes de TURN (bool no cuenta como entero)."""
+    return isinstance(seq, int) and not isinstance(seq, bool) and 0 <= seq <= MAX_SEQ
+
+
+def pack_board(x_bits: int, o_bits: int, size: int) -> bytes:
+    """Tablero a 2 bits por casilla."""
+    cells = size * size
+    packed = bytearray((cells + 3) // 4)
+    for i in range(cells):
+        code = (x_bits >> i & 1) | (o_bits >> i & 1) << 1
+        if code:
+            packed[i >> 2] |= code << ((i & 3) << 1)
+    return bytes(packed)
+
+
+def unpack_board(packed: bytes, size: int) -> list:
+    """Inverso de pack_board, como lista de None/'X'/'O'."""
+    symbols = (None, 'X', 'O', None)
+    return [symbols[packed[i >> 2] >> ((i & 3) << 1) & 3] for i in range(size * size)]
+
+
+def _flags(game: TicTacToeGame, ai_used: Optional[bool]) -> int:
+    flags = FLAG_O_TO_MOVE if game.current_player == 'O' else 0
+    if game.game_over:
+        flags |= FLAG_GAME_OVER
+    if ai_used is not None:
+        flags |= FLAG_AI_KNOWN | (FLAG_AI_USED if ai_used else 0)
+    return flags
+
+
+class JsonProtocol:
+    """Formato original: tablero completo en cada actualización."""
+
+    name = 'json'
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    async def _send_json(self, message: Dict[str, Any]):
+        text = json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+        bytes_sent_total.inc(len(text), protocol=self.name)
+        await self.websocket.send_text(text)
+
+    async def _send_bytes(self, data: bytes):
+        bytes_sent_total.inc(len(data), protocol=self.name)
+        await self.websocket.send_bytes(data)
+
+    async def send_state(self, game: TicTacToeGame, **extra):
+        """Estado completo (inicial, reanudado o tras reiniciar)."""
+        await self._send_json({
+            "type": "game_state",
+            "board": game.board,
+            "current_player": game.current_player,
+            "size": game.size,
+            **extra
+        })
+
+    async def send_move(self, game: TicTacToeGame, position: int, ai_used: Optional[bool] = None,
+                        move_source: Optional[str] = None):
+        """Actualización tras un movimiento ya aplicado a `game`."""
+        extra = {}
+        if ai_used is not None:
+            extra["ai_used"] = ai_used
+        if move_source is not None:
+            extra["move_source"] = move_source
+        await self.send_state(game, **extra)
+
+    async def send_game_over(self, winner: str, ai_used: Optional[bool]):
+        await self._send_json({
+            "type": "game_over",
+            "winner": winner,
+            "ai_used": ai_used
+        })
+
+    async def send_turn(self, game: TicTacToeGame, seq: Optional[int], player_move: int,
+                        agent_move: Optional[int] = None, winner: Optional[str] = None,
+                        ai_used: Optional[bool] = None, move_source: Optional[str] = None):
+        """Turno completo (jugador + agente + resultado) en un solo mensaje."""
+        await self._send_json({
+            "type": "turn",
+            "seq": seq,
+            "player_move": player_move,
+            "agent_move": agent_move,
+            "board": game.board,
+            "current_player": game.current_player,
+            "size": game.size,
+            "winner": winner,
+            "ai_used": ai_used,
+            "move_source": move_source
+        })
+
+    async def send_error(self, message: str, seq: Optional[int] = None):
+        error = {
+            "type": "error",
+            "message": message
+        }
+        if seq is not None:
+            error["seq"] = seq
+        await self._send_json(error)
+
+
+class DeltaProtocol(JsonProtocol):
+    """JSON con solo el cambio de cada movimiento."""
+
+    name = 'delta'
+
+    async def send_move(self, game: TicTacToeGame, position: int, ai_used: Optional[bool] = None,
+                        move_source: Optional[str] = None):
+        message = {
+            "type": "move",
+            "position": position,
+            "player": game.moves_history[-1]['player'],
+            "current_player": game.current_player
+        }
+        if ai_used is not None:
+            message["ai_used"] = ai_used
+        if move_source is not None:
+            message["move_source"] = move_source
+        await self._send_json(message)
+
+    async def send_turn(self, game: TicTacToeGame, seq: Optional[int], player_move: int,
+                        agent_move: Optional[int] = None, winner: Optional[str] = None,
+                        ai_used: Optional[bool] = None, move_source: Optional[str] = None):
+        await self._send_json({
+            "type": "turn",
+            "seq": seq,
+            "player_move": player_move,
+            "agent_move": agent_move,
+            "current_player": game.current_player,
+            "winner": winner,
+            "ai_used": ai_used,
+            "move_source": move_source
+        })
+
+
+class BinaryProtocol(JsonProtocol):
+    """Frames binarios con el tablero a 2 bits por casilla."""
+
+    name = 'binary'
+
+    async def send_state(self, game: TicTacToeGame, **extra):
+        ai_used = extra.pop("ai_used", None)
+        extra.pop("move_source", None)
+        extra.pop("game_over", None)
+        if extra:
+            # Datos de sesión (game_id, resumed): texto, solo al conectar o reiniciar
+            await self._send_json({"type": "session", **extra})
+        await self._send_bytes(
+            bytes((STATE, game.size, _flags(game, ai_used)))
+            + pack_board(game.x_bits, game.o_bits, game.size)
+        )
+
+    async def send_move(self, game: TicTacToeGame, position: int, ai_used: Optional[bool] = None,
+                        move_source: Optional[str] = None):
+        flags = _flags(game, ai_used)
+        if game.moves_history[-1]['player'] == 'O':
+            flags |= FLAG_PLACED_BY_O
+        await self._send_bytes(bytes((MOVE, position, flags)))
+
+    async def send_game_over(self, winner: str, ai_used: Optional[bool]):
+        flags = FLAG_GAME_OVER
+        if ai_used is not None:
+            flags |= FLAG_AI_KNOWN | (FLAG_AI_USED if ai_used else 0)
+        await self._send_bytes(bytes((GAME_OVER, _WINNER_CODES[winner], flags)))
+
+    async def send_turn(self, game: TicTacToeGame, seq: Optional[int], player_move: int,
+                        agent_move: Optional[int] = None, winner: Optional[str] = None,
+                        ai_used: Optional[bool] = None, move_source: Optional[str] = None):
+        seq = seq or 0
+        await self._send_bytes(bytes((
+            TURN, seq >> 8, seq & 0xFF, player_move,
+            NO_MOVE if agent_move is None else agent_move,
+            _flags(game, ai_used), _WINNER_CODES[winner]
+        )))
+
+
+PROTOCOLS = {protocol.name: protocol for protocol in (JsonProtocol, DeltaProtocol, BinaryProtocol)}
+
+
+def get_protocol(name: str, websocket) -> JsonProtocol:
+    """Instancia el protocolo pedido por el cliente (json si no se reconoce)."""
+    return PROTOCOLS.get(name, JsonProtocol)(websocket)
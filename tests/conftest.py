@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del servidor usan imports planos (se ejecutan desde server/)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'server'))
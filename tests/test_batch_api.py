@@ -0,0 +1,44 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from server.server import app
+
+EMPTY_4 = [None] * 16
+X_WINS = ['X', 'X', 'X', 'O', 'O', None, None, None, None]
+
+
+def test_make_move_batch_deduplicates_and_keeps_order():
+    near_win = ['X', 'X', None, None, 'O', None, None, None, None]
+    states = [
+        {'board': EMPTY_4, 'current_player': 'X', 'size': 4},
+        {'board': near_win, 'current_player': 'O', 'size': 3},
+        {'board': EMPTY_4, 'current_player': 'X', 'size': 4},
+        {'board': [None] * 5, 'current_player': 'X', 'size': 3},
+    ]
+    with TestClient(app) as client:
+        body = client.post('/make_move_batch', json=states).json()
+
+    first, blocked, repeated, invalid = body['results']
+    assert body['unique'] == 3
+    assert first == repeated and first['player'] == 'X'
+    assert blocked == {'position': 2, 'player': 'O'}
+    assert 'error' in invalid
+
+
+def test_check_winner_batch_streams_ndjson_in_order():
+    states = [
+        {'board': X_WINS, 'size': 3},
+        {'board': [None] * 9, 'size': 3},
+        {'board': X_WINS, 'size': 3},
+    ]
+    with TestClient(app) as client:
+        response = client.post('/check_winner_batch?stream=true', json=states)
+
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {'index': 0, 'winner': 'X'},
+        {'index': 1, 'winner': None},
+        {'index': 2, 'winner': 'X'},
+    ]
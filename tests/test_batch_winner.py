@@ -0,0 +1,25 @@
+import random
+
+import pytest
+
+import batch_winner
+from game_agent import check_winner
+
+
+def _boards(size, count=500, seed=3):
+    rng = random.Random(seed)
+    return [rng.choices((None, 'X', 'O'), k=size * size) for _ in range(count)]
+
+
+def test_scalar_path_matches_check_winner():
+    boards = _boards(3) + [['X'] * 3 + ['O'] * 3 + [None] * 3, ['X', 'O', 'X', 'X', 'O', 'O', 'O', 'X', 'X']]
+    assert batch_winner.scalar_winners(boards, 3) == [check_winner(board, 3) for board in boards]
+
+
+@pytest.mark.parametrize("size", [3, 4, 5, 9])
+def test_vectorized_matches_check_winner(size):
+    pytest.importorskip("numpy")
+    boards = _boards(size)
+    codes = batch_winner.winner_codes(batch_winner.encode_boards(boards, size), size)
+    assert [batch_winner.WINNERS[code] for code in codes.tolist()] == [check_winner(b, size) for b in boards]
+    assert batch_winner.batch_winners(boards, size) == [check_winner(b, size) for b in boards]
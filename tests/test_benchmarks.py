@@ -0,0 +1,124 @@
+"""
+Benchmarks del código con pytest-benchmark (se omiten si no está instalado).
+
+Micro: check_winner y minimax_algorithm por tamaño de tablero,
+make_move/undo_last_move y serialización del estado. Macro: ida y vuelta de
+un movimiento por el WebSocket /game con Ollama simulado.
+
+Para guardar los resultados y fallar ante regresiones: ./run-benchmarks.sh
+"""
+
+import json
+import random
+import re
+
+import httpx
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fastapi.testclient import TestClient
+
+from game_agent import check_winner, minimax_algorithm
+from game_logic import TicTacToeGame
+from ollama_integration import ollama_client, tic_tac_toe_ai
+from server.server import app
+from session_store import decode_game, encode_game
+
+
+def _midgame(size, plies, seed=11):
+    """Partida con `plies` movimientos al azar sin ganador."""
+    rng = random.Random(seed)
+    while True:
+        game = TicTacToeGame(size=size)
+        for position in rng.sample(range(size * size), plies):
+            game.make_move(position)
+        if game.winner is None:
+            return game
+
+
+@pytest.mark.benchmark(group="check_winner")
+@pytest.mark.parametrize("size", [3, 4, 5, 9])
+def test_check_winner(benchmark, size):
+    board = _midgame(size, size * size // 2).board
+    assert benchmark(check_winner, board, size) is None
+
+
+@pytest.mark.benchmark(group="minimax")
+@pytest.mark.parametrize("size", [3, 4, 5])
+def test_minimax_algorithm(benchmark, size):
+    game = _midgame(size, 2 if size == 3 else size)
+    position = benchmark(minimax_algorithm, game.board, game.current_player, size)
+    assert game.board[position] is None
+
+
+@pytest.mark.benchmark(group="game")
+@pytest.mark.parametrize("size", [3, 9])
+def test_make_and_undo_moves(benchmark, size):
+    game = TicTacToeGame(size=size)
+    # Sin llenar el tablero (make_move rechaza movimientos tras la victoria)
+    order = list(range(0, size * size, 2))[:size]
+
+    def play_and_undo():
+        for position in order:
+            game.make_move(position)
+        while game.undo_last_move():
+            pass
+
+    benchmark(play_and_undo)
+    assert game.x_bits == game.o_bits == 0
+
+
+@pytest.mark.benchmark(group="serialization")
+def test_state_message_json(benchmark):
+    game = _midgame(9, 40)
+    message = {"type": "game_state", "board": game.board, "current_player": game.current_player, "size": 9}
+    benchmark(json.dumps, message, separators=(',', ':'))
+
+
+@pytest.mark.benchmark(group="serialization")
+def test_session_state_roundtrip(benchmark):
+    game = _midgame(9, 40)
+    restored = benchmark(lambda: decode_game(encode_game(game)))
+    assert restored.board == game.board
+
+
+def _fake_ollama(request):
+    """Ollama simulado: juega la primera casilla libre que aparece en el prompt."""
+    if request.url.path == "/api/tags":
+        return httpx.Response(200, json={"models": [{"name": ollama_client.model}]})
+    payload = json.loads(request.content)
+    match = re.search(r"Libres: (\d+)", payload.get("prompt", ""))
+    answer = match.group(1) if match else ""
+    if payload.get("stream"):
+        lines = [{"response": answer, "done": False}, {"response": "", "done": True}]
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines))
+    return httpx.Response(200, json={"response": answer, "done": True})
+
+
+@pytest.fixture
+def stubbed_ollama(monkeypatch):
+    monkeypatch.setattr(ollama_client, "_transport", httpx.MockTransport(_fake_ollama))
+    # Cada iteración debe llegar al modelo, no a la caché de movimientos
+    monkeypatch.setattr(tic_tac_toe_ai, "move_cache", None)
+    # Restaurar el estado de salud al terminar para no afectar a otras pruebas
+    for attribute in ("healthy", "circuit", "consecutive_failures"):
+        monkeypatch.setattr(ollama_client.health, attribute, getattr(ollama_client.health, attribute))
+    monkeypatch.setattr(ollama_client, "models", ollama_client.models)
+
+
+@pytest.mark.benchmark(group="websocket")
+def test_websocket_move_roundtrip(benchmark, stubbed_ollama):
+    with TestClient(app) as client:
+        with client.websocket_connect("/game?size=3&batch=true") as ws:
+            ws.receive_json()
+
+            def move_roundtrip():
+                ws.send_json({"type": "reset_game", "size": 3})
+                ws.receive_json()
+                ws.send_json({"type": "player_move", "position": 4, "seq": 1})
+                return ws.receive_json()
+
+            turn = benchmark(move_roundtrip)
+    assert turn["type"] == "turn" and turn["agent_move"] == 0
+    assert turn["move_source"] == "llm"
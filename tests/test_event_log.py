@@ -0,0 +1,39 @@
+import json
+import logging
+import queue
+
+from event_log import EventLogger, JsonFormatter, _DeferredQueueHandler
+
+
+def _capture(name):
+    records = queue.SimpleQueue()
+    logger = logging.getLogger(name)
+    logger.handlers = [_DeferredQueueHandler(records)]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return records
+
+
+def test_event_is_one_line_json_with_fields():
+    records = _capture('test.events.json')
+    EventLogger('test.events.json', sample_rates={}).info("game.move", conn=1, pos=4, source="llm")
+
+    record = records.get_nowait()
+    # El mensaje no se formateó al encolar
+    assert record.msg == '%s %s'
+    line = JsonFormatter().format(record)
+    assert '\n' not in line
+    entry = json.loads(line)
+    assert entry['event'] == 'game.move'
+    assert (entry['conn'], entry['pos'], entry['source']) == (1, 4, 'llm')
+
+
+def test_sampling_rates_per_event():
+    records = _capture('test.events.sampling')
+    events = EventLogger('test.events.sampling', sample_rates={"ws.message": 0.0, "game.move": 1.0})
+    for _ in range(50):
+        events.debug("ws.message", type="player_move")
+    events.info("game.move", pos=0)
+
+    assert records.qsize() == 1
+    assert records.get_nowait().event == "game.move"
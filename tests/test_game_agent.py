@@ -1,16 +1,19 @@
 from fastapi.testclient import TestClient
-from server.game_agent import app, check_winner
 
-# para ejecutar los tests, ejecuta el siguiente comando en la terminal:
-# cd /Volumes/SSDWD2T/projects/tic-tac-toe-agent
-# PYTHONPATH=$PYTHONPATH:. pytest tests/test_game_agent.py
+from game_agent import check_winner
+from server.server import app
+
+# para ejecutar los tests, ejecuta el siguiente comando en la terminal
+# (desde la raíz del repositorio):
+# pytest tests/test_game_agent.py
 
 client = TestClient(app)
 
 def test_make_move():
     response = client.post("/make_move", json={
         "board": [None, None, None, None, None, None, None, None, None],
-        "current_player": "X"
+        "current_player": "X",
+        "size": 3
     })
     assert response.status_code == 200
     data = response.json()
@@ -20,5 +23,5 @@ def test_make_move():
 
 def test_check_winner():
     board = ["X", "X", "X", None, None, None, None, None, None]
-    winner = check_winner(board)
+    winner = check_winner(board, 3)
     assert winner == "X"
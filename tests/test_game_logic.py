@@ -0,0 +1,44 @@
+from game_logic import TicTacToeGame
+from game_agent import check_winner
+
+
+def test_make_move_and_undo():
+    game = TicTacToeGame(size=4)
+    assert game.make_move(5)
+    assert not game.make_move(5)
+    assert game.board[5] == "X"
+    assert game.current_player == "O"
+    assert 5 not in game.get_valid_moves()
+
+    assert game.undo_last_move()
+    assert game.board == [None] * 16
+    assert game.current_player == "X"
+
+
+def test_board_view_round_trip():
+    board = ["X", None, "O", None, "X", None, "O", None, "X"]
+    game = TicTacToeGame(board=board)
+    assert game.board == board
+    assert game.get_valid_moves() == [1, 3, 5, 7]
+    assert not game.is_board_full()
+
+
+def test_check_winner_lines_and_tie():
+    assert check_winner(["X", "X", "X", None, None, None, None, None, None], 3) == "X"
+    assert check_winner(["O", None, None, None, "O", None, None, None, "O"], 3) == "O"
+    assert check_winner(["X", "O", "X", "X", "O", "O", "O", "X", "X"], 3) == "Tie"
+    assert check_winner([None] * 16, 4) is None
+
+
+def test_incremental_winner_follows_moves_and_undo():
+    game = TicTacToeGame(size=3)
+    for position in (0, 3, 1, 4):
+        game.make_move(position)
+    assert game.winner is None and not game.is_terminal
+
+    game.make_move(2)
+    assert game.winner == "X" and game.is_terminal
+
+    game.undo_last_move()
+    assert game.winner is None
+    assert game.last_move == 4
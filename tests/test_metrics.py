@@ -0,0 +1,43 @@
+from metrics import MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latencia', ['stage'], buckets=(0.01, 0.1))
+    latency.observe(0.005, stage='llm')
+    latency.observe(0.05, stage='llm')
+    latency.observe(2.0, stage='llm')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE latency_seconds histogram' in lines
+    assert 'latency_seconds_bucket{stage="llm",le="0.01"} 1' in lines
+    assert 'latency_seconds_bucket{stage="llm",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{stage="llm",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{stage="llm"} 3' in lines
+
+
+def test_counters_and_function_gauges():
+    registry = MetricsRegistry()
+    fallbacks = registry.counter('fallback_total', 'Fallbacks', ['reason'])
+    fallbacks.inc(reason='deadline')
+    fallbacks.inc(reason='deadline')
+    games = {}
+    registry.gauge('active_games', 'Partidas', lambda: len(games))
+    games['a'] = 1
+
+    lines = registry.render().splitlines()
+    assert 'fallback_total{reason="deadline"} 2' in lines
+    assert 'active_games 1' in lines
+
+
+def test_metrics_endpoint_exposes_server_metrics():
+    from fastapi.testclient import TestClient
+    from server.server import app
+
+    response = TestClient(app).get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    for name in ('ttt_active_games', 'ttt_search_queue_depth', 'ttt_llm_generation_seconds',
+                 'ttt_win_detection_seconds', 'ttt_fallback_total', 'ttt_model_load_seconds',
+                 'ttt_model_unloads_total'):
+        assert f'# TYPE {name} ' in response.text
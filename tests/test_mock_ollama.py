@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+import httpx
+import pytest
+
+from mock_ollama import MockOllamaSettings, create_app, parse_latency
+from ollama_integration import OllamaClient, TicTacToeAI
+
+BOARD = ['X', None, None, None, 'X', None, None, None, None]
+SERVER_DIR = os.path.join(os.path.dirname(__file__), '..', 'server')
+
+
+def _client(**settings):
+    app = create_app(MockOllamaSettings(models=["mock"], seed=1, **settings))
+    return OllamaClient(model="mock", transport=httpx.ASGITransport(app=app)), app.state.mock
+
+
+def test_parse_latency():
+    assert parse_latency("fixed:250")(None) == 0.25
+    assert 0.01 <= parse_latency("uniform:10:20")(__import__("random").Random(0)) <= 0.02
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+
+
+def test_generate_and_stream_answer_a_free_cell():
+    client, mock = _client(answers="first-free")
+    ai = TicTacToeAI(client)
+
+    async def scenario():
+        client.keeper.touch()
+        assert await client.health.check()
+        move = await ai._llm_move(BOARD, 'O', 3)
+        text = await client.generate_stream("Libres: 2 3\nCasilla:", label="3x3")
+        await client.aclose()
+        return move, text
+
+    move, text = asyncio.run(scenario())
+    assert move == 1 and text == "2"
+    assert mock.stats["loads"] == 1 and mock.stats["stream"] + mock.stats["generate"] == 2
+    assert client.prompt_eval_stats()["3x3"]["avg_prompt_tokens"] > 0
+
+
+def test_oom_on_model_load_marks_ollama_unavailable():
+    client, mock = _client(oom_rate=1.0)
+
+    async def scenario():
+        # Con partidas activas la comprobación también carga el modelo
+        client.keeper.touch()
+        available = await client.health.check()
+        await client.aclose()
+        return available
+
+    assert asyncio.run(scenario()) is False
+    assert "memory" in client.health.last_error
+    assert mock.stats["oom"] == 1
+
+
+def test_scripted_answers_and_errors():
+    client, mock = _client(script=["7", "basura"])
+
+    async def scenario():
+        first = await client.generate("cualquier prompt")
+        second = await client.generate("cualquier prompt")
+        await client.aclose()
+        return first, second
+
+    assert asyncio.run(scenario()) == ("7", "basura")
+
+    failing, mock = _client(error_rate=1.0)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(failing.generate("Libres: 0\nCasilla:"))
+    assert mock.stats["errors"] == 1
+
+
+# Servidor del juego con su cliente global configurado por entorno; imprime
+# el estado de Ollama y la respuesta a un movimiento por el WebSocket
+_GAME_SERVER = textwrap.dedent("""
+    import json, time
+    from fastapi.testclient import TestClient
+    from server import app
+
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 10
+        status = client.get("/ollama-status").json()
+        while not status["ollama_available"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+            status = client.get("/ollama-status").json()
+        with client.websocket_connect("/game?size=3&batch=true") as ws:
+            ws.receive_json()
+            ws.send_json({"type": "player_move", "position": 4, "seq": 1})
+            turn = ws.receive_json()
+    print(json.dumps({"status": status, "turn": turn}))
+""")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_game_server_reaches_mock_through_env_config():
+    port = _free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "mock_ollama.py", "--port", str(port), "--models", "mock-env",
+         "--latency", "fixed:0", "--token-latency", "fixed:0"],
+        cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                httpx.get(f"{url}/api/tags")
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "el servidor simulado no arrancó"
+                time.sleep(0.05)
+
+        env = {**os.environ, "OLLAMA_HOST": "127.0.0.1", "OLLAMA_PORT": str(port),
+               "OLLAMA_MODEL": "mock-env", "MOVE_CACHE_PATH": ""}
+        result = subprocess.run([sys.executable, "-c", _GAME_SERVER], cwd=SERVER_DIR, env=env,
+                                capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+        stats = httpx.get(f"{url}/mock/stats").json()
+    finally:
+        mock.terminate()
+        mock.wait(timeout=10)
+
+    status = output["status"]
+    assert status["ollama_available"] and status["ollama_url"] == url
+    assert status["model"] == status["model_keeper"]["model"] == "mock-env"
+    assert output["turn"]["move_source"] == "llm"
+    assert stats["loads"] >= 1 and stats["loaded"] == ["mock-env"]
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+from move_cache import MoveCache
+
+
+def test_symmetric_positions_share_an_entry():
+    cache = MoveCache()
+    board = ["X", None, None, None, None, None, None, None, None]
+    cache.put(board, "O", "phi3:mini", "v1", 4)
+    assert cache.get(board, "O", "phi3:mini", "v1") == 4
+
+    # Esquina inferior derecha: misma posición rotada 180°
+    rotated = [None, None, None, None, None, None, None, None, "X"]
+    cache.put(["X", "O", None, None, None, None, None, None, None], "X", "m", "v1", 2)
+    assert cache.get(rotated, "O", "phi3:mini", "v1") == 4
+    assert cache.get([None, None, None, None, None, None, None, "O", "X"], "X", "m", "v1") == 6
+    assert cache.stats()["hits"] == 3
+
+
+def test_key_includes_model_and_prompt_version():
+    cache = MoveCache()
+    board = [None] * 9
+    cache.put(board, "X", "llama2", "v1", 4)
+    assert cache.get(board, "X", "phi3:mini", "v1") is None
+    assert cache.get(board, "X", "llama2", "v2") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction_and_persistence(tmp_path):
+    path = str(tmp_path / "moves.sqlite")
+    cache = MoveCache(max_entries=1, persist_path=path)
+    cache.put([None] * 9, "X", "m", "v1", 4)
+    cache.put(["X"] + [None] * 8, "O", "m", "v1", 4)
+    assert cache.stats()["entries"] == 1
+    cache.close()
+
+    reloaded = MoveCache(persist_path=path)
+    assert reloaded.get([None] * 9, "X", "m", "v1") == 4
+
+
+def test_sqlite_writes_run_off_the_event_loop_in_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / "moves.sqlite")
+    cache = MoveCache(persist_path=path)
+    writers = []
+    flush = cache.flush
+
+    def recording_flush():
+        writers.append(threading.current_thread().name)
+        flush()
+
+    monkeypatch.setattr(cache, "flush", recording_flush)
+
+    async def play():
+        for position in range(9):
+            board = [None] * 9
+            board[position] = "X"
+            cache.put(board, "O", "m", "v1", (position + 1) % 9)
+
+    asyncio.run(play())
+    cache.close()
+    assert writers and all(name.startswith("move-cache") for name in writers)
+    assert 1 <= cache.db_batches <= len(writers)
+
+    reloaded = MoveCache(persist_path=path)
+    center = [None] * 9
+    center[4] = "X"
+    assert reloaded.get(center, "O", "m", "v1") == 5
+
+
+def test_persisted_entries_are_loaded_at_startup_and_lookups_skip_sqlite(tmp_path):
+    path = str(tmp_path / "moves.sqlite")
+    cache = MoveCache(persist_path=path)
+    cache.put([None] * 9, "X", "m", "v1", 4)
+    expired = MoveCache(ttl=0.01, persist_path=path)
+    expired.put(["X"] + [None] * 8, "O", "m", "v1", 4)
+    cache.close()
+    expired.close()
+    time.sleep(0.02)
+
+    reloaded = MoveCache(persist_path=path)
+    assert reloaded.stats()["entries"] == 1
+
+    class NoQueries:
+        def execute(self, *args):
+            raise AssertionError("consulta a sqlite en el camino de lectura")
+
+    # Esperar a la limpieza de caducadas que hace el hilo escritor al abrir
+    reloaded._writer.submit(lambda: None).result()
+    db, reloaded._db = reloaded._db, NoQueries()
+    try:
+        assert reloaded.get([None] * 9, "X", "m", "v1") == 4
+        assert reloaded.get(["X"] + [None] * 8, "O", "m", "v1") is None
+    finally:
+        reloaded._db = db
+        reloaded.close()
@@ -0,0 +1,343 @@
+import asyncio
+
+from ollama_integration import OllamaHealthMonitor
+
+
+class FakeProbeClient:
+    def __init__(self, results):
+        self.results = list(results)
+
+    async def probe(self):
+        return self.results.pop(0)
+
+
+def test_health_monitor_backoff_and_recovery():
+    monitor = OllamaHealthMonitor(FakeProbeClient(["down", "down", None]),
+                                  interval=30, retry_base=2, max_backoff=5, failure_threshold=3)
+    assert not monitor.available
+
+    asyncio.run(monitor.check())
+    assert not monitor.available
+    assert monitor.next_delay() == 2
+    asyncio.run(monitor.check())
+    assert monitor.next_delay() == 4
+
+    asyncio.run(monitor.check())
+    assert monitor.available
+    assert monitor.next_delay() == 30
+
+
+def test_circuit_opens_after_repeated_generate_failures():
+    monitor = OllamaHealthMonitor(FakeProbeClient([None, None]), failure_threshold=2)
+    asyncio.run(monitor.check())
+    assert monitor.available
+
+    monitor.record_failure("timeout")
+    assert monitor.available
+    monitor.record_failure("timeout")
+    assert not monitor.available
+    assert monitor.status()["circuit"] == OllamaHealthMonitor.OPEN
+
+    asyncio.run(monitor.check())
+    assert monitor.available
+
+
+def test_client_reuses_pooled_connection():
+    import httpx
+    from ollama_integration import OllamaClient
+
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "phi3:mini"}]})
+        return httpx.Response(200, json={"response": "4"})
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        await client.start()
+        pooled = client._client
+        assert await client.generate("prompt") == "4"
+        assert await client.is_available()
+        assert client._client is pooled
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert seen == ["/api/generate", "/api/tags", "/api/generate"]
+    assert client.models == [{"name": "phi3:mini"}]
+
+
+def test_streaming_stops_at_first_complete_move():
+    import json
+
+    import httpx
+    from ollama_integration import OllamaClient, TicTacToeAI
+
+    chunks = ["Juego", " en", " la", " 4", ".", " Porque", " el", " centro"]
+    sent = []
+
+    async def body():
+        for chunk in chunks:
+            sent.append(chunk)
+            yield (json.dumps({"response": chunk, "done": False}) + "\n").encode()
+        yield (json.dumps({"response": "", "done": True}) + "\n").encode()
+
+    def handler(request):
+        payload = json.loads(request.content)
+        assert payload["stream"] is True
+        assert payload["options"]["num_predict"] > 0
+        return httpx.Response(200, content=body())
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    board = [None] * 9
+
+    async def scenario():
+        text = await client.generate_stream(
+            "prompt", until=lambda text: TicTacToeAI._parse_move(text, board) is not None)
+        await client.aclose()
+        return text
+
+    text = asyncio.run(scenario())
+    assert TicTacToeAI._parse_move(text, board, final=True) == 4
+    assert len(sent) < len(chunks)
+
+
+def test_parse_move_waits_for_complete_number():
+    from ollama_integration import TicTacToeAI
+
+    board = [None] * 25
+    assert TicTacToeAI._parse_move("1", board) is None
+    assert TicTacToeAI._parse_move("12", board) == 12
+    assert TicTacToeAI._parse_move("1 ", board) == 1
+    assert TicTacToeAI._parse_move("1", board, final=True) == 1
+    assert TicTacToeAI._parse_move("FULL", board) == -1
+
+
+class SlowGenerateClient:
+    model = "fake"
+
+    def __init__(self):
+        self.calls = []
+
+    async def generate(self, prompt, system_prompt=None, label=None):
+        self.calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"answer:{prompt}"
+
+
+def test_dispatcher_coalesces_identical_prompts_and_batches_distinct_ones():
+    from ollama_integration import GenerateDispatcher
+
+    client = SlowGenerateClient()
+    dispatcher = GenerateDispatcher(client, max_batch_size=8, max_wait=0.01, parallel=8)
+
+    async def scenario():
+        results = await asyncio.gather(
+            dispatcher.generate("a"), dispatcher.generate("a"), dispatcher.generate("b"))
+        await dispatcher.stop()
+        return results
+
+    assert asyncio.run(scenario()) == ["answer:a", "answer:a", "answer:b"]
+    assert sorted(client.calls) == ["a", "b"]
+    stats = dispatcher.stats()
+    assert stats["coalesced"] == 1
+    assert stats["batches"] == 1
+    assert stats["inflight"] == 0
+
+
+def test_dispatcher_cancels_request_when_last_waiter_leaves():
+    from ollama_integration import GenerateDispatcher
+
+    client = SlowGenerateClient()
+    dispatcher = GenerateDispatcher(client, max_wait=0)
+
+    async def scenario():
+        task = asyncio.create_task(dispatcher.generate("a"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    assert dispatcher.stats()["inflight"] == 0
+
+
+class FakeDispatcher:
+    def __init__(self, answer, delay):
+        self.answer = answer
+        self.delay = delay
+        self.cancelled = False
+
+    async def generate(self, prompt, system_prompt=None, stream=False, until=None, label=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.answer
+
+
+class AvailableClient:
+    model = "fake"
+    available = True
+
+
+def test_hedged_move_falls_back_to_search_after_deadline(monkeypatch):
+    from config import Config
+    from ollama_integration import TicTacToeAI
+    from search_executor import SearchExecutor
+
+    inline = SearchExecutor(kind="inline")
+    monkeypatch.setattr(Config, "AI_MOVE_DEADLINE_MS", 20)
+    # X amenaza 0-1-2: la búsqueda debe bloquear en 2
+    board = ['X', 'X', None, None, 'O', None, None, None, None]
+
+    slow = FakeDispatcher("5", delay=1.0)
+    decision = asyncio.run(TicTacToeAI(AvailableClient(), dispatcher=slow, executor=inline).choose_move(board, 'O', 3))
+    assert decision == (2, "search", "deadline")
+    assert slow.cancelled
+
+    fast = FakeDispatcher("5", delay=0)
+    decision = asyncio.run(TicTacToeAI(AvailableClient(), dispatcher=fast, executor=inline).choose_move(board, 'O', 3))
+    assert decision == (5, "llm", None)
+
+    invalid = FakeDispatcher("0", delay=0)
+    decision = asyncio.run(TicTacToeAI(AvailableClient(), dispatcher=invalid, executor=inline).choose_move(board, 'O', 3))
+    assert decision == (2, "search", "invalid_response")
+
+
+def test_client_records_prompt_eval_per_label():
+    import httpx
+    from ollama_integration import OllamaClient
+
+    def handler(request):
+        return httpx.Response(200, json={"response": "4", "prompt_eval_count": 60,
+                                         "prompt_eval_duration": 3_000_000})
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        await client.generate("a", label="3x3")
+        await client.generate("b", label="3x3")
+        await client.generate("c")
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert client.prompt_eval_stats() == {
+        "3x3": {"requests": 2, "avg_prompt_tokens": 60.0, "avg_prompt_eval_ms": 3.0}
+    }
+
+
+def test_streaming_samples_prompt_eval_by_reading_to_the_end():
+    import json
+
+    import httpx
+    from ollama_integration import OllamaClient
+
+    read_to_end = []
+
+    async def body(flags):
+        flags.append(False)
+        for chunk in ("4", " porque", " sí"):
+            yield (json.dumps({"response": chunk, "done": False}) + "\n").encode()
+        flags[-1] = True
+        yield (json.dumps({"response": "", "done": True, "prompt_eval_count": 80,
+                           "prompt_eval_duration": 2_000_000}) + "\n").encode()
+
+    def handler(request):
+        return httpx.Response(200, content=body(read_to_end))
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    client.eval_sample_every = 2
+
+    async def scenario():
+        texts = [await client.generate_stream("p", until=lambda text: "4" in text, label="4x4")
+                 for _ in range(3)]
+        await client.aclose()
+        return texts
+
+    texts = asyncio.run(scenario())
+    # La 1.ª y la 3.ª se leen completas y miden el prompt; la 2.ª corta en "4"
+    assert texts == ["4 porque sí", "4", "4 porque sí"]
+    assert read_to_end == [True, False, True]
+    assert client.prompt_eval_stats() == {
+        "4x4": {"requests": 2, "avg_prompt_tokens": 80.0, "avg_prompt_eval_ms": 2.0}
+    }
+
+
+def test_model_keeper_warms_pings_and_unloads_when_idle():
+    import json
+
+    import httpx
+    from ollama_integration import OllamaClient
+
+    keep_alives = []
+
+    def handler(request):
+        keep_alives.append(json.loads(request.content).get("keep_alive"))
+        return httpx.Response(200, json={"response": "", "done": True})
+
+    import metrics
+
+    cold_before = metrics.model_load_seconds.count(kind="cold")
+    warm_before = metrics.model_load_seconds.count(kind="warm")
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    keeper = client.keeper
+    keeper.keep_alive = "10m"
+    keeper.idle_unload = 60
+
+    async def scenario():
+        assert keeper.idle
+        keeper.touch()
+        await keeper.ping()   # carga en frío
+        await keeper.ping()   # renovación con el modelo cargado
+        keeper.last_activity -= 120
+        assert keeper.idle
+        await keeper.unload()
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert keep_alives == ["10m", "10m", "0"]
+    status = keeper.status()
+    assert status["cold_starts"] == 1 and status["warm_pings"] == 1
+    assert status["unloads"] == 1 and not status["loaded"]
+    assert metrics.model_load_seconds.count(kind="cold") == cold_before + 1
+    assert metrics.model_load_seconds.count(kind="warm") == warm_before + 1
+
+
+def test_shared_client_and_keeper_use_configured_model():
+    import json
+
+    import httpx
+    from config import Config
+    from ollama_integration import ollama_client
+
+    assert ollama_client.base_url == Config.get_ollama_url()
+    assert ollama_client.model == Config.OLLAMA_MODEL
+
+    models = []
+
+    def handler(request):
+        models.append(json.loads(request.content).get("model"))
+        return httpx.Response(200, json={"response": "", "done": True})
+
+    keeper = type(ollama_client.keeper)(ollama_client)
+    original = ollama_client._transport
+    ollama_client._transport = httpx.MockTransport(handler)
+
+    async def scenario():
+        keeper.touch()
+        await keeper.ping()
+        await ollama_client.aclose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        ollama_client._transport = original
+    assert models == [Config.OLLAMA_MODEL]
+    assert keeper.status()["model"] == Config.OLLAMA_MODEL
@@ -0,0 +1,25 @@
+import pytest
+
+import opening_book
+
+
+@pytest.fixture(scope="module")
+def book_path(tmp_path_factory):
+    return opening_book.write_book(str(tmp_path_factory.mktemp("book") / "ttt3.book"))
+
+
+def test_book_answers_positions(book_path):
+    book = opening_book.OpeningBook.load(book_path)
+    assert book.lookup(["O", "O", None, "X", "X", None, None, None, None], "O") == 2
+    assert book.lookup(["X", "X", None, None, "O", None, None, None, None], "O") == 2
+    # Posición terminal: no hay movimiento en la tabla
+    assert book.lookup(["X", "X", "X", "O", "O", None, None, None, None], "O") is None
+
+
+def test_corrupted_book_is_rejected(book_path, tmp_path):
+    data = bytearray(open(book_path, "rb").read())
+    data[-1] ^= 0xFF
+    corrupted = tmp_path / "corrupted.book"
+    corrupted.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        opening_book.OpeningBook.load(str(corrupted))
@@ -0,0 +1,19 @@
+import prompt_builder
+
+
+def test_prompt_renders_any_board_size():
+    board = [None] * 25
+    board[0], board[12], board[24] = 'X', 'O', 'X'
+    system, prompt = prompt_builder.build_prompt(board, 'O', 5)
+
+    assert "5x5" in system and "0-24" in system
+    assert prompt.splitlines()[:5] == ["X....", ".....", "..O..", ".....", "....X"]
+    assert "Juegas: O" in prompt
+    free = prompt.split("Libres: ")[1].split("\n")[0].split()
+    assert free == [str(i) for i in range(25) if board[i] is None]
+
+
+def test_system_prompt_is_shared_per_size():
+    # Mismo objeto para el mismo tamaño: el prefijo enviado a Ollama no cambia
+    assert prompt_builder.system_prompt(4) is prompt_builder.system_prompt(4)
+    assert prompt_builder.system_prompt(3) != prompt_builder.system_prompt(4)
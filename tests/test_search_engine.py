@@ -0,0 +1,66 @@
+from search_engine import SearchEngine
+from game_agent import minimax_algorithm
+
+
+def test_takes_immediate_win():
+    board = ["O", "O", None, "X", "X", None, None, None, None]
+    assert minimax_algorithm(board, "O", 3) == 2
+
+
+def test_blocks_opponent():
+    board = ["X", "X", None, None, "O", None, None, None, None]
+    assert minimax_algorithm(board, "O", 3) == 2
+
+
+def test_full_board_returns_minus_one():
+    board = ["X", "O", "X", "X", "O", "O", "O", "X", "X"]
+    assert minimax_algorithm(board, "X", 3) == -1
+
+
+def test_does_not_mutate_board():
+    board = [None, "X", None, None, "O", None, None, None, None]
+    snapshot = list(board)
+    minimax_algorithm(board, "X", 3)
+    assert board == snapshot
+
+
+def test_transposition_table_is_reused():
+    engine = SearchEngine()
+    board = [None] * 9
+    engine.best_move(board, "X", 3)
+    cold_nodes = engine.nodes
+    engine.best_move(board, "X", 3)
+    assert engine.nodes < cold_nodes
+
+
+def test_transposition_table_evicts_oldest_entries_over_the_limit():
+    engine = SearchEngine(max_tt_entries=500)
+    engine.best_move([None] * 9, "X", 3)
+    table = engine._tables[3]
+    assert len(table) > 500
+    newest = list(table)[-50:]
+
+    engine.best_move(["X"] + [None] * 8, "O", 3)
+    assert engine.tt_evictions > 0
+    # Quedan las entradas recientes, no una tabla vacía
+    assert all(key in table for key in newest)
+    assert engine.best_move(["X", "X", None, None, "O", None, None, None, None], "O", 3) == 2
+
+
+def test_large_board_respects_time_budget():
+    engine = SearchEngine(time_limit=0.05)
+    board = [None] * 81
+    board[40] = "X"
+    result = engine.search(1 << 40, 0, "O", 9)
+    assert board[result.move] is None
+    assert result.depth >= 1
+    assert result.elapsed < 0.2
+
+
+def test_budgeted_search_still_finds_forced_win():
+    engine = SearchEngine(node_limit=5000)
+    board = ["X", "X", "X", None,
+             "O", "O", None, None,
+             None, None, None, None,
+             "O", None, None, None]
+    assert engine.best_move(board, "X", 4) == 3
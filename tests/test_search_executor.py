@@ -0,0 +1,114 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+import search_engine
+from config import Config
+from game_agent import minimax_algorithm
+from search_executor import ExecutorBusy, SearchExecutor
+
+
+def test_runs_search_off_loop_and_records_timings():
+    executor = SearchExecutor(kind="thread", max_workers=2)
+
+    async def scenario():
+        return await executor.run(minimax_algorithm, ["X", "X", None, None, "O", None, None, None, None], "O", 3)
+
+    try:
+        assert asyncio.run(scenario()) == 2
+    finally:
+        executor.shutdown()
+    stats = executor.stats()
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_rejects_when_queue_is_full():
+    executor = SearchExecutor(kind="thread", max_workers=1, max_queue_depth=1)
+
+    async def scenario():
+        first = asyncio.create_task(executor.run(time.sleep, 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorBusy):
+            await executor.run(time.sleep, 0)
+        await first
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert executor.rejected == 1
+
+
+def test_cancelled_request_is_counted():
+    executor = SearchExecutor(kind="thread", max_workers=1)
+
+    async def scenario():
+        task = asyncio.create_task(executor.run(time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert executor.cancelled == 1
+    assert executor.queue_depth == 0
+
+
+def test_wait_idle_waits_for_abandoned_work():
+    executor = SearchExecutor(kind="thread", max_workers=1)
+
+    async def scenario():
+        task = asyncio.create_task(executor.run(time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        asyncio.run(scenario())
+        # La tarea se canceló pero el hilo sigue durmiendo
+        assert not executor.wait_idle(timeout=0)
+        assert executor.wait_idle(timeout=2)
+    finally:
+        executor.shutdown()
+
+
+def _timed_search(board, player, size):
+    started = time.perf_counter()
+    move = minimax_algorithm(board, player, size)
+    return move, time.perf_counter() - started, id(search_engine.thread_engine())
+
+
+def test_concurrent_thread_searches_use_their_own_engines(monkeypatch):
+    # Tablas pequeñas para que la expulsión ocurra durante las búsquedas
+    monkeypatch.setattr(Config, "SEARCH_TT_MAX_ENTRIES", 2000)
+    monkeypatch.setattr(Config, "SEARCH_TIME_BUDGET_MS", 50)
+    rng = random.Random(3)
+    positions = []
+    for size in (4, 5, 6) * 8:
+        board = [None] * (size * size)
+        for position, player in zip(rng.sample(range(size * size), 2), "XO"):
+            board[position] = player
+        positions.append((board, "X", size))
+
+    executor = SearchExecutor(kind="thread", max_workers=8)
+
+    async def scenario():
+        return await asyncio.gather(*(executor.run(_timed_search, *position) for position in positions))
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    for (board, _, _), (move, elapsed, _) in zip(positions, results):
+        assert board[move] is None
+        # Con el presupuesto compartido entre hilos algunas búsquedas tardaban segundos
+        assert elapsed < 1.0
+    engines = {engine for _, _, engine in results}
+    assert 1 < len(engines) <= 8 and id(search_engine.default_engine) not in engines
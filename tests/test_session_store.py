@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+from game_logic import TicTacToeGame
+from session_store import (InMemorySessionStore, LocalRedis, RedisSessionStore,
+                           decode_game, encode_game)
+
+
+def _played(moves, size=3):
+    game = TicTacToeGame(size=size)
+    for position in moves:
+        assert game.make_move(position)
+    return game
+
+
+def test_encode_decode_roundtrip():
+    game = _played([4, 0, 8, 2, 1, 7, 6], size=3)
+    restored = decode_game(encode_game(game))
+    assert restored.board == game.board
+    assert restored.current_player == game.current_player
+    assert [m['position'] for m in restored.moves_history] == [4, 0, 8, 2, 1, 7, 6]
+    assert restored.winner == game.winner
+
+
+def test_memory_store_expires_sessions():
+    store = InMemorySessionStore(ttl=0.05)
+
+    async def scenario():
+        await store.save("a", _played([0, 4]))
+        assert (await store.load("a")).board[4] == 'O'
+        await asyncio.sleep(0.1)
+        return await store.load("a")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_redis_store_shards_by_game_id():
+    shards = [LocalRedis(), LocalRedis()]
+    store = RedisSessionStore(shards, ttl=60)
+
+    async def scenario():
+        for i in range(20):
+            await store.save(f"game-{i}", _played([i % 9]))
+        loaded = [await store.load(f"game-{i}") for i in range(20)]
+        await store.delete("game-0")
+        return loaded, await store.load("game-0")
+
+    loaded, deleted = asyncio.run(scenario())
+    assert [game.board[i % 9] for i, game in enumerate(loaded)] == ['X'] * 20
+    assert deleted is None
+    assert all(shard._data for shard in shards)
+
+
+def test_websocket_resumes_game_by_id():
+    from fastapi.testclient import TestClient
+    from server.server import app
+
+    client = TestClient(app)
+    with client.websocket_connect('/game?size=4') as ws:
+        state = ws.receive_json()
+        game_id = state['game_id']
+        ws.send_json({'type': 'player_move', 'position': 5})
+        ws.receive_json()
+        agent_state = ws.receive_json()
+
+    with client.websocket_connect(f'/game?size=3&game_id={game_id}') as ws:
+        resumed = ws.receive_json()
+    assert resumed['resumed'] and resumed['game_id'] == game_id
+    assert resumed['size'] == 4
+    assert resumed['board'] == agent_state['board']
+
+
+def _slow_agent(monkeypatch):
+    from ollama_integration import MoveDecision, tic_tac_toe_ai
+
+    async def slow_move(board, player='O', size=None):
+        await asyncio.sleep(0.2)
+        return MoveDecision(board.index(None), "search", "ollama_unavailable")
+
+    monkeypatch.setattr(tic_tac_toe_ai, "choose_move", slow_move)
+
+
+def _drain_during_agent_move():
+    """Juega 4 y cierra con 1012 (reinicio del servidor) mientras el agente piensa."""
+    from fastapi.testclient import TestClient
+    from server.server import app
+
+    with TestClient(app).websocket_connect('/game') as ws:
+        game_id = ws.receive_json()['game_id']
+        ws.send_json({'type': 'player_move', 'position': 4})
+        ws.receive_json()
+        ws.close(code=1012)
+        time.sleep(0.4)
+    return game_id
+
+
+def test_agent_move_is_resumed_on_another_worker_after_drain(monkeypatch):
+    from fastapi.testclient import TestClient
+    from server import server
+
+    _slow_agent(monkeypatch)
+    # Dos instancias sobre el mismo Redis: el worker que se apaga y el que reanuda
+    redis = LocalRedis()
+    monkeypatch.setattr(server, "session_store", RedisSessionStore([redis]))
+    game_id = _drain_during_agent_move()
+
+    monkeypatch.setattr(server, "session_store", RedisSessionStore([redis]))
+    with TestClient(server.app).websocket_connect(f'/game?game_id={game_id}') as ws:
+        resumed = ws.receive_json()
+    assert resumed['resumed'] and resumed['game_id'] == game_id
+    assert resumed['board'][4] == 'X' and resumed['board'][0] == 'O'
+    assert resumed['current_player'] == 'X'
+
+
+def test_agent_move_is_cancelled_on_drain_without_shared_store(monkeypatch):
+    from server import server
+
+    _slow_agent(monkeypatch)
+    store = InMemorySessionStore()
+    monkeypatch.setattr(server, "session_store", store)
+    game_id = _drain_during_agent_move()
+
+    game = asyncio.run(store.load(game_id))
+    assert [m['position'] for m in game.moves_history] == [4]
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import tournament
+
+
+def test_play_game_records_a_complete_game():
+    tournament._init_worker(0, "http://localhost:1", "test", ["engine"])
+    record = tournament.play_game({"x": "engine", "o": "random", "size": 3, "game": 0, "seed": 5})
+    assert record["winner"] in ("X", "Tie")
+    assert record["illegal_move_by"] is None
+    assert len(record["latency_ms"]["X"]) + len(record["latency_ms"]["O"]) == len(record["moves"])
+
+
+def test_llm_worker_searches_in_its_own_thread_executor(monkeypatch):
+    from search_executor import search_executor
+
+    monkeypatch.setattr(tournament, "_llm", None)
+    global_kind = search_executor.kind
+    tournament._init_worker(0, "http://localhost:1", "test", ["llm"])
+    loop, ai = tournament._llm
+    assert ai.executor is not search_executor and search_executor.kind == global_kind
+    assert ai.executor.kind == "thread" and ai.executor.max_workers == 1
+    # Sin Ollama el agente juega con la búsqueda
+    record = tournament.play_game({"x": "llm", "o": "random", "size": 3, "game": 0, "seed": 1})
+    assert record["illegal_move_by"] is None
+    assert all(source.startswith("random/") or source == "llm/search" for source in record["sources"])
+    # Ninguna búsqueda abandonada del modo hedged queda en marcha entre movimientos
+    assert ai.executor.wait_idle(timeout=0)
+    ai.executor.shutdown()
+    loop.close()
+
+
+def test_main_writes_jsonl_and_summary(tmp_path, capsys):
+    output, summary_path = tmp_path / "games.jsonl", tmp_path / "summary.json"
+    tournament.main(["--matchups", "random:random", "engine:random", "--games", "4", "--workers", "0",
+                     "--random-opening", "1", "--output", str(output), "--summary", str(summary_path)])
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(records) == 8
+    summary = json.loads(summary_path.read_text())
+    assert summary["games"] == 8 and summary["moves"] == sum(len(r["moves"]) for r in records)
+    engine_row = next(row for row in summary["matchups"] if row["matchup"] == "engine:random")
+    assert engine_row["o_win_rate"] == 0
+    assert engine_row["agents"]["X"]["p50_ms"] is not None
+    assert "movimientos/s" in capsys.readouterr().out
+
+
+def test_parquet_output_is_written_in_row_groups(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output = tmp_path / "games.parquet"
+    tournament.main(["--matchups", "random:random", "engine:random", "--games", "4", "--workers", "0",
+                     "--output", str(output), "--row-group-size", "3"])
+
+    parquet = pq.ParquetFile(output)
+    assert parquet.metadata.num_rows == 8 and parquet.num_row_groups == 3
+    records = parquet.read().to_pylist()
+    assert {record["matchup"] for record in records} == {"random:random", "engine:random"}
+    assert all(record["illegal_move_by"] is None for record in records)
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert tournament._percentile(values, 50) == 50
+    assert tournament._percentile(values, 99) == 99
+    assert tournament._percentile([], 50) is None
@@ -0,0 +1,101 @@
+import json
+import random
+
+import bitboard
+from ws_protocol import MOVE, NO_MOVE, STATE, TURN, pack_board, unpack_board
+
+
+def test_pack_board_roundtrip_and_size():
+    rng = random.Random(7)
+    for size in range(3, 10):
+        board = [rng.choice([None, 'X', 'O']) for _ in range(size * size)]
+        packed = pack_board(*bitboard.from_list(board, size), size)
+        assert len(packed) == (size * size + 3) // 4
+        assert unpack_board(packed, size) == board
+    # 9x9: 21 bytes frente al JSON del tablero completo
+    assert len(packed) < len(json.dumps(board)) / 10
+
+
+def _game_client():
+    from fastapi.testclient import TestClient
+    from server.server import app
+    return TestClient(app)
+
+
+def test_binary_protocol_sends_state_and_move_frames():
+    with _game_client().websocket_connect('/game?size=9&protocol=binary') as ws:
+        session = ws.receive_json()
+        assert session['type'] == 'session' and session['game_id']
+        state = ws.receive_bytes()
+        assert state[:3] == bytes((STATE, 9, 0)) and len(state) == 3 + 21
+
+        ws.send_json({'type': 'player_move', 'position': 40})
+        assert ws.receive_bytes() == bytes((MOVE, 40, 0x01))
+        agent = ws.receive_bytes()
+        assert agent[0] == MOVE and agent[1] != 40 and agent[2] & 0x10
+
+
+def test_delta_protocol_sends_only_the_move():
+    with _game_client().websocket_connect('/game?protocol=delta') as ws:
+        assert ws.receive_json()['board'] == [None] * 9
+        ws.send_json({'type': 'player_move', 'position': 4})
+        assert ws.receive_json() == {'type': 'move', 'position': 4, 'player': 'X', 'current_player': 'O'}
+        agent = ws.receive_json()
+        assert agent['type'] == 'move' and agent['player'] == 'O' and 'board' not in agent
+
+
+def test_batch_turn_is_a_single_message_with_seq():
+    with _game_client().websocket_connect('/game?batch=true') as ws:
+        ws.receive_json()
+        ws.send_json({'type': 'player_move', 'position': 4, 'seq': 7})
+        turn = ws.receive_json()
+        assert turn['type'] == 'turn' and turn['seq'] == 7
+        assert turn['player_move'] == 4 and turn['board'][4] == 'X'
+        assert turn['board'][turn['agent_move']] == 'O' and turn['current_player'] == 'X'
+
+        # Movimiento inválido: el error repite el seq de la petición
+        ws.send_json({'type': 'player_move', 'position': 4, 'seq': 8})
+        assert ws.receive_json() == {'type': 'error', 'message': 'Movimiento inválido', 'seq': 8}
+
+
+def test_batch_binary_turn_frame():
+    with _game_client().websocket_connect('/game?protocol=binary&batch=1') as ws:
+        ws.receive_json()
+        ws.receive_bytes()
+        ws.send_json({'type': 'player_move', 'position': 0, 'seq': 0x0102})
+        frame = ws.receive_bytes()
+        assert len(frame) == 7 and frame[:4] == bytes((TURN, 0x01, 0x02, 0))
+        assert frame[4] not in (0, NO_MOVE) and frame[6] == 0
+
+
+def test_invalid_seq_is_rejected_and_connection_stays_open():
+    with _game_client().websocket_connect('/game?protocol=binary&batch=1') as ws:
+        ws.receive_json()
+        ws.receive_bytes()
+        for seq in ('7', 1.5, True, -1, 0x10000):
+            ws.send_json({'type': 'player_move', 'position': 0, 'seq': seq})
+            error = ws.receive_json()
+            assert error['type'] == 'error' and 'seq' in error['message']
+        # El movimiento no se aplicó y la conexión sigue respondiendo
+        ws.send_json({'type': 'player_move', 'position': 0, 'seq': 0xFFFF})
+        frame = ws.receive_bytes()
+        assert frame[:4] == bytes((TURN, 0xFF, 0xFF, 0))
+
+
+def test_reset_game_rejects_sizes_outside_the_board_range():
+    with _game_client().websocket_connect('/game?protocol=binary') as ws:
+        session = ws.receive_json()
+        ws.receive_bytes()
+        for size in (17, 2, '4', None):
+            ws.send_json({'type': 'reset_game', 'size': size, 'seq': 3})
+            error = ws.receive_json()
+            assert error['type'] == 'error' and error['seq'] == 3 and 'Tamaño' in error['message']
+        # La partida 3x3 sigue en juego y se puede reanudar
+        ws.send_json({'type': 'player_move', 'position': 288})
+        assert ws.receive_json()['message'] == 'Movimiento inválido'
+        ws.send_json({'type': 'player_move', 'position': 4})
+        assert ws.receive_bytes()[0] == MOVE
+
+    with _game_client().websocket_connect(f"/game?game_id={session['game_id']}") as ws:
+        resumed = ws.receive_json()
+    assert resumed['resumed'] and resumed['size'] == 3 and resumed['board'][4] == 'X'